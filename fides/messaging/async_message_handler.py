@@ -0,0 +1,116 @@
+import asyncio
+import functools
+import inspect
+from concurrent.futures import Executor
+from typing import Any, Awaitable, Callable, List, Optional, Union
+
+from fides.messaging.message_handler import MessageHandler
+from fides.messaging.model import NetworkMessage, PeerInfo, PeerRecommendationResponse, PeerIntelligenceResponse
+from fides.model.alert import Alert
+from fides.model.aliases import PeerId, Target
+from fides.utils.logger import Logger
+
+logger = Logger(__name__)
+
+
+def to_async(fn: Callable[..., Any], executor: Optional[Executor] = None) -> Callable[..., Awaitable[Any]]:
+    """Adapts synchronous function to coroutine function that executes it in the executor.
+
+    This allows to use synchronous protocols with the asyncio messaging without blocking the event loop.
+    Use executor with a single thread if the protocols are not thread safe.
+    """
+
+    @functools.wraps(fn)
+    async def run_in_executor(*args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(fn, *args))
+
+    return run_in_executor
+
+
+async def _await_if_needed(result: Any) -> Any:
+    return await result if inspect.isawaitable(result) else result
+
+
+class AsyncMessageHandler(MessageHandler):
+    """
+    Asyncio variant of the MessageHandler, callbacks are coroutine functions.
+
+    Synchronous callbacks are supported as well, but they're executed directly on the event loop,
+    use to_async or for_sync_protocols to execute them in the executor instead.
+    """
+
+    def __init__(self,
+                 on_peer_list_update: Callable[[List[PeerInfo]], Awaitable[None]],
+                 on_recommendation_request: Callable[[str, PeerInfo, PeerId], Awaitable[None]],
+                 on_recommendation_response: Callable[[List[PeerRecommendationResponse]], Awaitable[None]],
+                 on_alert: Callable[[PeerInfo, Alert], Awaitable[None]],
+                 on_intelligence_request: Callable[[str, PeerInfo, Target], Awaitable[None]],
+                 on_intelligence_response: Callable[[List[PeerIntelligenceResponse]], Awaitable[None]],
+                 on_unknown: Optional[Callable[[NetworkMessage], Awaitable[None]]] = None,
+                 on_error: Optional[Callable[[Union[str, NetworkMessage], Exception], Awaitable[None]]] = None
+                 ):
+        super().__init__(on_peer_list_update,
+                         on_recommendation_request,
+                         on_recommendation_response,
+                         on_alert,
+                         on_intelligence_request,
+                         on_intelligence_response,
+                         on_unknown,
+                         on_error)
+
+    @classmethod
+    def for_sync_protocols(cls,
+                           on_peer_list_update: Callable[[List[PeerInfo]], None],
+                           on_recommendation_request: Callable[[str, PeerInfo, PeerId], None],
+                           on_recommendation_response: Callable[[List[PeerRecommendationResponse]], None],
+                           on_alert: Callable[[PeerInfo, Alert], None],
+                           on_intelligence_request: Callable[[str, PeerInfo, Target], None],
+                           on_intelligence_response: Callable[[List[PeerIntelligenceResponse]], None],
+                           on_unknown: Optional[Callable[[NetworkMessage], None]] = None,
+                           on_error: Optional[Callable[[Union[str, NetworkMessage], Exception], None]] = None,
+                           executor: Optional[Executor] = None
+                           ) -> 'AsyncMessageHandler':
+        """Creates handler for the synchronous protocols, they're executed in the executor.
+
+        The protocols must send messages through AsyncNetworkBridge.for_sync_protocols.
+        """
+        return cls(
+            on_peer_list_update=to_async(on_peer_list_update, executor),
+            on_recommendation_request=to_async(on_recommendation_request, executor),
+            on_recommendation_response=to_async(on_recommendation_response, executor),
+            on_alert=to_async(on_alert, executor),
+            on_intelligence_request=to_async(on_intelligence_request, executor),
+            on_intelligence_response=to_async(on_intelligence_response, executor),
+            on_unknown=to_async(on_unknown, executor) if on_unknown else None,
+            on_error=to_async(on_error, executor) if on_error else None
+        )
+
+    async def on_message(self, message: NetworkMessage):
+        """
+        Entry point for generic messages coming from the queue.
+        This method parses the message and then awaits correct procedure from event.
+        :param message: message from the queue
+        :return: value from the underlining function from the constructor
+        """
+        # noinspection PyBroadException
+        try:
+            callback, args = self._resolve(message)
+            return await _await_if_needed(callback(*args))
+        except Exception as ex:
+            return await _await_if_needed(self._handle_error(message, ex))
+
+    async def on_messages(self, messages: List[NetworkMessage]):
+        """
+        Entry point for a batch of messages coming from the queue, see MessageHandler.on_messages.
+        """
+        for message in self._merge_batch(messages):
+            await self.on_message(message)
+
+    async def on_error(self, original_data: str, exception: Optional[Exception] = None):
+        """
+        Should be executed when it was not possible to parse the message.
+        :param original_data: string received from the queue
+        :param exception: exception that occurred during handling
+        """
+        return await _await_if_needed(super().on_error(original_data, exception))
@@ -0,0 +1,104 @@
+import asyncio
+from typing import Optional
+
+from fides.messaging.async_message_handler import AsyncMessageHandler
+from fides.messaging.async_queue import AsyncQueue
+from fides.messaging.model import NetworkMessage
+from fides.messaging.network_bridge import NetworkBridge
+from fides.utils.logger import Logger
+
+logger = Logger(__name__)
+
+
+class AsyncNetworkBridge(NetworkBridge):
+    """
+    Asyncio variant of the NetworkBridge.
+
+    All send_* methods return coroutines that must be awaited.
+    In order to start receiving messages, await "listen" method.
+
+    Synchronous protocols executed by AsyncMessageHandler.for_sync_protocols must send their messages
+    through the bridge returned by for_sync_protocols, because they can not await.
+    """
+
+    def __init__(self, queue: AsyncQueue):
+        # reliability updates are not coalesced, because the publisher uses timer thread
+        super().__init__(queue)
+        self.__queue = queue
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def for_sync_protocols(self) -> NetworkBridge:
+        """Returns bridge for the synchronous protocols, its send_* methods block until the message is sent.
+
+        The messages are sent on the event loop this bridge listens on, so they must be sent from other threads,
+        such as the executor of AsyncMessageHandler.for_sync_protocols.
+        """
+        return _SyncNetworkBridge(self)
+
+    async def listen(self, handler: AsyncMessageHandler, **argv):
+        """Starts messages processing, the coroutine finishes when the queue is stopped."""
+        self.__loop = asyncio.get_running_loop()
+
+        async def message_received(message: str):
+            try:
+                network_messages = self._parse(message)
+            except Exception as e:
+                logger.error(f'There was an error parsing message, Exception: {e}.')
+                await handler.on_error(message, e)
+                return
+
+            try:
+                logger.debug('Message parsed. Executing handler.')
+                if len(network_messages) == 1:
+                    await handler.on_message(network_messages[0])
+                else:
+                    await handler.on_messages(network_messages)
+            except Exception as e:
+                logger.error(f'There was an error processing message, Exception: {e}.')
+                await handler.on_error(message, e)
+
+        logger.info(f'Starts listening...')
+        return await self.__queue.listen(message_received, **argv)
+
+    def flush(self):
+        """Messages are never buffered by this bridge, so there's nothing to flush."""
+
+    def close(self):
+        """Stops listening."""
+        self.__queue.stop()
+
+    async def _send(self, envelope: NetworkMessage):
+        logger.debug('Sending', envelope)
+        try:
+            j = self._serialize(envelope)
+            return await self.__queue.send(j)
+        except Exception as ex:
+            logger.error(f'Exception during sending an envelope: {ex}.', envelope)
+
+    def _send_threadsafe(self, envelope: NetworkMessage):
+        """Sends the envelope on the event loop, blocks until it is sent when called from another thread."""
+        if self.__loop is None:
+            raise RuntimeError('Bridge is not listening, there is no event loop to send the message on!')
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.__loop:
+            # waiting here would block the loop forever, the message is sent as soon as the loop gets to it
+            return asyncio.ensure_future(self._send(envelope))
+        return asyncio.run_coroutine_threadsafe(self._send(envelope), self.__loop).result()
+
+
+class _SyncNetworkBridge(NetworkBridge):
+    """Blocking sending side of the AsyncNetworkBridge, it can not listen."""
+
+    def __init__(self, bridge: AsyncNetworkBridge):
+        # queue is never used, all messages go through the async bridge
+        super().__init__(queue=None)
+        self.__bridge = bridge
+
+    def listen(self, handler, block: bool = False, **argv):
+        raise TypeError('Only the AsyncNetworkBridge can listen.')
+
+    def _send(self, envelope: NetworkMessage):
+        return self.__bridge._send_threadsafe(envelope)
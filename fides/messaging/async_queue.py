@@ -0,0 +1,145 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Awaitable, Callable, Optional
+
+from fides.messaging.queue import Queue
+from fides.utils.logger import Logger
+
+logger = Logger(__name__)
+
+AsyncMessageCallback = Callable[[str], Awaitable[None]]
+"""Coroutine function executed when there's new message in the queue."""
+
+
+class AsyncQueue:
+    """
+    Asyncio variant of the Queue.
+
+    Central point used for communication with the network layer and another peers.
+    """
+
+    async def send(self, serialized_data: str, **argv):
+        """Sends serialized data to the queue."""
+        raise NotImplemented('This is interface. Use implementation.')
+
+    async def listen(self, on_message: AsyncMessageCallback, **argv):
+        """Starts listening, awaits :param: on_message when new message arrives.
+
+        The coroutine finishes when the queue is stopped.
+        """
+        raise NotImplemented('This is interface. Use implementation.')
+
+    def stop(self):
+        """Stops listening."""
+        raise NotImplemented('This is interface. Use implementation.')
+
+
+class _Stop:
+    """Sentinel that stops the listening loop."""
+
+
+class _AsyncioQueueListener(AsyncQueue):
+    """Base for queues that deliver the messages through asyncio.Queue."""
+
+    def __init__(self, max_concurrency: int = 1):
+        """
+        :param max_concurrency: how many messages can be processed at the same time,
+        with 1 the messages are processed one by one in order they arrived
+        """
+        self._messages: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__max_concurrency = max(1, max_concurrency)
+
+    def _ensure_started(self):
+        if self._messages is None:
+            self._loop = asyncio.get_running_loop()
+            self._messages = asyncio.Queue()
+
+    async def listen(self, on_message: AsyncMessageCallback, **argv):
+        """Starts listening, awaits :param: on_message when new message arrives.
+
+        The coroutine finishes when the queue is stopped.
+        """
+        self._ensure_started()
+        limit = asyncio.Semaphore(self.__max_concurrency)
+        running = set()
+
+        async def process(data: str):
+            try:
+                await on_message(data)
+            except Exception as ex:
+                logger.error(f'Error when executing on_message!, {ex}')
+            finally:
+                limit.release()
+
+        while True:
+            data = await self._messages.get()
+            if isinstance(data, _Stop):
+                break
+            await limit.acquire()
+            task = asyncio.ensure_future(process(data))
+            running.add(task)
+            task.add_done_callback(running.discard)
+
+        if running:
+            await asyncio.gather(*running)
+
+    def stop(self):
+        """Stops listening, messages that are being processed are finished first."""
+        if self._messages is None:
+            return
+        if self._loop.is_running() and self._is_other_thread():
+            self._loop.call_soon_threadsafe(self._messages.put_nowait, _Stop())
+        else:
+            self._messages.put_nowait(_Stop())
+
+    def _is_other_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is not self._loop
+        except RuntimeError:
+            return True
+
+
+class AsyncInMemoryQueue(_AsyncioQueueListener):
+    """In Memory implementation of AsyncQueue, sent messages are delivered to the listener.
+
+    This should not be used in production.
+    """
+
+    async def send(self, serialized_data: str, **argv):
+        """Sends serialized data to the queue."""
+        self._ensure_started()
+        await self._messages.put(serialized_data)
+
+
+class AsyncQueueAdapter(_AsyncioQueueListener):
+    """Exposes synchronous Queue as AsyncQueue.
+
+    Blocking send is executed in the executor, messages received on the listener thread
+    of the wrapped queue are handed over to the event loop.
+    """
+
+    def __init__(self, queue: Queue, executor: Optional[Executor] = None, max_concurrency: int = 1):
+        """
+        :param queue: synchronous queue to wrap
+        :param executor: executor for blocking calls, None for the default executor of the loop
+        :param max_concurrency: how many messages can be processed at the same time
+        """
+        super().__init__(max_concurrency)
+        self.__queue = queue
+        self.__executor = executor
+
+    async def send(self, serialized_data: str, **argv):
+        """Sends serialized data to the queue."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__executor, lambda: self.__queue.send(serialized_data, **argv))
+
+    async def listen(self, on_message: AsyncMessageCallback, **argv):
+        """Starts listening on the wrapped queue, awaits :param: on_message when new message arrives."""
+        self._ensure_started()
+
+        def received(data: str):
+            self._loop.call_soon_threadsafe(self._messages.put_nowait, data)
+
+        self.__queue.listen(received, block=False, **argv)
+        await super().listen(on_message)
@@ -0,0 +1,128 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Generic, List, Optional, TypeVar
+
+from fides.utils.logger import Logger
+
+logger = Logger(__name__)
+
+T = TypeVar('T')
+
+
+@dataclass
+class BatchStatistics:
+    """Throughput statistics of the batch processing."""
+
+    batches: int = 0
+    """Number of processed batches."""
+
+    messages: int = 0
+    """Number of processed messages in all batches."""
+
+    last_batch_size: int = 0
+    """How many messages were in the last batch."""
+
+    last_batch_seconds: float = 0
+    """How long did it take to process the last batch."""
+
+    total_seconds: float = 0
+    """Time spent processing all batches."""
+
+    @property
+    def average_batch_size(self) -> float:
+        """Average number of messages in a single batch."""
+        return self.messages / self.batches if self.batches else 0
+
+    @property
+    def messages_per_second(self) -> float:
+        """Throughput of the batch processing."""
+        return self.messages / self.total_seconds if self.total_seconds else 0
+
+
+class MessageBatcher(Generic[T]):
+    """Collects items and hands them over to the callback in batches.
+
+    The batch is flushed either when it reaches :param: batch_size items,
+    or when the oldest item waits for :param: linger_seconds - whichever comes first.
+    Batches are always processed one after another, in the order in which the items were added.
+    A flush after the linger runs on the timer thread, so the errors of :param: on_batch are passed
+    to :param: on_error instead of being raised.
+    """
+
+    def __init__(self,
+                 on_batch: Callable[[List[T]], None],
+                 batch_size: int,
+                 linger_seconds: float,
+                 on_error: Optional[Callable[[List[T], Exception], None]] = None):
+        self.__on_batch = on_batch
+        self.__on_error = on_error
+        self.__batch_size = max(1, batch_size)
+        self.__linger_seconds = linger_seconds
+
+        self.__buffer: List[T] = []
+        self.__buffer_lock = threading.Lock()
+        # ensures that batches are processed in order and one at the time
+        self.__processing_lock = threading.Lock()
+        self.__timer: Optional[threading.Timer] = None
+        self.__statistics = BatchStatistics()
+
+    @property
+    def statistics(self) -> BatchStatistics:
+        """Throughput statistics for the processed batches."""
+        return self.__statistics
+
+    def add(self, items: List[T]):
+        """Adds items to the current batch, flushes it if it is full."""
+        with self.__buffer_lock:
+            self.__buffer.extend(items)
+            is_full = len(self.__buffer) >= self.__batch_size
+            if not is_full and self.__timer is None:
+                self.__timer = threading.Timer(self.__linger_seconds, self.flush)
+                self.__timer.daemon = True
+                self.__timer.start()
+
+        if is_full:
+            self.flush()
+
+    def flush(self):
+        """Processes all items that are currently waiting in the batch."""
+        with self.__processing_lock:
+            with self.__buffer_lock:
+                batch, self.__buffer = self.__buffer, []
+                if self.__timer is not None:
+                    self.__timer.cancel()
+                    self.__timer = None
+
+            if not batch:
+                return
+
+            start = time.perf_counter()
+            # we want to handle everything, nobody would catch it on the timer thread
+            # noinspection PyBroadException
+            try:
+                self.__on_batch(batch)
+            except Exception as ex:
+                self.__handle_error(batch, ex)
+            finally:
+                self.__record(len(batch), time.perf_counter() - start)
+
+    def __handle_error(self, batch: List[T], ex: Exception):
+        logger.error(f'Error when processing batch of {len(batch)} messages, Exception: {ex}.')
+        if self.__on_error is None:
+            return
+        # noinspection PyBroadException
+        try:
+            self.__on_error(batch, ex)
+        except Exception as handler_ex:
+            logger.error(f'Error handler of the batch failed, Exception: {handler_ex}.')
+
+    def __record(self, size: int, duration: float):
+        stats = self.__statistics
+        stats.batches += 1
+        stats.messages += size
+        stats.last_batch_size = size
+        stats.last_batch_seconds = duration
+        stats.total_seconds += duration
+        logger.debug(lambda: f'Batch of {size} messages processed in {duration:.6f}s, '
+                             f'throughput {stats.messages_per_second:.2f} msg/s.')
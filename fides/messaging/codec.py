@@ -0,0 +1,41 @@
+import json
+from dataclasses import is_dataclass
+from typing import Any, List, Union
+
+from fides.messaging.decoders import decoders
+from fides.messaging.model import NetworkMessage
+
+decode_network_message = decoders.decoder_for(NetworkMessage)
+
+
+class Codec:
+    """Wire format used to serialize envelopes sent through the queue."""
+
+    def encode(self, envelope: NetworkMessage) -> str:
+        """Serializes envelope to the string that is sent to the queue."""
+        raise NotImplemented('This is interface. Use implementation.')
+
+    def decode(self, data: Union[str, bytes]) -> List[NetworkMessage]:
+        """Parses data received from the queue, they can contain a single envelope or an array of them."""
+        raise NotImplemented('This is interface. Use implementation.')
+
+
+def _shallow_dict(obj: Any) -> Any:
+    # json encoder serializes nested values on its own, so there's no need to deep copy them as asdict does
+    if is_dataclass(obj):
+        return obj.__dict__
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class JsonCodec(Codec):
+    """Original JSON wire format, serializes data classes without copying them."""
+
+    def encode(self, envelope: NetworkMessage) -> str:
+        return json.dumps(envelope, default=_shallow_dict)
+
+    def decode(self, data: Union[str, bytes]) -> List[NetworkMessage]:
+        parsed = json.loads(data)
+        if isinstance(parsed, list):
+            return [decode_network_message(m) for m in parsed]
+        else:
+            return [decode_network_message(parsed)]
@@ -0,0 +1,172 @@
+import dataclasses
+import typing
+from typing import Any, Callable, Dict, List, Tuple, Type, TypeVar, Union
+
+T = TypeVar('T')
+
+Decoder = Callable[[Any], T]
+"""Function that validates raw data (parsed JSON) and constructs typed object from them."""
+
+
+class DecodingError(ValueError):
+    """Raised when the data do not match the type they should be decoded to."""
+
+
+class DecoderRegistry:
+    """Registry of precompiled decoders for the data classes.
+
+    Decoder for each data class is built only once - the type hints of the class are inspected
+    when the decoder is requested for the first time, then the decoder only validates
+    the data and calls the constructor, without any reflection.
+    """
+
+    def __init__(self):
+        self.__decoders: Dict[Any, Decoder] = {}
+
+    def decoder_for(self, data_class: Type[T]) -> Decoder[T]:
+        """Returns decoder for given data class, compiles it if it does not exist yet."""
+        decoder = self.__decoders.get(data_class)
+        if decoder is None:
+            try:
+                decoder = self.__compile(data_class)
+            except Exception:
+                self.__decoders.pop(data_class, None)
+                raise
+            self.__decoders[data_class] = decoder
+        return decoder
+
+    def decode(self, data_class: Type[T], data: Any) -> T:
+        """Decodes data as given data class."""
+        return self.decoder_for(data_class)(data)
+
+    def __compile(self, tp: Any) -> Decoder:
+        if dataclasses.is_dataclass(tp):
+            return self.__compile_data_class(tp)
+
+        if tp is Any:
+            return lambda value: value
+        if tp is float:
+            return _check_float
+        if tp is int:
+            return _check_int
+        if tp in (str, bool):
+            return _instance_checker(tp)
+
+        origin, args = typing.get_origin(tp), typing.get_args(tp)
+        if origin is Union:
+            return self.__compile_union(args)
+        if origin in (list, List):
+            return self.__compile_list(args[0] if args else Any)
+        if origin in (dict, Dict):
+            return self.__compile_dict(args[1] if args else Any)
+
+        raise TypeError(f'It is not possible to build decoder for type {tp}!')
+
+    def __compile_data_class(self, data_class: Any) -> Decoder:
+        # placeholder for recursive data classes, it is replaced at the end
+        self.__decoders[data_class] = lambda value: self.__decoders[data_class](value)
+
+        hints = typing.get_type_hints(data_class)
+        fields: List[Tuple[str, Decoder, bool, Callable[[], Any]]] = []
+        for field in dataclasses.fields(data_class):
+            if not field.init:
+                continue
+            required = field.default is dataclasses.MISSING and field.default_factory is dataclasses.MISSING
+            if field.default_factory is not dataclasses.MISSING:
+                default = field.default_factory
+            else:
+                default = (lambda d: lambda: d)(field.default)
+            fields.append((field.name, self.decoder_for(hints[field.name]), required, default))
+
+        class_name = data_class.__name__
+
+        def decode_data_class(value: Any) -> Any:
+            if isinstance(value, data_class):
+                return value
+            if not isinstance(value, dict):
+                raise DecodingError(f'{class_name} must be decoded from dict, not from {type(value).__name__}!')
+
+            kwargs = {}
+            for name, decoder, is_required, get_default in fields:
+                if name in value:
+                    try:
+                        kwargs[name] = decoder(value[name])
+                    except DecodingError as ex:
+                        raise DecodingError(f'Wrong value for field "{class_name}.{name}": {ex}') from None
+                elif is_required:
+                    raise DecodingError(f'Missing value for field "{class_name}.{name}"!')
+                else:
+                    kwargs[name] = get_default()
+            return data_class(**kwargs)
+
+        return decode_data_class
+
+    def __compile_union(self, args: Tuple[Any, ...]) -> Decoder:
+        is_optional = type(None) in args
+        decoders = [self.decoder_for(arg) for arg in args if arg is not type(None)]
+
+        if len(decoders) == 1:
+            single = decoders[0]
+
+            def decode_optional(value: Any) -> Any:
+                return None if value is None else single(value)
+
+            return decode_optional
+
+        def decode_union(value: Any) -> Any:
+            if value is None and is_optional:
+                return None
+            for decoder in decoders:
+                try:
+                    return decoder(value)
+                except DecodingError:
+                    continue
+            raise DecodingError(f'value "{value}" does not match any of {args}')
+
+        return decode_union
+
+    def __compile_list(self, item_type: Any) -> Decoder:
+        decode_item = self.decoder_for(item_type)
+
+        def decode_list(value: Any) -> list:
+            if not isinstance(value, list):
+                raise DecodingError(f'expected list, got "{value}" of type {type(value).__name__}')
+            return [decode_item(item) for item in value]
+
+        return decode_list
+
+    def __compile_dict(self, value_type: Any) -> Decoder:
+        decode_value = self.decoder_for(value_type)
+
+        def decode_dict(value: Any) -> dict:
+            if not isinstance(value, dict):
+                raise DecodingError(f'expected dict, got "{value}" of type {type(value).__name__}')
+            return {k: decode_value(v) for k, v in value.items()}
+
+        return decode_dict
+
+
+def _instance_checker(tp: type) -> Decoder:
+    def check(value: Any) -> Any:
+        if not isinstance(value, tp):
+            raise DecodingError(f'expected {tp.__name__}, got "{value}" of type {type(value).__name__}')
+        return value
+
+    return check
+
+
+def _check_int(value: Any) -> int:
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise DecodingError(f'expected int, got "{value}" of type {type(value).__name__}')
+    return value
+
+
+def _check_float(value: Any) -> float:
+    # JSON does not distinguish between 1 and 1.0, so int is a valid float as well
+    if not isinstance(value, (float, int)) or isinstance(value, bool):
+        raise DecodingError(f'expected float, got "{value}" of type {type(value).__name__}')
+    return value
+
+
+decoders = DecoderRegistry()
+"""Global registry of decoders shared across the messaging."""
@@ -0,0 +1,175 @@
+import itertools
+import queue
+import threading
+import zlib
+from enum import Enum
+from typing import Callable, List, Optional
+
+from fides.utils.logger import Logger
+from fides.utils.metrics import metrics
+
+logger = Logger(__name__)
+
+
+class Backpressure(Enum):
+    """What should dispatcher do when the worker's buffer is full."""
+    BLOCK = 'block'
+    """Block the caller until there's space in the buffer."""
+    DROP = 'drop'
+    """Drop the task and continue."""
+    RAISE = 'raise'
+    """Raise DispatcherFullError."""
+
+
+class DispatcherFullError(Exception):
+    """Raised when the task can not be accepted because the buffer is full."""
+
+
+class Dispatcher:
+    """Executes tasks on a fixed pool of worker threads.
+
+    Each worker has its own bounded buffer. Tasks with the same key are always executed
+    by the same worker, thus they're executed in the same order as they were submitted.
+    Tasks without the key are distributed between workers in round-robin fashion.
+    """
+
+    def __init__(self,
+                 workers: int = 4,
+                 buffer_size: int = 1000,
+                 backpressure: Backpressure = Backpressure.BLOCK,
+                 block_timeout_seconds: Optional[float] = None,
+                 name: str = 'dispatcher'):
+        """
+        :param workers: number of worker threads
+        :param buffer_size: maximal number of tasks waiting for each worker
+        :param backpressure: what to do when the buffer is full
+        :param block_timeout_seconds: how long to wait for space in the buffer when using Backpressure.BLOCK,
+        None means forever, when the timeout elapses, the task is dropped
+        :param name: prefix for the worker thread names
+        """
+        self.__backpressure = backpressure
+        self.__block_timeout_seconds = block_timeout_seconds
+        self.__round_robin = itertools.count()
+
+        self.__unfinished = 0
+        self.__dropped = 0
+        self.__state = threading.Condition()
+        self.__closed = False
+        # set when the workers should stop even though the tasks were not finished
+        self.__stopped = threading.Event()
+
+        self.__buffers: List[queue.Queue] = [queue.Queue(maxsize=buffer_size) for _ in range(max(1, workers))]
+        self.__workers = [threading.Thread(target=self.__work, args=(buffer,), name=f'{name}-{i}', daemon=True)
+                          for i, buffer in enumerate(self.__buffers)]
+        for worker in self.__workers:
+            worker.start()
+
+        # workers and gauges keep the dispatcher alive, they're released by close
+        self.__name = name
+        self.__gauges = {
+            'fides_dispatcher_pending': metrics.gauge_function(
+                'fides_dispatcher_pending', 'Tasks submitted to the dispatcher and not finished yet.',
+                lambda: self.pending, name, labels=('dispatcher',)),
+            'fides_dispatcher_dropped': metrics.gauge_function(
+                'fides_dispatcher_dropped', 'Tasks dropped by the dispatcher because of backpressure.',
+                lambda: self.dropped, name, labels=('dispatcher',))
+        }
+
+    @property
+    def dropped(self) -> int:
+        """Number of tasks that were dropped because of the backpressure."""
+        return self.__dropped
+
+    @property
+    def pending(self) -> int:
+        """Number of tasks that were submitted but not finished yet."""
+        return self.__unfinished
+
+    def is_worker_thread(self) -> bool:
+        """True if the current thread is one of the workers of this dispatcher."""
+        return threading.current_thread() in self.__workers
+
+    def submit(self, task: Callable[[], None], key: Optional[str] = None) -> bool:
+        """Submits task for the execution, returns False if the task was dropped."""
+        if key is None:
+            index = next(self.__round_robin) % len(self.__buffers)
+        else:
+            index = zlib.crc32(key.encode()) % len(self.__buffers)
+
+        # close waits for the counted tasks, so no task can be put after the worker was stopped
+        with self.__state:
+            if self.__closed:
+                raise DispatcherFullError('Dispatcher is closed!')
+            self.__unfinished += 1
+
+        try:
+            if self.__backpressure == Backpressure.BLOCK:
+                self.__buffers[index].put(task, block=True, timeout=self.__block_timeout_seconds)
+            else:
+                self.__buffers[index].put_nowait(task)
+            return True
+        except queue.Full:
+            self.__task_done(dropped=True)
+            if self.__backpressure == Backpressure.RAISE:
+                raise DispatcherFullError(f'Buffer of worker {index} is full!')
+            logger.warn(f'Buffer of worker {index} is full, dropping task.')
+            return False
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Waits until all submitted tasks are finished, returns False if the timeout elapsed."""
+        with self.__state:
+            return self.__state.wait_for(lambda: self.__unfinished == 0, timeout=timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """Finishes all submitted tasks and stops the workers.
+
+        If the tasks are not finished within the timeout, the workers drop the rest of them and stop.
+        """
+        with self.__state:
+            self.__closed = True
+        if not self.join(timeout):
+            logger.warn(f'Tasks of {self.__name} were not finished in {timeout}s, dropping the rest of them.')
+            self.__stopped.set()
+        for buffer in self.__buffers:
+            try:
+                buffer.put_nowait(None)
+            except queue.Full:
+                # worker sees the stop after its current task
+                pass
+        for worker in self.__workers:
+            if worker is not threading.current_thread():
+                worker.join(timeout)
+        for gauge_name, gauge in self.__gauges.items():
+            metrics.unregister(gauge_name, gauge, self.__name)
+
+    def __work(self, buffer: queue.Queue):
+        while True:
+            task = buffer.get()
+            if task is None:
+                return
+            if self.__stopped.is_set():
+                self.__drop_rest(task, buffer)
+                return
+            # noinspection PyBroadException
+            try:
+                task()
+            except Exception as ex:
+                logger.error(f'Error when executing task: {ex}')
+            finally:
+                self.__task_done()
+
+    def __drop_rest(self, task: Callable[[], None], buffer: queue.Queue):
+        while task is not None:
+            self.__task_done(dropped=True)
+            try:
+                task = buffer.get_nowait()
+            except queue.Empty:
+                return
+
+    def __task_done(self, dropped: bool = False):
+        with self.__state:
+            self.__unfinished -= 1
+            if dropped:
+                self.__dropped += 1
+            if self.__unfinished == 0:
+                self.__state.notify_all()
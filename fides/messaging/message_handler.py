@@ -1,7 +1,7 @@
-from typing import Dict, List, Callable, Optional, Union
-
-from dacite import from_dict
+from itertools import groupby
+from typing import Any, Dict, List, Callable, Optional, Union, Tuple
 
+from fides.messaging.decoders import decoders
 from fides.messaging.model import NetworkMessage, PeerInfo, \
     PeerIntelligenceResponse, PeerRecommendationResponse
 from fides.model.alert import Alert
@@ -9,9 +9,18 @@ from fides.model.aliases import PeerId, Target
 from fides.model.recommendation import Recommendation
 from fides.model.threat_intelligence import ThreatIntelligence
 from fides.utils.logger import Logger
+from fides.utils.metrics import metrics
 
 logger = Logger(__name__)
 
+_handler_seconds = metrics.histogram('fides_handler_seconds', 'Time spent handling the message.', ('type',))
+_handler_errors = metrics.counter('fides_handler_errors_total', 'Messages whose handler failed.', ('type',))
+
+decode_peer_info = decoders.decoder_for(PeerInfo)
+decode_recommendation = decoders.decoder_for(Recommendation)
+decode_threat_intelligence = decoders.decoder_for(ThreatIntelligence)
+decode_alert = decoders.decoder_for(Alert)
+
 
 class MessageHandler:
     """
@@ -32,15 +41,20 @@ class MessageHandler:
                  on_unknown: Optional[Callable[[NetworkMessage], None]] = None,
                  on_error: Optional[Callable[[Union[str, NetworkMessage], Exception], None]] = None
                  ):
-        self.__on_peer_list_update_callback = on_peer_list_update
-        self.__on_recommendation_request_callback = on_recommendation_request
-        self.__on_recommendation_response_callback = on_recommendation_response
-        self.__on_alert_callback = on_alert
-        self.__on_intelligence_request_callback = on_intelligence_request
-        self.__on_intelligence_response_callback = on_intelligence_response
         self.__on_unknown_callback = on_unknown
         self.__on_error = on_error
 
+        # dispatch table is built only once, not for every message
+        self.__execution_map: Dict[str, Tuple[Callable[[Any], tuple], Callable]] = {
+            'nl2tl_peers_list': (self.__decode_nl2tl_peer_list, on_peer_list_update),
+            'nl2tl_recommendation_request': (self.__decode_nl2tl_recommendation_request, on_recommendation_request),
+            'nl2tl_recommendation_response': (self.__decode_nl2tl_recommendation_response,
+                                              on_recommendation_response),
+            'nl2tl_alert': (self.__decode_nl2tl_alert, on_alert),
+            'nl2tl_intelligence_request': (self.__decode_nl2tl_intelligence_request, on_intelligence_request),
+            'nl2tl_intelligence_response': (self.__decode_nl2tl_intelligence_response, on_intelligence_response)
+        }
+
     def on_message(self, message: NetworkMessage):
         """
         Entry point for generic messages coming from the queue.
@@ -48,29 +62,102 @@ class MessageHandler:
         :param message: message from the queue
         :return: value from the underlining function from the constructor
         """
-        if message.version != self.version:
-            logger.warn(f'Unknown message version! This handler supports {self.version}.', message)
-            return self.__on_unknown_message(message)
-
-        execution_map = {
-            'nl2tl_peers_list': self.__on_nl2tl_peer_list,
-            'nl2tl_recommendation_request': self.__on_nl2tl_recommendation_request,
-            'nl2tl_recommendation_response': self.__on_nl2tl_recommendation_response,
-            'nl2tl_alert': self.__on_nl2tl_alert,
-            'nl2tl_intelligence_request': self.__on_nl2tl_intelligence_request,
-            'nl2tl_intelligence_response': self.__on_nl2tl_intelligence_response
-        }
-        func = execution_map.get(message.type, lambda data: self.__on_unknown_message(message))
+        started = metrics.start()
         # we want to handle everything
         # noinspection PyBroadException
         try:
+            callback, args = self._resolve(message)
             # we know that the functions can handle that, and if not, there's always error handling
             # noinspection PyArgumentList
-            return func(message.data)
+            return callback(*args)
         except Exception as ex:
-            logger.error(f"Error when executing handler for message: {message.type}.", ex)
-            if self.__on_error:
-                return self.__on_error(message, ex)
+            _handler_errors.labels(message.type).inc()
+            return self._handle_error(message, ex)
+        finally:
+            if started is not None:
+                _handler_seconds.labels(message.type).observe_since(started)
+
+    def _resolve(self, message: NetworkMessage) -> Tuple[Callable, tuple]:
+        """Parses the message and returns the procedure that should be executed with its arguments."""
+        if message.version != self.version:
+            logger.warn(f'Unknown message version! This handler supports {self.version}.', message)
+            return self.__on_unknown_message, (message,)
+
+        decode_and_callback = self.__execution_map.get(message.type)
+        if decode_and_callback is None:
+            return self.__on_unknown_message, (message,)
+
+        logger.debug(f'{message.type} message')
+        decode, callback = decode_and_callback
+        return callback, decode(message.data)
+
+    def _handle_error(self, message: NetworkMessage, ex: Exception):
+        """Executed when the handler for the message failed."""
+        logger.error(f"Error when executing handler for message: {message.type}.", ex)
+        if self.__on_error:
+            return self.__on_error(message, ex)
+
+    def on_messages(self, messages: List[NetworkMessage]):
+        """
+        Entry point for a batch of messages coming from the queue.
+
+        Messages are dispatched in the order in which they arrived. Consecutive messages
+        of the same type that can be processed together are merged, so the underlining handler
+        is executed (and the trust data are loaded and stored) once per such run instead of once per message:
+
+        - only the latest peer list of the run is processed as it supersedes the previous ones
+        - intelligence responses are merged per target
+        - recommendation responses are merged per subject
+
+        When a run contains more responses from the same sender about the same target (or subject),
+        only the latest one is processed, just like when the sender answers the same request twice.
+        :param messages: messages from the queue
+        """
+        for message in self._merge_batch(messages):
+            self.on_message(message)
+
+    def _merge_batch(self, messages: List[NetworkMessage]) -> List[NetworkMessage]:
+        """Merges consecutive messages of the same type that can be processed together, see on_messages."""
+        merged_batch = []
+        for message_type, run in groupby(messages, key=lambda m: m.type):
+            group = list(run)
+            # noinspection PyBroadException
+            try:
+                merged_batch.extend(self.__merge_group(message_type, group))
+            except Exception as ex:
+                logger.warn(f'It was not possible to merge messages of type {message_type}, '
+                            f'processing them one by one. {ex}')
+                merged_batch.extend(group)
+        return merged_batch
+
+    def __merge_group(self, message_type: str, group: List[NetworkMessage]) -> List[NetworkMessage]:
+        # we merge only messages we understand, the rest is processed one by one
+        mergeable = [m for m in group if m.version == self.version]
+        rest = [m for m in group if m.version != self.version]
+        if len(mergeable) <= 1:
+            return group
+
+        if message_type == 'nl2tl_peers_list':
+            merged = [mergeable[-1]]
+        elif message_type == 'nl2tl_intelligence_response':
+            merged = self.__merge_responses(mergeable, lambda single: single['payload']['target'])
+        elif message_type == 'nl2tl_recommendation_response':
+            merged = self.__merge_responses(mergeable, lambda single: single['payload']['subject'])
+        else:
+            merged = mergeable
+        return merged + rest
+
+    def __merge_responses(self,
+                          messages: List[NetworkMessage],
+                          key: Callable[[Dict], str]) -> List[NetworkMessage]:
+        # key -> sender id -> response, only the latest response from the sender is used
+        responses: Dict[str, Dict[PeerId, Dict]] = {}
+        for message in messages:
+            for single in message.data:
+                responses.setdefault(key(single), {})[single['sender']['id']] = single
+
+        return [NetworkMessage(type=messages[0].type, version=self.version, data=list(by_sender.values()))
+                for by_sender in responses.values()]
 
     def on_error(self, original_data: str, exception: Optional[Exception] = None):
         """
@@ -81,78 +168,54 @@ class MessageHandler:
         """
         logger.error(f'Unknown data received: {original_data}.')
         if self.__on_error:
-            self.__on_error(original_data, exception if exception else Exception('Unknown data type!'))
+            return self.__on_error(original_data, exception if exception else Exception('Unknown data type!'))
 
     def __on_unknown_message(self, message: NetworkMessage):
         logger.warn(f'Unknown message handler executed!')
         logger.debug(f'Message:', message)
 
         if self.__on_unknown_callback is not None:
-            self.__on_unknown_callback(message)
+            return self.__on_unknown_callback(message)
 
-    def __on_nl2tl_peer_list(self, data: Dict):
-        logger.debug('nl2tl_peer_list message')
-
-        peers = [from_dict(data_class=PeerInfo, data=peer) for peer in data['peers']]
-        return self.__on_peer_list_update(peers)
-
-    def __on_peer_list_update(self, peers: List[PeerInfo]):
-        return self.__on_peer_list_update_callback(peers)
-
-    def __on_nl2tl_recommendation_request(self, data: Dict):
-        logger.debug('nl2tl_recommendation_request message')
+    @staticmethod
+    def __decode_nl2tl_peer_list(data: Dict) -> Tuple[List[PeerInfo]]:
+        peers = [decode_peer_info(peer) for peer in data['peers']]
+        return peers,
 
+    @staticmethod
+    def __decode_nl2tl_recommendation_request(data: Dict) -> Tuple[str, PeerInfo, PeerId]:
         request_id = data['request_id']
-        sender = from_dict(data_class=PeerInfo, data=data['sender'])
+        sender = decode_peer_info(data['sender'])
         subject = data['payload']
-        return self.__on_recommendation_request(request_id, sender, subject)
-
-    def __on_recommendation_request(self, request_id: str, sender: PeerInfo, subject: PeerId):
-        return self.__on_recommendation_request_callback(request_id, sender, subject)
-
-    def __on_nl2tl_recommendation_response(self, data: List[Dict]):
-        logger.debug('nl2tl_recommendation_response message')
+        return request_id, sender, subject
 
+    @staticmethod
+    def __decode_nl2tl_recommendation_response(data: List[Dict]) -> Tuple[List[PeerRecommendationResponse]]:
         responses = [PeerRecommendationResponse(
-            sender=from_dict(data_class=PeerInfo, data=single['sender']),
+            sender=decode_peer_info(single['sender']),
             subject=single['payload']['subject'],
-            recommendation=from_dict(data_class=Recommendation, data=single['payload']['recommendation'])
+            recommendation=decode_recommendation(single['payload']['recommendation'])
         ) for single in data]
-        return self.__on_recommendation_response(responses)
-
-    def __on_recommendation_response(self, recommendations: List[PeerRecommendationResponse]):
-        return self.__on_recommendation_response_callback(recommendations)
-
-    def __on_nl2tl_alert(self, data: Dict):
-        logger.debug('nl2tl_alert message')
-
-        sender = from_dict(data_class=PeerInfo, data=data['sender'])
-        alert = from_dict(data_class=Alert, data=data['payload'])
-        return self.__on_alert(sender, alert)
+        return responses,
 
-    def __on_alert(self, sender: PeerInfo, alert: Alert):
-        return self.__on_alert_callback(sender, alert)
-
-    def __on_nl2tl_intelligence_request(self, data: Dict):
-        logger.debug('nl2tl_intelligence_request message')
+    @staticmethod
+    def __decode_nl2tl_alert(data: Dict) -> Tuple[PeerInfo, Alert]:
+        sender = decode_peer_info(data['sender'])
+        alert = decode_alert(data['payload'])
+        return sender, alert
 
+    @staticmethod
+    def __decode_nl2tl_intelligence_request(data: Dict) -> Tuple[str, PeerInfo, Target]:
         request_id = data['request_id']
-        sender = from_dict(data_class=PeerInfo, data=data['sender'])
+        sender = decode_peer_info(data['sender'])
         target = data['payload']
-        return self.__on_intelligence_request(request_id, sender, target)
-
-    def __on_intelligence_request(self, request_id: str, sender: PeerInfo, target: Target):
-        return self.__on_intelligence_request_callback(request_id, sender, target)
-
-    def __on_nl2tl_intelligence_response(self, data: Dict):
-        logger.debug('nl2tl_intelligence_response message')
+        return request_id, sender, target
 
+    @staticmethod
+    def __decode_nl2tl_intelligence_response(data: List[Dict]) -> Tuple[List[PeerIntelligenceResponse]]:
         responses = [PeerIntelligenceResponse(
-            sender=from_dict(data_class=PeerInfo, data=single['sender']),
-            intelligence=from_dict(data_class=ThreatIntelligence, data=single['payload']['intelligence']),
+            sender=decode_peer_info(single['sender']),
+            intelligence=decode_threat_intelligence(single['payload']['intelligence']),
             target=single['payload']['target']
         ) for single in data]
-        return self.__on_intelligence_response(responses)
-
-    def __on_intelligence_response(self, responses: List[PeerIntelligenceResponse]):
-        return self.__on_intelligence_response_callback(responses)
+        return responses,
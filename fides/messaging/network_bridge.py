@@ -1,20 +1,24 @@
-import json
-from dataclasses import asdict
-from typing import Dict, List
-
-from dacite import from_dict
+from typing import Dict, List, Optional, Union
 
+from fides.messaging.batch import MessageBatcher, BatchStatistics
+from fides.messaging.codec import Codec, JsonCodec
 from fides.messaging.message_handler import MessageHandler
 from fides.messaging.model import NetworkMessage
 from fides.messaging.queue import Queue
+from fides.messaging.reliability import ReliabilityPublisher
 from fides.model.alert import Alert
 from fides.model.aliases import PeerId, Target
 from fides.model.recommendation import Recommendation
 from fides.model.threat_intelligence import ThreatIntelligence
 from fides.utils.logger import Logger
+from fides.utils.metrics import metrics
 
 logger = Logger(__name__)
 
+_decode_seconds = metrics.histogram('fides_decode_seconds', 'Time spent parsing data received from the queue.')
+_sent_messages = metrics.counter('fides_sent_messages_total', 'Messages sent to the queue.', ('type',))
+_send_errors = metrics.counter('fides_send_errors_total', 'Messages that could not be sent.', ('type',))
+
 
 class NetworkBridge:
     """
@@ -25,22 +29,71 @@ class NetworkBridge:
     """
     version = 1
 
-    def __init__(self, queue: Queue):
+    def __init__(self,
+                 queue: Queue,
+                 reliability_window_seconds: float = 0,
+                 reliability_epsilon: Optional[float] = None,
+                 codec: Optional[Codec] = None):
+        """
+        :param queue: queue used for communication with the network layer
+        :param reliability_window_seconds: for how long should be peers reliability updates buffered before
+        they're sent, 0 means that they're sent immediately
+        :param reliability_epsilon: send reliability of the peer only if it changed more than epsilon since
+        the last time it was sent, None means that every update is sent
+        :param codec: wire format of the sent and received messages, None means JSON
+        """
         self.__queue = queue
-
-    def listen(self, handler: MessageHandler, block: bool = False):
+        self.__codec: Codec = codec if codec else JsonCodec()
+        self.__batcher: Optional[MessageBatcher[NetworkMessage]] = None
+        self.__reliability_publisher: Optional[ReliabilityPublisher] = None
+        if reliability_window_seconds > 0 or reliability_epsilon is not None:
+            self.__reliability_publisher = ReliabilityPublisher(
+                send=self.__send_peers_reliability,
+                window_seconds=reliability_window_seconds,
+                epsilon=reliability_epsilon if reliability_epsilon is not None else -1
+            )
+
+    @property
+    def batch_statistics(self) -> Optional[BatchStatistics]:
+        """Throughput statistics of the batch ingestion, None if the batching is disabled."""
+        return self.__batcher.statistics if self.__batcher else None
+
+    def listen(self,
+               handler: MessageHandler,
+               block: bool = False,
+               batch_size: int = 1,
+               linger_seconds: float = 0.05):
         """Starts messages processing
 
         If :param: block = False, this method won't block this thread.
+
+        The queue can deliver either a single envelope or a JSON array of envelopes.
+        If :param: batch_size > 1, received messages are buffered and dispatched to the handler
+        in batches of at most :param: batch_size messages, or after :param: linger_seconds
+        passed since the first buffered message.
         """
+        if batch_size > 1:
+            self.__batcher = MessageBatcher(handler.on_messages, batch_size, linger_seconds,
+                                            on_error=lambda batch, e: handler.on_error(str(batch), e))
+        else:
+            self.__batcher = None
 
         def message_received(message: str):
             try:
-                logger.debug(f'New message received! Trying to parse.')
-                parsed = json.loads(message)
-                network_message = from_dict(data_class=NetworkMessage, data=parsed)
+                network_messages = self._parse(message)
+            except Exception as e:
+                logger.error(f'There was an error parsing message, Exception: {e}.')
+                handler.on_error(message, e)
+                return
+
+            try:
                 logger.debug('Message parsed. Executing handler.')
-                handler.on_message(network_message)
+                if self.__batcher:
+                    self.__batcher.add(network_messages)
+                elif len(network_messages) == 1:
+                    handler.on_message(network_messages[0])
+                else:
+                    handler.on_messages(network_messages)
             except Exception as e:
                 logger.error(f'There was an error processing message, Exception: {e}.')
                 handler.on_error(message, e)
@@ -48,6 +101,32 @@ class NetworkBridge:
         logger.info(f'Starts listening...')
         return self.__queue.listen(message_received, block=block)
 
+    def _parse(self, message: Union[str, bytes]) -> List[NetworkMessage]:
+        """Parses message received from the queue, it can contain a single envelope or an array of them."""
+        logger.debug(f'New message received! Trying to parse.')
+        started = metrics.start()
+        parsed = self.__codec.decode(message)
+        _decode_seconds.observe_since(started)
+        return parsed
+
+    def _serialize(self, envelope: NetworkMessage) -> str:
+        """Serializes envelope to the string that is sent to the queue."""
+        return self.__codec.encode(envelope)
+
+    def flush(self):
+        """Processes all messages that are waiting in the current batch and sends buffered reliability updates."""
+        if self.__batcher:
+            self.__batcher.flush()
+        if self.__reliability_publisher:
+            self.__reliability_publisher.flush()
+
+    def close(self):
+        """Flushes all buffered data, should be called before shutdown."""
+        if self.__batcher:
+            self.__batcher.flush()
+        if self.__reliability_publisher:
+            self.__reliability_publisher.close()
+
     def send_intelligence_response(self, request_id: str, target: Target, intelligence: ThreatIntelligence):
         """Shares Intelligence with peer that requested it. request_id comes from the first request."""
         envelope = NetworkMessage(
@@ -58,7 +137,7 @@ class NetworkBridge:
                 'payload': {'target': target, 'intelligence': intelligence}
             }
         )
-        return self.__send(envelope)
+        return self._send(envelope)
 
     def send_intelligence_request(self, target: Target):
         """Requests network intelligence from the network regarding this target."""
@@ -67,7 +146,7 @@ class NetworkBridge:
             version=self.version,
             data={'payload': target}
         )
-        return self.__send(envelope)
+        return self._send(envelope)
 
     def send_alert(self, target: Target, intelligence: ThreatIntelligence):
         """Broadcasts alert through the network about the target."""
@@ -82,7 +161,7 @@ class NetworkBridge:
                 )
             }
         )
-        return self.__send(envelope)
+        return self._send(envelope)
 
     def send_recommendation_response(self, request_id: str,
                                      recipient: PeerId,
@@ -98,7 +177,7 @@ class NetworkBridge:
                 'payload': {'subject': subject, 'recommendation': recommendation}
             }
         )
-        return self.__send(envelope)
+        return self._send(envelope)
 
     def send_recommendation_request(self, recipients: List[PeerId], peer: PeerId):
         """Request recommendation from recipients on given peer."""
@@ -110,22 +189,47 @@ class NetworkBridge:
                 'payload': peer
             }
         )
-        return self.__send(envelope)
+        return self._send(envelope)
 
     def send_peers_reliability(self, reliability: Dict[PeerId, float]):
-        """Sends peer reliability, this message is only for network layer and is not dispatched to the network."""
+        """Sends peer reliability, this message is only for network layer and is not dispatched to the network.
+
+        If the bridge was configured to coalesce reliability updates, they're buffered and sent later.
+        """
+        if self.__reliability_publisher:
+            return self.__reliability_publisher.publish(reliability)
+        return self.__send_peers_reliability(reliability)
+
+    def send_backpressure(self, peer_id: PeerId, message_type: str, retry_after_seconds: float):
+        """Tells the network layer that messages of given type from the peer are being rejected,
+        so it can slow the peer down before they even reach us. This message is only for network layer."""
+        envelope = NetworkMessage(
+            type='tl2nl_backpressure',
+            version=self.version,
+            data={
+                'peer_id': peer_id,
+                'message_type': message_type,
+                'retry_after_seconds': retry_after_seconds
+            }
+        )
+        return self._send(envelope)
+
+    def __send_peers_reliability(self, reliability: Dict[PeerId, float]):
         data = [{'peer_id': key, 'reliability': value} for key, value in reliability.items()]
         envelope = NetworkMessage(
             type='tl2nl_peers_reliability',
             version=self.version,
             data=data
         )
-        return self.__send(envelope)
+        return self._send(envelope)
 
-    def __send(self, envelope: NetworkMessage):
+    def _send(self, envelope: NetworkMessage):
         logger.debug('Sending', envelope)
         try:
-            j = json.dumps(asdict(envelope))
-            return self.__queue.send(j)
+            j = self._serialize(envelope)
+            result = self.__queue.send(j)
+            _sent_messages.labels(envelope.type).inc()
+            return result
         except Exception as ex:
+            _send_errors.labels(envelope.type).inc()
             logger.error(f'Exception during sending an envelope: {ex}.', envelope)
@@ -0,0 +1,295 @@
+import threading
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass, field, replace
+from typing import Deque, Dict, List, Optional, Tuple
+
+from fides.messaging.dispatcher import Backpressure, DispatcherFullError
+from fides.messaging.message_handler import MessageHandler
+from fides.messaging.model import NetworkMessage
+from fides.utils.logger import Logger
+from fides.utils.metrics import metrics
+
+logger = Logger(__name__)
+
+_lane_wait_seconds = metrics.histogram('fides_lane_wait_seconds', 'Time messages spent waiting in the priority lane.',
+                                       ('lane',))
+_lane_dropped = metrics.counter('fides_lane_dropped_total', 'Messages dropped because the priority lane was full.',
+                                ('lane',))
+
+
+@dataclass(frozen=True)
+class Lane:
+    """Group of message types that are processed with the same priority."""
+
+    name: str
+    """Name of the lane, used in statistics."""
+
+    types: List[str]
+    """Message types that belong to this lane."""
+
+    weight: int
+    """How many messages from this lane are processed compared to lanes with weight 1,
+    when all lanes have something to process."""
+
+    capacity: int = 10_000
+    """Maximal number of messages waiting in the lane, see PrioritizedMessageDispatcher backpressure."""
+
+
+DEFAULT_LANES: List[Lane] = [
+    Lane(name='critical', types=['nl2tl_alert', 'nl2tl_intelligence_response'], weight=8),
+    Lane(name='requests', types=['nl2tl_intelligence_request', 'nl2tl_recommendation_request',
+                                 'nl2tl_recommendation_response'], weight=2),
+    Lane(name='bulk', types=['nl2tl_peers_list'], weight=1)
+]
+"""Alerts and intelligence responses Slips is waiting for go first, large peer list updates last."""
+
+
+@dataclass
+class LaneStatistics:
+    """Observable state of a single lane."""
+
+    depth: int = 0
+    """Number of messages waiting in the lane."""
+
+    processed: int = 0
+    """Number of messages processed from the lane."""
+
+    total_wait_seconds: float = 0
+    """Time all processed messages spent waiting in the lane."""
+
+    max_wait_seconds: float = 0
+    """Longest time a processed message spent waiting in the lane."""
+
+    dropped: int = 0
+    """Number of messages dropped because the lane was full."""
+
+    last_wait_seconds: float = 0
+    """How long did the last processed message wait in the lane."""
+
+    @property
+    def average_wait_seconds(self) -> float:
+        """Average time the processed messages spent waiting in the lane."""
+        return self.total_wait_seconds / self.processed if self.processed else 0
+
+
+class MessageAdmission:
+    """Decides whether received message is put to the lane, see PrioritizedMessageDispatcher."""
+
+    def admit_message(self, message: NetworkMessage) -> bool:
+        """Returns False if the message should be dropped, every admitted message is released."""
+        raise NotImplemented('This is interface. Use implementation.')
+
+    def release_message(self, message: NetworkMessage):
+        """Marks admitted message as processed or dropped."""
+        raise NotImplemented('This is interface. Use implementation.')
+
+
+@dataclass
+class _LaneState:
+    lane: Lane
+    messages: Deque[Tuple[float, NetworkMessage]] = field(default_factory=deque)
+    statistics: LaneStatistics = field(default_factory=LaneStatistics)
+    current_weight: int = 0
+
+
+class PrioritizedMessageDispatcher:
+    """
+    Dispatch layer in front of the MessageHandler that processes messages by priority lanes.
+
+    Received messages are put to the lane of their type and a single worker thread hands them over
+    to the handler. When more lanes have waiting messages, the next one is selected by smooth weighted
+    round-robin, so the lane with weight 8 gets eight turns for every turn of the lane with weight 1,
+    but even the lowest lane is never starved. Messages inside one lane keep their order.
+
+    Each lane holds at most Lane.capacity messages, what happens with the message that does not fit
+    is determined by the backpressure - by default it is dropped, as blocking the queue listener
+    would only move the backlog to the Redis client buffers.
+
+    If the admission is set, messages are admitted when they're received, before they're put to the lane,
+    so the rejected ones don't take space in the lanes and the admitted ones count to the load
+    while they're waiting.
+
+    It exposes the same entry points as the MessageHandler, so it can be passed to NetworkBridge.listen.
+    """
+
+    def __init__(self,
+                 handler: MessageHandler,
+                 lanes: Optional[List[Lane]] = None,
+                 default_lane: Optional[str] = None,
+                 start: bool = True,
+                 backpressure: Backpressure = Backpressure.DROP,
+                 block_timeout_seconds: Optional[float] = None,
+                 admission: Optional[MessageAdmission] = None):
+        """
+        :param handler: handler that processes the messages
+        :param lanes: priority lanes, DEFAULT_LANES if None
+        :param default_lane: name of the lane for types that are not in any lane, defaults to the last lane
+        :param start: whether to start the worker thread, if False, messages are processed only by drain
+        :param backpressure: what to do when the lane is full, Backpressure.BLOCK must not be used without
+        the worker thread
+        :param block_timeout_seconds: how long to wait for space in the lane when using Backpressure.BLOCK,
+        None means forever, when the timeout elapses, the message is dropped
+        :param admission: decides which messages are put to the lanes, if None, all messages are
+        """
+        lanes = lanes if lanes else DEFAULT_LANES
+        self.__handler = handler
+        self.__lanes: List[_LaneState] = [_LaneState(lane=lane) for lane in lanes]
+        self.__lane_by_type: Dict[str, _LaneState] = {t: state for state in self.__lanes for t in state.lane.types}
+        self.__default_lane = self.__find_lane(default_lane) if default_lane else self.__lanes[-1]
+        self.__backpressure = backpressure
+        self.__block_timeout_seconds = block_timeout_seconds
+        self.__admission = admission
+
+        self.__state = threading.Condition()
+        self.__processing_lock = threading.Lock()
+        self.__closed = False
+        self.__thread: Optional[threading.Thread] = None
+        for state in self.__lanes:
+            metrics.gauge_function('fides_lane_depth', 'Messages waiting in the priority lane.',
+                                   self.__depth_reader(state), state.lane.name, labels=('lane',))
+        if start:
+            self.__thread = threading.Thread(target=self.__work, name='prioritized-dispatcher', daemon=True)
+            self.__thread.start()
+
+    @property
+    def statistics(self) -> Dict[str, LaneStatistics]:
+        """Snapshot of the statistics per lane."""
+        with self.__state:
+            return {state.lane.name: replace(state.statistics, depth=len(state.messages)) for state in self.__lanes}
+
+    def on_message(self, message: NetworkMessage):
+        """Puts the message to its lane, it is processed later by the worker."""
+        self.__enqueue([message])
+
+    def on_messages(self, messages: List[NetworkMessage]):
+        """Merges the batch the same way the handler does and puts the messages to their lanes."""
+        # noinspection PyProtectedMember
+        self.__enqueue(self.__handler._merge_batch(messages))
+
+    def on_error(self, original_data: str, exception: Optional[Exception] = None):
+        """Data that can not be parsed are not queued, the handler is executed directly."""
+        return self.__handler.on_error(original_data, exception)
+
+    def drain(self):
+        """Processes all waiting messages on the current thread, in the priority order."""
+        while self.__process_next():
+            pass
+
+    def close(self, timeout: Optional[float] = None):
+        """Processes all waiting messages and stops the worker."""
+        with self.__state:
+            self.__closed = True
+            self.__state.notify_all()
+        if self.__thread is not None and self.__thread is not threading.current_thread():
+            self.__thread.join(timeout)
+        else:
+            self.drain()
+
+    @staticmethod
+    def __depth_reader(state: _LaneState):
+        # registry must not keep the lane alive
+        ref = weakref.ref(state)
+        return lambda: len(ref().messages) if ref() else 0
+
+    def __find_lane(self, name: str) -> _LaneState:
+        for state in self.__lanes:
+            if state.lane.name == name:
+                return state
+        raise ValueError(f'Lane {name} does not exist!')
+
+    def __enqueue(self, messages: List[NetworkMessage]):
+        if self.__admission is not None:
+            messages = [m for m in messages if self.__admission.admit_message(m)]
+        now = time.monotonic()
+        pending = deque(messages)
+        try:
+            with self.__state:
+                while pending:
+                    message = pending.popleft()
+                    state = self.__lane_by_type.get(message.type, self.__default_lane)
+                    if self.__has_space(state):
+                        state.messages.append((now, message))
+                        # senders waiting for space use the same condition, so the worker must be woken up for sure
+                        self.__state.notify_all()
+                    else:
+                        self.__drop(state, message)
+        finally:
+            # drop can raise, the rest of the batch was admitted, but it is never going to be processed
+            if self.__admission is not None:
+                for message in pending:
+                    self.__admission.release_message(message)
+
+    def __has_space(self, state: _LaneState) -> bool:
+        if len(state.messages) < state.lane.capacity:
+            return True
+        if self.__backpressure != Backpressure.BLOCK:
+            return False
+        # worker notifies all waiting threads after every processed message
+        return self.__state.wait_for(lambda: len(state.messages) < state.lane.capacity,
+                                     timeout=self.__block_timeout_seconds)
+
+    def __drop(self, state: _LaneState, message: NetworkMessage):
+        if self.__admission is not None:
+            self.__admission.release_message(message)
+        state.statistics.dropped += 1
+        _lane_dropped.labels(state.lane.name).inc()
+        if self.__backpressure == Backpressure.RAISE:
+            raise DispatcherFullError(f'Lane {state.lane.name} is full!')
+        logger.warn(f'Lane {state.lane.name} is full, dropping {message.type}.')
+
+    def __select(self) -> Optional[_LaneState]:
+        # smooth weighted round-robin over the lanes that have something to process
+        waiting = [state for state in self.__lanes if state.messages]
+        if not waiting:
+            return None
+        if len(waiting) == 1:
+            return waiting[0]
+
+        total = 0
+        for state in waiting:
+            state.current_weight += state.lane.weight
+            total += state.lane.weight
+        selected = max(waiting, key=lambda s: s.current_weight)
+        selected.current_weight -= total
+        return selected
+
+    def __process_next(self) -> bool:
+        # only one message is processed at the time, the handler and protocols are not thread safe
+        with self.__processing_lock:
+            with self.__state:
+                state = self.__select()
+                if state is None:
+                    return False
+                enqueued_at, message = state.messages.popleft()
+                # there might be senders waiting for the space in the lane
+                self.__state.notify_all()
+                waited = time.monotonic() - enqueued_at
+                _lane_wait_seconds.labels(state.lane.name).observe(waited)
+                stats = state.statistics
+                stats.processed += 1
+                stats.total_wait_seconds += waited
+                stats.last_wait_seconds = waited
+                stats.max_wait_seconds = max(stats.max_wait_seconds, waited)
+
+            logger.debug(lambda: f'Processing {message.type} from lane {state.lane.name}, waited {waited:.6f}s.')
+            # the worker must survive anything the handler throws
+            # noinspection PyBroadException
+            try:
+                self.__handler.on_message(message)
+            except Exception as ex:
+                logger.error(f'Error when processing {message.type} from lane {state.lane.name}! {ex}')
+            finally:
+                if self.__admission is not None:
+                    self.__admission.release_message(message)
+            return True
+
+    def __work(self):
+        while True:
+            with self.__state:
+                while not self.__closed and not any(state.messages for state in self.__lanes):
+                    self.__state.wait()
+                if self.__closed and not any(state.messages for state in self.__lanes):
+                    return
+            self.__process_next()
@@ -1,36 +1,85 @@
+import itertools
+import json
 import threading
 from typing import Callable, Optional
 
+from fides.messaging.dispatcher import Dispatcher, Backpressure
 from fides.messaging.queue import Queue
 from fides.utils.logger import Logger
 
 logger = Logger(__name__)
 
+_instances = itertools.count()
+
 
 class InMemoryQueue(Queue):
     """In Memory implementation of Queue.
 
+    Messages are delivered by a fixed pool of worker threads, see Dispatcher.
+
     This should not be used in production.
     """
 
-    def __init__(self, on_message: Optional[Callable[[str], None]] = None):
+    def __init__(self,
+                 on_message: Optional[Callable[[str], None]] = None,
+                 workers: int = 4,
+                 buffer_size: int = 1000,
+                 backpressure: Backpressure = Backpressure.BLOCK,
+                 key_selector: Optional[Callable[[str], Optional[str]]] = None,
+                 name: Optional[str] = None):
+        """
+        :param on_message: callback executed when there's new message
+        :param workers: number of threads that deliver messages
+        :param buffer_size: maximal number of undelivered messages per worker
+        :param backpressure: what to do when the buffer is full
+        :param key_selector: function that selects key from the message, messages with the same key
+        are delivered in the same order as they were sent, see envelope_key
+        :param name: name of the delivery threads and of the dispatcher in the metrics,
+        if None, unique name is generated for every queue
+        """
+
         def default_on_message(data: str):
             InMemoryQueue.__exception(data)
 
         self.__on_message: Callable[[str], None] = on_message if on_message else default_on_message
+        self.__key_selector = key_selector
+        self.__dispatcher = Dispatcher(workers=workers,
+                                       buffer_size=buffer_size,
+                                       backpressure=backpressure,
+                                       name=name if name else f'in-memory-queue-{next(_instances)}')
+
+    def send(self, serialized_data: str, should_wait_for_join: bool = False, key: Optional[str] = None, **argv):
+        """Sends serialized data to the queue.
 
-    def send(self, serialized_data: str, should_wait_for_join: bool = False, **argv):
-        """Sends serialized data to the queue."""
+        If :param: should_wait_for_join = True, waits until this message is delivered.
+        When called from the on_message callback, the message is then delivered in the calling thread,
+        as the delivery thread might be the one that is waiting.
+        :param: key overrides key selected by the key_selector.
+        :return: False if the message was dropped because of the backpressure
+        """
         logger.debug('New data received for send.')
-        if self.__on_message is None:
-            self.__exception(serialized_data)
+        if should_wait_for_join and self.__dispatcher.is_worker_thread():
+            self.__on_message(serialized_data)
+            return True
+
+        if key is None and self.__key_selector is not None:
+            key = self.__key_selector(serialized_data)
 
-        th = threading.Thread(target=lambda: self.__on_message(serialized_data))
-        th.start()
-        if should_wait_for_join:
-            th.join()
+        if not should_wait_for_join:
+            return self.__dispatcher.submit(lambda: self.__on_message(serialized_data), key=key)
 
-        return th
+        delivered = threading.Event()
+
+        def deliver():
+            try:
+                self.__on_message(serialized_data)
+            finally:
+                delivered.set()
+
+        accepted = self.__dispatcher.submit(deliver, key=key)
+        if accepted:
+            delivered.wait()
+        return accepted
 
     def listen(self, on_message: Callable[[str], None], **argv):
         """Starts listening, executes :param: on_message when new message arrives.
@@ -38,6 +87,36 @@ class InMemoryQueue(Queue):
         """
         self.__on_message = on_message
 
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Waits until all sent messages are delivered, returns False if the timeout elapsed.
+
+        Must not be called from the on_message callback.
+        """
+        return self.__dispatcher.join(timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """Delivers all sent messages and stops the delivery threads."""
+        self.__dispatcher.close(timeout)
+
+    @staticmethod
+    def envelope_key(serialized_data: str) -> Optional[str]:
+        """Key selector that selects sender of the network message, or the target / subject it is about."""
+        # noinspection PyBroadException
+        try:
+            data = json.loads(serialized_data).get('data')
+            if isinstance(data, list):
+                data = data[0] if data else {}
+            if not isinstance(data, dict):
+                return None
+            if isinstance(data.get('sender'), dict):
+                return data['sender'].get('id')
+            payload = data.get('payload')
+            if isinstance(payload, dict):
+                return payload.get('target', payload.get('subject'))
+            return payload if isinstance(payload, str) else None
+        except Exception:
+            return None
+
     @staticmethod
     def __exception(data: str):
         raise Exception(f'No on_message set! Call listen before calling send! Data: {data}')
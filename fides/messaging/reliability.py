@@ -0,0 +1,62 @@
+import threading
+from typing import Callable, Dict, Optional
+
+from fides.model.aliases import PeerId
+from fides.utils.logger import Logger
+
+logger = Logger(__name__)
+
+
+class ReliabilityPublisher:
+    """Coalesces peers reliability updates before they are sent to the network layer.
+
+    Updates are buffered per peer for :param: window_seconds, only the latest value for each peer is kept.
+    When the window elapses, only peers whose reliability moved more than :param: epsilon
+    since the last time it was sent are published.
+    """
+
+    def __init__(self,
+                 send: Callable[[Dict[PeerId, float]], None],
+                 window_seconds: float,
+                 epsilon: float):
+        self.__send = send
+        self.__window_seconds = window_seconds
+        self.__epsilon = epsilon
+
+        self.__pending: Dict[PeerId, float] = {}
+        self.__last_sent: Dict[PeerId, float] = {}
+        self.__lock = threading.Lock()
+        self.__timer: Optional[threading.Timer] = None
+
+    def publish(self, reliability: Dict[PeerId, float]):
+        """Buffers reliability updates, flushes them immediately if there's no window."""
+        with self.__lock:
+            self.__pending.update(reliability)
+            if self.__window_seconds > 0 and self.__timer is None:
+                self.__timer = threading.Timer(self.__window_seconds, self.flush)
+                self.__timer.daemon = True
+                self.__timer.start()
+
+        if self.__window_seconds <= 0:
+            self.flush()
+
+    def flush(self):
+        """Sends all pending updates that changed more than epsilon."""
+        with self.__lock:
+            pending, self.__pending = self.__pending, {}
+            if self.__timer is not None:
+                self.__timer.cancel()
+                self.__timer = None
+
+            changed = {peer_id: value for peer_id, value in pending.items()
+                       if peer_id not in self.__last_sent
+                       or abs(self.__last_sent[peer_id] - value) > self.__epsilon}
+            self.__last_sent.update(changed)
+
+        if changed:
+            logger.debug(f'Publishing reliability for {len(changed)} out of {len(pending)} updated peers.')
+            self.__send(changed)
+
+    def close(self):
+        """Flushes pending updates, should be called before shutdown."""
+        self.flush()
@@ -0,0 +1,146 @@
+import heapq
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fides.model.aliases import Target
+from fides.model.threat_intelligence import SlipsThreatIntelligence
+from fides.utils.logger import Logger
+from fides.utils.time import Time, now
+
+logger = Logger(__name__)
+
+DEFAULT_SWEEP_INTERVAL_SECONDS = 60
+"""How often do the trust databases sweep expired entries from the caches they create."""
+
+
+def adaptive_ttl_seconds(ti: SlipsThreatIntelligence,
+                         ttl_seconds: float,
+                         min_ttl_fraction: float = 0.1,
+                         negative_ttl_seconds: float = 30) -> float:
+    """Computes for how long should be the opinion cached.
+
+    Opinions are valid for ttl_seconds scaled by their confidence, but at least for min_ttl_fraction of it,
+    so the low confidence verdicts are refreshed sooner. Opinions with zero confidence mean that the network
+    knew nothing about the target, those are cached only for negative_ttl_seconds.
+    """
+    if ti.confidence <= 0:
+        return min(negative_ttl_seconds, ttl_seconds)
+    return ttl_seconds * max(min_ttl_fraction, min(1.0, ti.confidence))
+
+
+class NetworkOpinionCache:
+    """Bounded cache of aggregated network opinions.
+
+    Holds at most max_entries targets, when it is full the least recently used one is evicted.
+    Expired entries are removed by the sweep, which is executed on every put and optionally
+    by the background thread, so the memory stays flat no matter how many distinct targets are seen.
+    """
+
+    def __init__(self,
+                 ttl_seconds: float,
+                 max_entries: int = 100_000,
+                 min_ttl_fraction: float = 0.1,
+                 negative_ttl_seconds: float = 30,
+                 sweep_interval_seconds: Optional[float] = None,
+                 clock: Callable[[], Time] = now):
+        """
+        :param ttl_seconds: for how long is the opinion with confidence 1 valid
+        :param max_entries: maximal number of cached targets
+        :param min_ttl_fraction: lower bound of the TTL as a fraction of ttl_seconds, for low confidence opinions
+        :param negative_ttl_seconds: for how long is cached opinion with zero confidence
+        :param sweep_interval_seconds: how often should the background thread remove expired entries,
+        None means that there's no thread and expired entries are removed only during put
+        :param clock: source of the current time
+        """
+        self.__ttl_seconds = ttl_seconds
+        self.__max_entries = max_entries
+        self.__min_ttl_fraction = min_ttl_fraction
+        self.__negative_ttl_seconds = negative_ttl_seconds
+        self.__clock = clock
+
+        self.__lock = threading.Lock()
+        # target -> (expires at, opinion), ordered from the least recently used
+        self.__entries: Dict[Target, Tuple[Time, SlipsThreatIntelligence]] = OrderedDict()
+        # min-heap of (expires at, target), contains stale items for replaced or evicted entries
+        self.__expirations: List[Tuple[Time, Target]] = []
+
+        self.__stopped = threading.Event()
+        self.__sweeper: Optional[threading.Thread] = None
+        if sweep_interval_seconds:
+            # sweeper holds only weak reference, so it stops once the cache is not used anymore even without close
+            self.__sweeper = threading.Thread(target=_sweep_periodically,
+                                              args=(weakref.ref(self), self.__stopped, sweep_interval_seconds),
+                                              name='opinion-cache-sweeper', daemon=True)
+            self.__sweeper.start()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def ttl_for(self, ti: SlipsThreatIntelligence) -> float:
+        """Returns for how long would be the opinion cached."""
+        return adaptive_ttl_seconds(ti, self.__ttl_seconds, self.__min_ttl_fraction, self.__negative_ttl_seconds)
+
+    def put(self, ti: SlipsThreatIntelligence):
+        """Caches the opinion, replaces any previous opinion on the same target."""
+        current = self.__clock()
+        expires_at = current + self.ttl_for(ti)
+        with self.__lock:
+            self.__entries[ti.target] = expires_at, ti
+            self.__entries.move_to_end(ti.target)
+            heapq.heappush(self.__expirations, (expires_at, ti.target))
+
+            self.__remove_expired(current)
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+            # heap holds stale items of the replaced and evicted entries, rebuild it before it grows too much
+            if len(self.__expirations) > 2 * max(len(self.__entries), 1024):
+                self.__expirations = [(expires, target) for target, (expires, _) in self.__entries.items()]
+                heapq.heapify(self.__expirations)
+
+    def get(self, target: Target) -> Optional[SlipsThreatIntelligence]:
+        """Returns cached opinion on the target or None if there's none or it expired."""
+        with self.__lock:
+            entry = self.__entries.get(target)
+            if entry is None:
+                return None
+            expires_at, ti = entry
+            if expires_at <= self.__clock():
+                del self.__entries[target]
+                return None
+            self.__entries.move_to_end(target)
+            return ti
+
+    def sweep(self) -> int:
+        """Removes all expired entries, returns how many of them were removed."""
+        with self.__lock:
+            return self.__remove_expired(self.__clock())
+
+    def close(self):
+        """Stops the background sweeping."""
+        self.__stopped.set()
+        if self.__sweeper is not None and self.__sweeper is not threading.current_thread():
+            self.__sweeper.join()
+
+    def __remove_expired(self, current: Time) -> int:
+        removed = 0
+        while self.__expirations and self.__expirations[0][0] <= current:
+            expires_at, target = heapq.heappop(self.__expirations)
+            entry = self.__entries.get(target)
+            # the item might be stale, the entry could have been replaced with a newer one
+            if entry is not None and entry[0] == expires_at:
+                del self.__entries[target]
+                removed += 1
+        return removed
+
+
+def _sweep_periodically(ref: 'weakref.ref[NetworkOpinionCache]', stopped: threading.Event, interval_seconds: float):
+    while not stopped.wait(interval_seconds):
+        cache = ref()
+        if cache is None:
+            return
+        removed = cache.sweep()
+        if removed:
+            logger.debug(lambda: f'Removed {removed} expired network opinions, {len(cache)} left.')
+        del cache
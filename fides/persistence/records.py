@@ -0,0 +1,82 @@
+import struct
+from typing import List, Optional, Tuple, Union
+
+from fides.model.peer import PeerInfo
+from fides.model.peer_trust_data import PeerTrustData
+from fides.model.recommendation_history import RecommendationHistoryRecord
+from fides.model.service_history import ServiceHistoryRecord
+
+# service_trust, reputation, recommendation_trust, competence_belief, integrity_belief,
+# initial_reputation_provided_by_count, has_fixed_trust,
+# length of id, length of ip (_NO_IP if there's none), number of organisations,
+# number of service history records, number of recommendation history records
+_HEADER = struct.Struct('<dddddI?HHHII')
+_HISTORY_RECORD = struct.Struct('<ddd')
+_LENGTH = struct.Struct('<H')
+_NO_IP = 0xFFFF
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def encode_trust_record(trust: PeerTrustData) -> bytes:
+    """Encodes trust data of a single peer to the compact binary record.
+
+    Scalars are in the fixed size header, strings follow as UTF-8 and histories as packed doubles.
+    """
+    info = trust.info
+    peer_id = info.id.encode()
+    ip = info.ip.encode() if info.ip is not None else b''
+    organisations = [o.encode() for o in info.organisations]
+
+    parts: List[bytes] = [
+        _HEADER.pack(trust.service_trust, trust.reputation, trust.recommendation_trust,
+                     trust.competence_belief, trust.integrity_belief,
+                     trust.initial_reputation_provided_by_count, trust.has_fixed_trust,
+                     len(peer_id), len(ip) if info.ip is not None else _NO_IP, len(organisations),
+                     len(trust.service_history), len(trust.recommendation_history)),
+        peer_id,
+        ip
+    ]
+    for organisation in organisations:
+        parts.append(_LENGTH.pack(len(organisation)))
+        parts.append(organisation)
+    parts.extend(_HISTORY_RECORD.pack(r.satisfaction, r.weight, r.timestamp) for r in trust.service_history)
+    parts.extend(_HISTORY_RECORD.pack(r.satisfaction, r.weight, r.timestamp) for r in trust.recommendation_history)
+    return b''.join(parts)
+
+
+def decode_trust_record(record: Buffer) -> PeerTrustData:
+    """Decodes trust data encoded by encode_trust_record, record can be a slice of memory mapped file."""
+    (service_trust, reputation, recommendation_trust, competence_belief, integrity_belief,
+     initial_count, has_fixed_trust, id_length, ip_length, organisations_count,
+     service_count, recommendation_count) = _HEADER.unpack_from(record)
+
+    position = _HEADER.size + id_length
+    peer_id = str(record[_HEADER.size:position], 'utf-8')
+    ip: Optional[str] = None
+    if ip_length != _NO_IP:
+        ip = str(record[position:position + ip_length], 'utf-8')
+        position += ip_length
+
+    organisations = []
+    for _ in range(organisations_count):
+        length, = _LENGTH.unpack_from(record, position)
+        position += _LENGTH.size
+        organisations.append(str(record[position:position + length], 'utf-8'))
+        position += length
+
+    service_history, position = _unpack_history(ServiceHistoryRecord, service_count, record, position)
+    recommendation_history, _ = _unpack_history(RecommendationHistoryRecord, recommendation_count, record, position)
+
+    # positional arguments, this is executed for every peer when the database is loaded
+    return PeerTrustData(PeerInfo(peer_id, organisations, ip), has_fixed_trust,
+                         service_trust, reputation, recommendation_trust, competence_belief, integrity_belief,
+                         initial_count, service_history, recommendation_history)
+
+
+def _unpack_history(record_type, count: int, record: Buffer, position: int) -> Tuple[list, int]:
+    if not count:
+        return [], position
+    # one unpack for the whole history, records are then built from every third value
+    values = struct.unpack_from(f'<{3 * count}d', record, position)
+    return list(map(record_type, values[0::3], values[1::3], values[2::3])), position + _HISTORY_RECORD.size * count
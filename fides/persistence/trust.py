@@ -1,4 +1,5 @@
-from typing import List, Optional, Union
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Union
 
 from fides.messaging.model import PeerInfo
 from fides.model.aliases import PeerId, Target, OrganisationId
@@ -7,6 +8,42 @@ from fides.model.peer_trust_data import PeerTrustData, TrustMatrix
 from fides.model.threat_intelligence import SlipsThreatIntelligence
 
 
+@dataclass
+class BulkWriteResult:
+    """Outcome of the bulk write, a failure of one peer does not prevent storing the others."""
+
+    stored: List[PeerId] = field(default_factory=list)
+    """Peers whose data were stored."""
+
+    failed: Dict[PeerId, str] = field(default_factory=dict)
+    """Peers whose data were not stored, with the reason."""
+
+    @property
+    def ok(self) -> bool:
+        """True if data of all peers were stored."""
+        return not self.failed
+
+
+@dataclass
+class BulkUpdateResult(BulkWriteResult):
+    """Outcome of the bulk update, peers whose update returned None are neither stored nor failed."""
+
+    updated: TrustMatrix = field(default_factory=dict)
+    """New trust data of the stored peers."""
+
+
+class TrustUpdateError(Exception):
+    """Trust data of the peer were not updated."""
+
+
+TrustUpdate = Callable[[Optional[PeerTrustData]], Optional[PeerTrustData]]
+"""Computes new trust data of the peer from the current ones, which are None if there are no data for the peer.
+
+If it returns None, the data of the peer are left as they are. It can be called more than once
+by the databases that retry conflicting updates, so it should not have side effects.
+"""
+
+
 class TrustDatabase:
     """Class responsible for persisting data for trust model."""
 
@@ -45,17 +82,48 @@ class TrustDatabase:
         """Stores trust data for given peer - overwrites any data if existed."""
         raise NotImplemented()
 
-    def store_peer_trust_matrix(self, trust_matrix: TrustMatrix):
-        """Stores trust matrix."""
-        for peer in trust_matrix.values():
-            self.store_peer_trust_data(peer)
+    def store_peer_trust_matrix(self, trust_matrix: TrustMatrix) -> BulkWriteResult:
+        """Stores trust matrix and reports which peers were stored and which were not.
+
+        Implementations should override this with a native bulk write, this one writes peers one by one.
+        """
+        result = BulkWriteResult()
+        for peer_id, peer in trust_matrix.items():
+            try:
+                self.store_peer_trust_data(peer)
+                result.stored.append(peer_id)
+            except Exception as ex:
+                result.failed[peer_id] = str(ex)
+        return result
+
+    def update_peer_trust_data(self, peer_id: PeerId, update: TrustUpdate) -> Optional[PeerTrustData]:
+        """Atomically replaces trust data of the peer with the result of update applied to the current data.
+
+        Returns the new data, None if the update did not return any, raises TrustUpdateError if they were not stored.
+        """
+        result = self.update_peers_trust_data({peer_id: update})
+        if not result.ok:
+            raise TrustUpdateError(f'Trust data of peer {peer_id} were not updated! {result.failed[peer_id]}')
+        return result.updated.get(peer_id)
+
+    def update_peers_trust_data(self, updates: Dict[PeerId, TrustUpdate]) -> BulkUpdateResult:
+        """Applies each update to the current data of its peer and stores the results in one bulk write.
+
+        Update of each peer is atomic - no other write of the peer happens between the read and the write.
+        This implementation reads and writes without any synchronization, so it is correct only when
+        nothing else writes the peers at the same time, implementations should override it.
+        """
+        return self._store_updates(updates, self.get_peers_trust_data(list(updates.keys())))
 
     def get_peer_trust_data(self, peer: Union[PeerId, PeerInfo]) -> Optional[PeerTrustData]:
         """Returns trust data for given peer ID, if no data are found, returns None."""
         raise NotImplemented()
 
     def get_peers_trust_data(self, peer_ids: List[Union[PeerId, PeerInfo]]) -> TrustMatrix:
-        """Return trust data for each peer from peer_ids."""
+        """Return trust data for each peer from peer_ids, peers without data are not in the matrix.
+
+        Implementations should override this with a native bulk read, this one reads peers one by one.
+        """
         data = [self.get_peer_trust_data(peer_id) for peer_id in peer_ids]
         return {peer.peer_id: peer for peer in data if peer}
 
@@ -66,3 +134,31 @@ class TrustDatabase:
     def get_cached_network_opinion(self, target: Target) -> Optional[SlipsThreatIntelligence]:
         """Returns cached network opinion. Checks cache time and returns None if data expired."""
         raise NotImplemented()
+
+    def _store_updates(self, updates: Dict[PeerId, TrustUpdate], current: TrustMatrix) -> BulkUpdateResult:
+        """Computes new trust data from the current ones and stores them, a failed update fails only its peer."""
+        result = BulkUpdateResult()
+        trust_matrix = self._apply_updates(updates, current, result)
+        if not trust_matrix:
+            return result
+
+        written = self.store_peer_trust_matrix(trust_matrix)
+        result.stored.extend(written.stored)
+        result.failed.update(written.failed)
+        result.updated = {peer_id: trust_matrix[peer_id] for peer_id in written.stored}
+        return result
+
+    @staticmethod
+    def _apply_updates(updates: Dict[PeerId, TrustUpdate], current: TrustMatrix,
+                       result: BulkWriteResult) -> TrustMatrix:
+        """Computes new trust data from the current ones, peers whose update failed are reported in the result."""
+        trust_matrix: TrustMatrix = {}
+        for peer_id, update in updates.items():
+            try:
+                updated = update(current.get(peer_id))
+            except Exception as ex:
+                result.failed[peer_id] = f'Update failed! {ex}'
+                continue
+            if updated is not None:
+                trust_matrix[peer_id] = updated
+        return trust_matrix
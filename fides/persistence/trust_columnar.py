@@ -0,0 +1,264 @@
+import threading
+from typing import List, Optional, Union, Dict, Set, Tuple
+
+import numpy as np
+
+from fides.messaging.model import PeerInfo
+from fides.model.aliases import PeerId, Target, OrganisationId
+from fides.model.configuration import TrustModelConfiguration
+from fides.model.peer_trust_data import PeerTrustData, TrustMatrix
+from fides.model.threat_intelligence import SlipsThreatIntelligence
+from fides.persistence.opinion_cache import NetworkOpinionCache, DEFAULT_SWEEP_INTERVAL_SECONDS
+from fides.persistence.trust import TrustDatabase, BulkWriteResult, BulkUpdateResult, TrustUpdate
+from fides.utils.locks import StripedLock
+
+_FLOAT_COLUMNS = ('service_trust', 'reputation', 'recommendation_trust', 'competence_belief', 'integrity_belief')
+"""Scalar fields of PeerTrustData that are kept in float64 columns."""
+
+
+class ColumnarTrustDatabase(TrustDatabase):
+    """In-memory trust database that keeps scalar trust fields in contiguous NumPy arrays.
+
+    Every peer has a slot, which is an index to all columns. Scalars live in the arrays,
+    peer infos and histories, which are Python objects anyway, in lists indexed by the same slot.
+    No PeerTrustData objects are kept, they're built from the columns when they're read,
+    so the protocols can still derive new trust data with dataclasses.replace.
+
+    Threshold queries, top-k selection and reliability export are vector operations over the columns.
+
+    Reads and writes are serialized by one lock, so readers never see a half written row, a slot
+    of a peer that is not stored yet or columns that are being grown. Reads are vector operations,
+    so the lock is held only shortly. Updates hold the striped locks of their peers from the read to the write.
+    """
+
+    def __init__(self,
+                 configuration: TrustModelConfiguration,
+                 initial_capacity: int = 1024,
+                 opinion_cache: Optional[NetworkOpinionCache] = None):
+        """
+        :param configuration: trust model configuration
+        :param initial_capacity: number of peers the columns are allocated for, they're doubled when full
+        :param opinion_cache: cache for network opinions, if None, one with the default bounds and TTL
+        from the configuration is created, its expired entries are swept every minute
+        """
+        super().__init__(configuration)
+        self.__connected_peers: List[PeerInfo] = []
+        self.__capacity = max(1, initial_capacity)
+        self.__size = 0
+        self.__slots: Dict[PeerId, int] = {}
+        self.__floats: Dict[str, np.ndarray] = {name: np.zeros(self.__capacity) for name in _FLOAT_COLUMNS}
+        self.__initial_reputation_provided_by_count = np.zeros(self.__capacity, dtype=np.int64)
+        self.__has_fixed_trust = np.zeros(self.__capacity, dtype=bool)
+        self.__infos: List[PeerInfo] = []
+        self.__service_histories: list = []
+        self.__recommendation_histories: list = []
+        # organisations the peer is indexed with, peer info might have been modified in place since then
+        self.__organisations: List[Tuple[OrganisationId, ...]] = []
+        self.__organisation_index: Dict[OrganisationId, Set[PeerId]] = {}
+        self.__network_opinions = opinion_cache if opinion_cache else \
+            NetworkOpinionCache(ttl_seconds=configuration.network_opinion_cache_valid_seconds,
+                                sweep_interval_seconds=DEFAULT_SWEEP_INTERVAL_SECONDS)
+        # columns and slot table are shared by all peers, so the writes must not run in parallel with anything
+        self.__lock = threading.Lock()
+        self.__peer_locks = StripedLock()
+
+    def __len__(self) -> int:
+        """Number of peers in the database."""
+        return self.__size
+
+    def store_connected_peers_list(self, current_peers: List[PeerInfo]):
+        """Stores list of peers that are directly connected to the Slips."""
+        self.__connected_peers = current_peers
+
+    def get_connected_peers(self) -> List[PeerInfo]:
+        """Returns list of peers that are directly connected to the Slips."""
+        return list(self.__connected_peers)
+
+    def get_peers_info(self, peer_ids: List[PeerId]) -> List[PeerInfo]:
+        """Returns list of peer infos for given ids."""
+        with self.__lock:
+            return [self.__infos[slot] for p in peer_ids if (slot := self.__slots.get(p)) is not None]
+
+    def get_peers_with_organisations(self, organisations: List[OrganisationId]) -> List[PeerInfo]:
+        """Returns list of peers that have one of given organisations."""
+        peer_ids: Set[PeerId] = set()
+        with self.__lock:
+            for organisation in organisations:
+                peer_ids.update(self.__organisation_index.get(organisation, ()))
+        return self.get_peers_info(list(peer_ids))
+
+    def get_peers_with_geq_recommendation_trust(self, minimal_recommendation_trust: float) -> List[PeerInfo]:
+        """Returns peers that have >= recommendation_trust then the minimal."""
+        return self.__geq('recommendation_trust', minimal_recommendation_trust)
+
+    def get_peers_with_geq_service_trust(self, minimal_service_trust: float) -> List[PeerInfo]:
+        """Returns peers that have >= service_trust then the minimal."""
+        return self.__geq('service_trust', minimal_service_trust)
+
+    def get_top_peers_by_recommendation_trust(self, count: int) -> List[PeerInfo]:
+        """Returns at most count peers with the highest recommendation_trust, the most trusted first."""
+        return self.__top('recommendation_trust', count)
+
+    def get_top_peers_by_service_trust(self, count: int) -> List[PeerInfo]:
+        """Returns at most count peers with the highest service_trust, the most trusted first."""
+        return self.__top('service_trust', count)
+
+    def get_peers_reliability(self) -> Dict[PeerId, float]:
+        """Returns service trust of all peers, which is what is sent to the network layer as reliability."""
+        with self.__lock:
+            peer_ids = [info.id for info in self.__infos]
+            service_trust = self.__floats['service_trust'][:self.__size].tolist()
+        return dict(zip(peer_ids, service_trust))
+
+    def store_peer_trust_data(self, trust_data: PeerTrustData):
+        """Stores trust data for given peer - overwrites any data if existed."""
+        self.store_peer_trust_matrix({trust_data.peer_id: trust_data})
+
+    def store_peer_trust_matrix(self, trust_matrix: TrustMatrix) -> BulkWriteResult:
+        """Stores trust matrix, the scalars of all peers are written with one assignment per column.
+
+        Peers whose data can not be converted to column values are reported as failed and the rest is stored.
+        """
+        result = BulkWriteResult()
+        peers, rows = [], []
+        for peer_id, peer in trust_matrix.items():
+            try:
+                rows.append(_row(peer))
+            except Exception as ex:
+                result.failed[peer_id] = f'Trust data can not be converted! {ex}'
+                continue
+            peers.append(peer)
+            result.stored.append(peer_id)
+        if not peers:
+            return result
+
+        columns = list(zip(*rows))
+        with self.__peer_locks.locked(result.stored), self.__lock:
+            slots = np.fromiter((self.__slot_for(peer) for peer in peers), dtype=np.int64, count=len(peers))
+            for name, column in zip(_FLOAT_COLUMNS, columns):
+                self.__floats[name][slots] = column
+            self.__initial_reputation_provided_by_count[slots] = columns[-2]
+            self.__has_fixed_trust[slots] = columns[-1]
+        return result
+
+    def update_peers_trust_data(self, updates: Dict[PeerId, TrustUpdate]) -> BulkUpdateResult:
+        """Applies each update to the current data of its peer and stores the results in one bulk write."""
+        with self.__peer_locks.locked(updates.keys()):
+            return self._store_updates(updates, self.get_peers_trust_data(list(updates.keys())))
+
+    def get_peer_trust_data(self, peer: Union[PeerId, PeerInfo]) -> Optional[PeerTrustData]:
+        """Returns trust data for given peer ID, if no data are found, returns None."""
+        with self.__lock:
+            slot = self.__slots.get(peer.id if isinstance(peer, PeerInfo) else peer)
+            if slot is None:
+                return None
+            floats = [self.__floats[name].item(slot) for name in _FLOAT_COLUMNS]
+            return PeerTrustData(self.__infos[slot], self.__has_fixed_trust.item(slot), *floats,
+                                 self.__initial_reputation_provided_by_count.item(slot),
+                                 self.__service_histories[slot], self.__recommendation_histories[slot])
+
+    def get_peers_trust_data(self, peer_ids: List[Union[PeerId, PeerInfo]]) -> TrustMatrix:
+        """Return trust data for each peer from peer_ids, peers without data are not in the matrix."""
+        ids = (p.id if isinstance(p, PeerInfo) else p for p in peer_ids)
+        with self.__lock:
+            slots = [slot for peer_id in ids if (slot := self.__slots.get(peer_id)) is not None]
+            return self.__gather(slots)
+
+    def get_trust_matrix(self) -> TrustMatrix:
+        """Returns trust data of all peers."""
+        with self.__lock:
+            return self.__gather(list(range(self.__size)))
+
+    def cache_network_opinion(self, ti: SlipsThreatIntelligence):
+        """Caches aggregated opinion on given target, the cache is bounded and evicts old entries."""
+        self.__network_opinions.put(ti)
+
+    def get_cached_network_opinion(self, target: Target) -> Optional[SlipsThreatIntelligence]:
+        """Returns cached network opinion. Checks cache time and returns None if data expired."""
+        return self.__network_opinions.get(target)
+
+    def __gather(self, slots: List[int]) -> TrustMatrix:
+        """Builds trust data of the peers in given slots, must be called with the lock held."""
+        if not slots:
+            return {}
+        # gathered columns are converted to Python values at once, reading numpy scalars one by one is slow
+        floats = [self.__floats[name][slots].tolist() for name in _FLOAT_COLUMNS]
+        counts = self.__initial_reputation_provided_by_count[slots].tolist()
+        fixed = self.__has_fixed_trust[slots].tolist()
+        matrix = {}
+        for i, slot in enumerate(slots):
+            info = self.__infos[slot]
+            matrix[info.id] = PeerTrustData(info, fixed[i],
+                                            floats[0][i], floats[1][i], floats[2][i], floats[3][i], floats[4][i],
+                                            counts[i], self.__service_histories[slot],
+                                            self.__recommendation_histories[slot])
+        return matrix
+
+    def __geq(self, name: str, minimal: float) -> List[PeerInfo]:
+        with self.__lock:
+            slots = np.flatnonzero(self.__floats[name][:self.__size] >= minimal).tolist()
+            return [self.__infos[slot] for slot in slots]
+
+    def __top(self, name: str, count: int) -> List[PeerInfo]:
+        with self.__lock:
+            values = self.__floats[name][:self.__size]
+            count = min(count, len(values))
+            if count <= 0:
+                return []
+            # partition finds the top count slots in linear time, only those are then sorted
+            slots = np.argpartition(-values, count - 1)[:count] if count < len(values) else np.arange(len(values))
+            slots = slots[np.argsort(-values[slots], kind='stable')]
+            return [self.__infos[slot] for slot in slots.tolist()]
+
+    def __slot_for(self, trust_data: PeerTrustData) -> int:
+        """Returns slot of the peer, allocates one for a new peer, and stores the objects that are not in columns."""
+        info = trust_data.info
+        slot = self.__slots.get(info.id)
+        if slot is None:
+            slot = self.__allocate()
+            self.__slots[info.id] = slot
+            self.__infos.append(info)
+            self.__service_histories.append(trust_data.service_history)
+            self.__recommendation_histories.append(trust_data.recommendation_history)
+            self.__organisations.append(())
+        else:
+            self.__infos[slot] = info
+            self.__service_histories[slot] = trust_data.service_history
+            self.__recommendation_histories[slot] = trust_data.recommendation_history
+        self.__reindex_organisations(slot, info)
+        return slot
+
+    def __allocate(self) -> int:
+        if self.__size == self.__capacity:
+            self.__capacity *= 2
+            self.__floats = {name: self.__grown(column) for name, column in self.__floats.items()}
+            self.__initial_reputation_provided_by_count = self.__grown(self.__initial_reputation_provided_by_count)
+            self.__has_fixed_trust = self.__grown(self.__has_fixed_trust)
+        self.__size += 1
+        return self.__size - 1
+
+    def __grown(self, column: np.ndarray) -> np.ndarray:
+        grown = np.zeros(self.__capacity, dtype=column.dtype)
+        grown[:len(column)] = column
+        return grown
+
+    def __reindex_organisations(self, slot: int, info: PeerInfo):
+        organisations = tuple(info.organisations)
+        previous = self.__organisations[slot]
+        if previous == organisations:
+            return
+        for organisation in previous:
+            peers = self.__organisation_index.get(organisation)
+            if peers is not None:
+                peers.discard(info.id)
+                if not peers:
+                    del self.__organisation_index[organisation]
+        for organisation in organisations:
+            self.__organisation_index.setdefault(organisation, set()).add(info.id)
+        self.__organisations[slot] = organisations
+
+
+def _row(peer: PeerTrustData) -> tuple:
+    """Column values of the peer, in the order of _FLOAT_COLUMNS followed by the count and the fixed trust flag."""
+    return (*(float(getattr(peer, name)) for name in _FLOAT_COLUMNS),
+            int(peer.initial_reputation_provided_by_count), bool(peer.has_fixed_trust))
@@ -0,0 +1,248 @@
+import gc
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from typing import BinaryIO, List, Optional
+
+from fides.model.configuration import TrustModelConfiguration
+from fides.model.peer_trust_data import PeerTrustData, TrustMatrix
+from fides.persistence.opinion_cache import NetworkOpinionCache
+from fides.persistence.records import encode_trust_record, decode_trust_record
+from fides.persistence.trust import BulkWriteResult
+from fides.persistence.trust_in_memory import InMemoryTrustDatabase
+from fides.utils.logger import Logger
+
+logger = Logger(__name__)
+
+# WAL frame is length and crc32 of the record followed by the record
+_FRAME = struct.Struct('<II')
+# magic, version, reserved, first WAL generation that is not in the snapshot, number of records
+_SNAPSHOT_HEADER = struct.Struct('<8sIIQQ')
+_SNAPSHOT_MAGIC = b'FIDESSNP'
+_SNAPSHOT_VERSION = 1
+_SNAPSHOT_FILE = 'snapshot.bin'
+_WAL_FILE = re.compile(r'^wal-(\d+)\.log$')
+
+
+class DurableTrustDatabase(InMemoryTrustDatabase):
+    """In-memory trust database that survives restarts.
+
+    Every stored trust data are appended to the write-ahead log before they're applied in memory.
+    Periodically, the whole trust matrix is written to the snapshot, which is a memory mappable file
+    with the table of record offsets followed by the records. Each snapshot starts a new generation
+    of the WAL, the older ones are deleted once the snapshot is written.
+
+    On startup the snapshot is loaded and the WAL generations written after it are replayed.
+    Log is replayed until the first incomplete or corrupted record, which can be a write torn by a crash.
+
+    Only trust data are durable, connected peers are sent again by the network layer and cached
+    network opinions are short-lived anyway.
+    """
+
+    def __init__(self,
+                 configuration: TrustModelConfiguration,
+                 directory: str,
+                 snapshot_interval_seconds: Optional[float] = None,
+                 snapshot_wal_bytes: int = 64 * 1024 * 1024,
+                 fsync: bool = False,
+                 opinion_cache: Optional[NetworkOpinionCache] = None):
+        """
+        :param configuration: trust model configuration
+        :param directory: directory with the snapshot and WAL files, created if it does not exist
+        :param snapshot_interval_seconds: how often should the background thread write the snapshot,
+        None means that there's no thread
+        :param snapshot_wal_bytes: snapshot is written when the WAL grows over this size
+        :param fsync: whether to fsync the WAL after every write, otherwise the data are only flushed to the OS
+        :param opinion_cache: cache for network opinions, see InMemoryTrustDatabase
+        """
+        super().__init__(configuration, opinion_cache)
+        self.__directory = directory
+        self.__snapshot_wal_bytes = snapshot_wal_bytes
+        self.__fsync = fsync
+        # protects the WAL, stores are executed on the protocols thread and snapshots on the background one
+        self.__lock = threading.Lock()
+        self.__snapshot_lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self.__generation = self.__load()
+        self.__wal = self.__open_wal(self.__generation)
+
+        self.__stopped = threading.Event()
+        self.__snapshotter: Optional[threading.Thread] = None
+        if snapshot_interval_seconds:
+            self.__snapshotter = threading.Thread(target=self.__snapshot_periodically,
+                                                  args=(snapshot_interval_seconds,),
+                                                  name='trust-snapshotter', daemon=True)
+            self.__snapshotter.start()
+
+    def store_peer_trust_data(self, trust_data: PeerTrustData):
+        """Logs and stores trust data for given peer - overwrites any data if existed."""
+        result = self.store_peer_trust_matrix({trust_data.peer_id: trust_data})
+        if not result.ok:
+            raise OSError(f'Trust data of peer {trust_data.peer_id} were not stored! '
+                          f'{result.failed[trust_data.peer_id]}')
+
+    def store_peer_trust_matrix(self, trust_matrix: TrustMatrix) -> BulkWriteResult:
+        """Logs the whole matrix with a single write and then stores it in memory.
+
+        Peers whose data were not logged are not stored in memory either. Peers are locked before the WAL,
+        updates hold them while they call this method.
+        """
+        result = BulkWriteResult()
+        frames = bytearray()
+        logged: List[PeerTrustData] = []
+        for peer_id, peer in trust_matrix.items():
+            try:
+                record = encode_trust_record(peer)
+            except Exception as ex:
+                result.failed[peer_id] = f'Trust data can not be encoded! {ex}'
+                continue
+            frames += _FRAME.pack(len(record), zlib.crc32(record))
+            frames += record
+            logged.append(peer)
+
+        with self._locked_peers(trust_matrix.keys()), self.__lock:
+            try:
+                self.__wal.write(frames)
+                self.__wal.flush()
+                if self.__fsync:
+                    os.fsync(self.__wal.fileno())
+            except OSError as ex:
+                result.failed.update({peer.peer_id: f'Write-ahead log failed! {ex}' for peer in logged})
+                return result
+            super().store_peer_trust_matrix({peer.peer_id: peer for peer in logged})
+            result.stored.extend(peer.peer_id for peer in logged)
+            snapshot_needed = self.__wal.tell() > self.__snapshot_wal_bytes
+
+        if snapshot_needed:
+            self.snapshot()
+        return result
+
+    def snapshot(self):
+        """Writes all trust data to the snapshot and deletes the WAL that is not needed anymore.
+
+        Stores are blocked only while the WAL is rotated, records are encoded and written after that.
+        """
+        with self.__snapshot_lock:
+            with self.__lock:
+                # matrix holds everything that was logged up to now, the new writes go to the next generation
+                matrix = self.get_trust_matrix()
+                self.__wal.close()
+                self.__generation += 1
+                self.__wal = self.__open_wal(self.__generation)
+                generation = self.__generation
+
+            # matrix is immutable, so it can be read after the lock is released
+            peers = list(matrix.values())
+            self.__write_snapshot(peers, generation)
+            for old_generation, path in self.__wal_files():
+                if old_generation < generation:
+                    os.remove(path)
+            logger.debug(lambda: f'Snapshot of {len(peers)} peers written, WAL generation {generation}.')
+
+    def close(self):
+        """Stops the background snapshots and closes the WAL."""
+        self.__stopped.set()
+        if self.__snapshotter is not None and self.__snapshotter is not threading.current_thread():
+            self.__snapshotter.join()
+        with self.__lock:
+            self.__wal.close()
+
+    def __load(self) -> int:
+        """Loads snapshot and replays WAL, returns generation of the WAL that should be written next."""
+        # loading creates millions of objects that all survive, collecting them would only slow it down
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            generation = 0
+            path = os.path.join(self.__directory, _SNAPSHOT_FILE)
+            if os.path.exists(path):
+                generation = self.__load_snapshot(path)
+
+            replayed = 0
+            for wal_generation, wal_path in self.__wal_files():
+                if wal_generation < generation:
+                    # snapshot was written, but the process died before the old WAL was deleted
+                    os.remove(wal_path)
+                    continue
+                replayed += self.__replay(wal_path)
+                generation = wal_generation + 1
+        finally:
+            if gc_enabled:
+                gc.enable()
+        logger.info(f'Trust database loaded, {len(self.get_trust_matrix())} peers, {replayed} replayed WAL records.')
+        return generation
+
+    def __load_snapshot(self, path: str) -> int:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, _, generation, count = _SNAPSHOT_HEADER.unpack_from(mm)
+            if magic != _SNAPSHOT_MAGIC or version != _SNAPSHOT_VERSION:
+                raise ValueError(f'File {path} is not a trust snapshot of version {_SNAPSHOT_VERSION}!')
+            with memoryview(mm) as view:
+                offsets_end = _SNAPSHOT_HEADER.size + 8 * (count + 1)
+                with view[_SNAPSHOT_HEADER.size:offsets_end].cast('Q') as offsets, view[offsets_end:] as data:
+                    peers = [decode_trust_record(data[offsets[i]:offsets[i + 1]]) for i in range(count)]
+        super().store_peer_trust_matrix({peer.peer_id: peer for peer in peers})
+        return generation
+
+    def __write_snapshot(self, peers: List[PeerTrustData], generation: int):
+        records = [encode_trust_record(peer) for peer in peers]
+        offsets = [0] * (len(records) + 1)
+        for i, record in enumerate(records):
+            offsets[i + 1] = offsets[i] + len(record)
+
+        path = os.path.join(self.__directory, _SNAPSHOT_FILE)
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, _SNAPSHOT_VERSION, 0, generation, len(records)))
+            f.write(struct.pack(f'<{len(offsets)}Q', *offsets))
+            f.writelines(records)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+
+    def __replay(self, path: str) -> int:
+        with open(path, 'rb') as f:
+            data = f.read()
+        # later records overwrite the earlier ones, the same as if they were stored one by one
+        peers: TrustMatrix = {}
+        position, replayed = 0, 0
+        while position + _FRAME.size <= len(data):
+            length, crc = _FRAME.unpack_from(data, position)
+            record = data[position + _FRAME.size:position + _FRAME.size + length]
+            if len(record) != length or zlib.crc32(record) != crc:
+                logger.warn(f'WAL {path} has incomplete or corrupted record at {position}, ignoring the rest.')
+                break
+            peer = decode_trust_record(record)
+            peers.pop(peer.peer_id, None)
+            peers[peer.peer_id] = peer
+            position += _FRAME.size + length
+            replayed += 1
+        if position != len(data):
+            # cut the torn tail, so the new records are not appended after the garbage
+            with open(path, 'r+b') as f:
+                f.truncate(position)
+        super().store_peer_trust_matrix(peers)
+        return replayed
+
+    def __open_wal(self, generation: int) -> BinaryIO:
+        return open(os.path.join(self.__directory, f'wal-{generation:06d}.log'), 'ab')
+
+    def __wal_files(self) -> List[tuple]:
+        files = []
+        for name in os.listdir(self.__directory):
+            match = _WAL_FILE.match(name)
+            if match:
+                files.append((int(match.group(1)), os.path.join(self.__directory, name)))
+        return sorted(files)
+
+    def __snapshot_periodically(self, interval_seconds: float):
+        while not self.__stopped.wait(interval_seconds):
+            # noinspection PyBroadException
+            try:
+                self.snapshot()
+            except Exception as ex:
+                logger.error(f'Trust snapshot failed! {ex}')
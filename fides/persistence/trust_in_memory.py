@@ -1,29 +1,70 @@
-from typing import List, Optional, Union, Dict, Tuple
+import threading
+from dataclasses import dataclass
+from typing import Collection, ContextManager, List, Optional, Union, Dict, Set, Mapping, FrozenSet
 
 from fides.messaging.model import PeerInfo
 from fides.model.aliases import PeerId, Target, OrganisationId
 from fides.model.configuration import TrustModelConfiguration
 from fides.model.peer_trust_data import PeerTrustData, TrustMatrix
 from fides.model.threat_intelligence import SlipsThreatIntelligence
-from fides.persistence.trust import TrustDatabase
-from fides.utils.time import Time, now
+from fides.persistence.opinion_cache import NetworkOpinionCache, DEFAULT_SWEEP_INTERVAL_SECONDS
+from fides.persistence.trust import TrustDatabase, BulkWriteResult, BulkUpdateResult, TrustUpdate
+from fides.utils.locks import StripedLock
+from fides.utils.persistent import ShardedMap, ChunkedSortedList
+
+
+@dataclass(frozen=True)
+class _Generation:
+    """State of the database at one version, it is never modified once it was published to readers."""
+
+    version: int
+    trust_matrix: ShardedMap
+    # indexes are sorted (value, peer id), so the threshold queries are just bisection
+    service_trust_index: ChunkedSortedList
+    recommendation_trust_index: ChunkedSortedList
+    # sets are frozen, so they can be shared by generations
+    organisation_index: Dict[OrganisationId, FrozenSet[PeerId]]
+    # values the peer is indexed with, the stored object might have been modified in place since then
+    indexed: ShardedMap
 
 
 class InMemoryTrustDatabase(TrustDatabase):
     """Trust database implementation that stores data in memory.
 
+    Data are kept in immutable generations. Readers use the generation that is current when they start,
+    so they never block and never see a half-written matrix, even when the handlers run on other threads.
+    Writers create the next generation, which shares everything but the changed shards and chunks
+    with the current one, and publish it by a single assignment.
+
+    Updates of a peer hold the striped lock of the peer from the read to the write, stores take it too,
+    so no write of the peer can get between them, while updates of other peers run in parallel.
+
     This should not be in production, it is for tests mainly.
     """
 
-    def __init__(self, configuration: TrustModelConfiguration):
+    def __init__(self, configuration: TrustModelConfiguration, opinion_cache: Optional[NetworkOpinionCache] = None):
+        """
+        :param configuration: trust model configuration
+        :param opinion_cache: cache for network opinions, if None, one with the default bounds and TTL
+        from the configuration is created, its expired entries are swept every minute
+        """
         super().__init__(configuration)
         self.__connected_peers: List[PeerInfo] = []
-        self.__trust_matrix: TrustMatrix = {}
-        self.__network_opinions: Dict[Target, Tuple[Time, SlipsThreatIntelligence]] = {}
+        self.__generation = _Generation(0, ShardedMap(), ChunkedSortedList(), ChunkedSortedList(), {}, ShardedMap())
+        # serializes writers, readers do not take it
+        self.__write_lock = threading.Lock()
+        self.__peer_locks = StripedLock()
+        self.__network_opinions = opinion_cache if opinion_cache else \
+            NetworkOpinionCache(ttl_seconds=configuration.network_opinion_cache_valid_seconds,
+                                sweep_interval_seconds=DEFAULT_SWEEP_INTERVAL_SECONDS)
+
+    def get_version(self) -> int:
+        """Returns version of the trust data, it is increased by every write."""
+        return self.__generation.version
 
     def store_connected_peers_list(self, current_peers: List[PeerInfo]):
         """Stores list of peers that are directly connected to the Slips."""
-        self.__connected_peers = current_peers
+        self.__connected_peers = list(current_peers)
 
     def get_connected_peers(self) -> List[PeerInfo]:
         """Returns list of peers that are directly connected to the Slips."""
@@ -31,42 +72,136 @@ class InMemoryTrustDatabase(TrustDatabase):
 
     def get_peers_with_organisations(self, organisations: List[OrganisationId]) -> List[PeerInfo]:
         """Returns list of peers that have one of given organisations."""
-        required = set(organisations)
-        return [p.info for p in self.__trust_matrix.values() if len(required.intersection(p.organisations)) > 0]
+        generation = self.__generation
+        peer_ids: Set[PeerId] = set()
+        for organisation in organisations:
+            peer_ids.update(generation.organisation_index.get(organisation, ()))
+        return [generation.trust_matrix[peer_id].info for peer_id in peer_ids]
 
     def get_peers_with_geq_recommendation_trust(self, minimal_recommendation_trust: float) -> List[PeerInfo]:
         """Returns peers that have >= recommendation_trust then the minimal."""
-        return [p.info for p in self.__trust_matrix.values() if p.recommendation_trust >= minimal_recommendation_trust]
+        generation = self.__generation
+        return self.__geq(generation, generation.recommendation_trust_index, minimal_recommendation_trust)
 
     def store_peer_trust_data(self, trust_data: PeerTrustData):
         """Stores trust data for given peer - overwrites any data if existed."""
-        self.__trust_matrix[trust_data.peer_id] = trust_data
+        with self._locked_peers([trust_data.peer_id]):
+            self.__write([trust_data])
+
+    def store_peer_trust_matrix(self, trust_matrix: TrustMatrix) -> BulkWriteResult:
+        """Stores trust matrix as a single new generation, writes to memory can not fail."""
+        with self._locked_peers(trust_matrix.keys()):
+            self.__write(list(trust_matrix.values()))
+        return BulkWriteResult(stored=list(trust_matrix.keys()))
+
+    def update_peers_trust_data(self, updates: Dict[PeerId, TrustUpdate]) -> BulkUpdateResult:
+        """Applies each update to the current data of its peer and stores the results in one bulk write.
+
+        Peers are locked from the read to the write, the results are stored by store_peer_trust_matrix,
+        so subclasses that override it store the updates in the same way as any other data.
+        """
+        with self._locked_peers(updates.keys()):
+            return self._store_updates(updates, self.get_peers_trust_data(list(updates.keys())))
+
+    def get_trust_matrix(self) -> Mapping[PeerId, PeerTrustData]:
+        """Returns read-only trust data of all peers as they are in the current generation."""
+        return self.__generation.trust_matrix
 
     def get_peer_trust_data(self, peer: Union[PeerId, PeerInfo]) -> Optional[PeerTrustData]:
         """Returns trust data for given peer ID, if no data are found, returns None."""
         peer_id = peer
         if isinstance(peer, PeerInfo):
             peer_id = peer.id
-        return self.__trust_matrix.get(peer_id, None)
+        return self.__generation.trust_matrix.get(peer_id, None)
+
+    def get_peers_trust_data(self, peer_ids: List[Union[PeerId, PeerInfo]]) -> TrustMatrix:
+        """Return trust data for each peer from peer_ids, peers without data are not in the matrix."""
+        matrix = self.__generation.trust_matrix
+        ids = (p.id if isinstance(p, PeerInfo) else p for p in peer_ids)
+        return {peer_id: trust for peer_id in ids if (trust := matrix.get(peer_id))}
 
     def get_peers_info(self, peer_ids: List[PeerId]) -> List[PeerInfo]:
-        return [tr.info for p in peer_ids if (tr := self.__trust_matrix.get(p))]
+        matrix = self.__generation.trust_matrix
+        return [tr.info for p in peer_ids if (tr := matrix.get(p))]
 
     def get_peers_with_geq_service_trust(self, minimal_service_trust: float) -> List[PeerInfo]:
-        return [p.info for p in self.__trust_matrix.values() if p.service_trust >= minimal_service_trust]
+        generation = self.__generation
+        return self.__geq(generation, generation.service_trust_index, minimal_service_trust)
 
     def cache_network_opinion(self, ti: SlipsThreatIntelligence):
-        """Caches aggregated opinion on given target."""
-        self.__network_opinions[ti.target] = now(), ti
+        """Caches aggregated opinion on given target, the cache is bounded and evicts old entries."""
+        self.__network_opinions.put(ti)
 
     def get_cached_network_opinion(self, target: Target) -> Optional[SlipsThreatIntelligence]:
         """Returns cached network opinion. Checks cache time and returns None if data expired."""
-        rec = self.__network_opinions.get(target)
-        if rec is None:
-            return None
-        created_seconds, ti = rec
-        # we need to check if the cache is still valid
-        if now() - created_seconds < self.__configuration.network_opinion_cache_valid_seconds:
-            return ti
-        else:
-            return None
+        return self.__network_opinions.get(target)
+
+    def _locked_peers(self, peer_ids: Collection[PeerId]) -> ContextManager[None]:
+        """Holds the locks of the peers, subclasses must take them before any of their own locks."""
+        return self.__peer_locks.locked(peer_ids)
+
+    @staticmethod
+    def __geq(generation: _Generation, index: ChunkedSortedList, minimal: float) -> List[PeerInfo]:
+        # empty string is the smallest peer id, so we start at the first entry with the value >= minimal
+        matrix = generation.trust_matrix
+        return [matrix[peer_id].info for _, peer_id in index.irange_from((minimal, ''))]
+
+    def __write(self, peers: List[PeerTrustData]):
+        with self.__write_lock:
+            current = self.__generation
+            added: Dict[OrganisationId, Set[PeerId]] = {}
+            removed: Dict[OrganisationId, Set[PeerId]] = {}
+            # (removed, added) entries of the sorted indexes, values that did not change are not touched
+            service_removed, service_added, recommendation_removed, recommendation_added = [], [], [], []
+            matrix, indexed = [], []
+            # this is the hot path of loading the whole database, so it is inlined
+            for peer in peers:
+                info = peer.info
+                peer_id = info.id
+                service_trust, recommendation_trust = peer.service_trust, peer.recommendation_trust
+                organisations = tuple(info.organisations)
+                previous = current.indexed.get(peer_id)
+                if previous is None:
+                    previous = None, None, ()
+                if previous[0] != service_trust:
+                    if previous[0] is not None:
+                        service_removed.append((previous[0], peer_id))
+                    service_added.append((service_trust, peer_id))
+                if previous[1] != recommendation_trust:
+                    if previous[1] is not None:
+                        recommendation_removed.append((previous[1], peer_id))
+                    recommendation_added.append((recommendation_trust, peer_id))
+                if previous[2] != organisations:
+                    for organisation in previous[2]:
+                        removed.setdefault(organisation, set()).add(peer_id)
+                    for organisation in organisations:
+                        added.setdefault(organisation, set()).add(peer_id)
+                matrix.append((peer_id, peer))
+                indexed.append((peer_id, (service_trust, recommendation_trust, organisations)))
+
+            # readers that already hold the current generation finish with it
+            self.__generation = _Generation(
+                version=current.version + 1,
+                trust_matrix=current.trust_matrix.updated(matrix),
+                service_trust_index=current.service_trust_index.updated(service_removed, service_added),
+                recommendation_trust_index=current.recommendation_trust_index.updated(recommendation_removed,
+                                                                                      recommendation_added),
+                organisation_index=self.__organisation_index(current.organisation_index, added, removed),
+                indexed=current.indexed.updated(indexed)
+            )
+
+    @staticmethod
+    def __organisation_index(index: Dict[OrganisationId, FrozenSet[PeerId]],
+                             added: Dict[OrganisationId, Set[PeerId]],
+                             removed: Dict[OrganisationId, Set[PeerId]]) -> Dict[OrganisationId, FrozenSet[PeerId]]:
+        if not added and not removed:
+            return index
+        index = dict(index)
+        for organisation in added.keys() | removed.keys():
+            members = index.get(organisation, frozenset()) \
+                .difference(removed.get(organisation, ())).union(added.get(organisation, ()))
+            if members:
+                index[organisation] = members
+            else:
+                index.pop(organisation, None)
+        return index
@@ -0,0 +1,114 @@
+from typing import Dict, List, Optional, Union
+
+from fides.messaging.model import PeerInfo
+from fides.model.aliases import PeerId, Target, OrganisationId
+from fides.model.peer_trust_data import PeerTrustData, TrustMatrix
+from fides.model.threat_intelligence import SlipsThreatIntelligence
+from fides.persistence.trust import TrustDatabase, BulkWriteResult, BulkUpdateResult, TrustUpdate
+from fides.utils.metrics import metrics
+
+_db_seconds = metrics.histogram('fides_trust_db_seconds', 'Time spent in the trust database calls.', ('method',))
+
+
+class MeteredTrustDatabase(TrustDatabase):
+    """Wraps another trust database and measures duration of every call."""
+
+    def __init__(self, db: TrustDatabase):
+        super().__init__(db.get_model_configuration())
+        self.__db = db
+
+    def store_connected_peers_list(self, current_peers: List[PeerInfo]):
+        started = metrics.start()
+        try:
+            return self.__db.store_connected_peers_list(current_peers)
+        finally:
+            self.__record('store_connected_peers_list', started)
+
+    def get_connected_peers(self) -> List[PeerInfo]:
+        started = metrics.start()
+        try:
+            return self.__db.get_connected_peers()
+        finally:
+            self.__record('get_connected_peers', started)
+
+    def get_peers_info(self, peer_ids: List[PeerId]) -> List[PeerInfo]:
+        started = metrics.start()
+        try:
+            return self.__db.get_peers_info(peer_ids)
+        finally:
+            self.__record('get_peers_info', started)
+
+    def get_peers_with_organisations(self, organisations: List[OrganisationId]) -> List[PeerInfo]:
+        started = metrics.start()
+        try:
+            return self.__db.get_peers_with_organisations(organisations)
+        finally:
+            self.__record('get_peers_with_organisations', started)
+
+    def get_peers_with_geq_recommendation_trust(self, minimal_recommendation_trust: float) -> List[PeerInfo]:
+        started = metrics.start()
+        try:
+            return self.__db.get_peers_with_geq_recommendation_trust(minimal_recommendation_trust)
+        finally:
+            self.__record('get_peers_with_geq_recommendation_trust', started)
+
+    def get_peers_with_geq_service_trust(self, minimal_service_trust: float) -> List[PeerInfo]:
+        started = metrics.start()
+        try:
+            return self.__db.get_peers_with_geq_service_trust(minimal_service_trust)
+        finally:
+            self.__record('get_peers_with_geq_service_trust', started)
+
+    def store_peer_trust_data(self, trust_data: PeerTrustData):
+        started = metrics.start()
+        try:
+            return self.__db.store_peer_trust_data(trust_data)
+        finally:
+            self.__record('store_peer_trust_data', started)
+
+    def store_peer_trust_matrix(self, trust_matrix: TrustMatrix) -> BulkWriteResult:
+        started = metrics.start()
+        try:
+            return self.__db.store_peer_trust_matrix(trust_matrix)
+        finally:
+            self.__record('store_peer_trust_matrix', started)
+
+    def update_peers_trust_data(self, updates: Dict[PeerId, TrustUpdate]) -> BulkUpdateResult:
+        started = metrics.start()
+        try:
+            return self.__db.update_peers_trust_data(updates)
+        finally:
+            self.__record('update_peers_trust_data', started)
+
+    def get_peer_trust_data(self, peer: Union[PeerId, PeerInfo]) -> Optional[PeerTrustData]:
+        started = metrics.start()
+        try:
+            return self.__db.get_peer_trust_data(peer)
+        finally:
+            self.__record('get_peer_trust_data', started)
+
+    def get_peers_trust_data(self, peer_ids: List[Union[PeerId, PeerInfo]]) -> TrustMatrix:
+        started = metrics.start()
+        try:
+            return self.__db.get_peers_trust_data(peer_ids)
+        finally:
+            self.__record('get_peers_trust_data', started)
+
+    def cache_network_opinion(self, ti: SlipsThreatIntelligence):
+        started = metrics.start()
+        try:
+            return self.__db.cache_network_opinion(ti)
+        finally:
+            self.__record('cache_network_opinion', started)
+
+    def get_cached_network_opinion(self, target: Target) -> Optional[SlipsThreatIntelligence]:
+        started = metrics.start()
+        try:
+            return self.__db.get_cached_network_opinion(target)
+        finally:
+            self.__record('get_cached_network_opinion', started)
+
+    @staticmethod
+    def __record(method: str, started: Optional[float]):
+        if started is not None:
+            _db_seconds.labels(method).observe_since(started)
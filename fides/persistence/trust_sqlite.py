@@ -0,0 +1,348 @@
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Union
+
+from fides.messaging.model import PeerInfo
+from fides.model.aliases import PeerId, Target, OrganisationId
+from fides.model.configuration import TrustModelConfiguration
+from fides.model.peer_trust_data import PeerTrustData, TrustMatrix
+from fides.model.recommendation_history import RecommendationHistoryRecord
+from fides.model.service_history import ServiceHistoryRecord
+from fides.model.threat_intelligence import SlipsThreatIntelligence
+from fides.persistence.opinion_cache import adaptive_ttl_seconds
+from fides.persistence.trust import TrustDatabase, BulkWriteResult, BulkUpdateResult, TrustUpdate
+from fides.utils.logger import Logger
+from fides.utils.time import Time, now
+
+logger = Logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS peers (
+    peer_id TEXT PRIMARY KEY,
+    organisations TEXT NOT NULL,
+    ip TEXT,
+    has_fixed_trust INTEGER NOT NULL,
+    service_trust REAL NOT NULL,
+    reputation REAL NOT NULL,
+    recommendation_trust REAL NOT NULL,
+    competence_belief REAL NOT NULL,
+    integrity_belief REAL NOT NULL,
+    initial_reputation_provided_by_count INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS peers_service_trust ON peers (service_trust);
+CREATE INDEX IF NOT EXISTS peers_recommendation_trust ON peers (recommendation_trust);
+
+CREATE TABLE IF NOT EXISTS peer_organisations (
+    organisation TEXT NOT NULL,
+    peer_id TEXT NOT NULL,
+    PRIMARY KEY (organisation, peer_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS peer_organisations_peer ON peer_organisations (peer_id);
+
+CREATE TABLE IF NOT EXISTS service_history (
+    peer_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    satisfaction REAL NOT NULL,
+    weight REAL NOT NULL,
+    timestamp REAL NOT NULL,
+    PRIMARY KEY (peer_id, position)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS recommendation_history (
+    peer_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    satisfaction REAL NOT NULL,
+    weight REAL NOT NULL,
+    timestamp REAL NOT NULL,
+    PRIMARY KEY (peer_id, position)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS connected_peers (
+    position INTEGER PRIMARY KEY,
+    peer_id TEXT NOT NULL,
+    organisations TEXT NOT NULL,
+    ip TEXT
+);
+
+CREATE TABLE IF NOT EXISTS network_opinions (
+    target TEXT PRIMARY KEY,
+    score REAL NOT NULL,
+    confidence REAL NOT NULL,
+    confidentiality REAL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS network_opinions_expires_at ON network_opinions (expires_at);
+"""
+
+_PEER_COLUMNS = 'peer_id, organisations, ip, has_fixed_trust, service_trust, reputation, recommendation_trust, ' \
+                'competence_belief, integrity_belief, initial_reputation_provided_by_count'
+
+_UPSERT_PEER = f"""
+INSERT INTO peers ({_PEER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (peer_id) DO UPDATE SET
+    organisations = excluded.organisations,
+    ip = excluded.ip,
+    has_fixed_trust = excluded.has_fixed_trust,
+    service_trust = excluded.service_trust,
+    reputation = excluded.reputation,
+    recommendation_trust = excluded.recommendation_trust,
+    competence_belief = excluded.competence_belief,
+    integrity_belief = excluded.integrity_belief,
+    initial_reputation_provided_by_count = excluded.initial_reputation_provided_by_count
+"""
+
+_BATCH = 500
+"""Maximal number of parameters in one IN clause, older SQLite supports only 999 parameters per statement."""
+
+
+class SQLiteTrustDatabase(TrustDatabase):
+    """Trust database implementation that uses SQLite, for single node deployments without Redis.
+
+    Database runs in WAL mode, so readers do not block the writer. Scalars of the peers are in the peers
+    table with indexes on service and recommendation trust, organisation membership and histories are
+    in separate tables. Bulk writes are executed in a single transaction.
+
+    Statements are constant and executed through the connection's statement cache, so they're prepared
+    only once. The connection is shared by all threads and guarded by a lock.
+    """
+
+    def __init__(self,
+                 configuration: TrustModelConfiguration,
+                 path: str,
+                 opinions_cleanup_interval_seconds: float = 60,
+                 synchronous: str = 'NORMAL'):
+        """
+        :param configuration: trust model configuration
+        :param path: path to the database file, ':memory:' for a temporary database
+        :param opinions_cleanup_interval_seconds: how often are expired network opinions deleted
+        :param synchronous: SQLite synchronous pragma, NORMAL is durable in the WAL mode except for power loss
+        """
+        super().__init__(configuration)
+        self.__lock = threading.RLock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False, cached_statements=256)
+        self.__connection.execute('PRAGMA journal_mode = WAL')
+        self.__connection.execute(f'PRAGMA synchronous = {synchronous}')
+        self.__connection.executescript(_SCHEMA)
+        self.__cleanup_interval_seconds = opinions_cleanup_interval_seconds
+        self.__last_cleanup: Time = 0
+
+    def close(self):
+        """Closes the connection."""
+        with self.__lock:
+            self.__connection.close()
+
+    def store_connected_peers_list(self, current_peers: List[PeerInfo]):
+        """Stores list of peers that are directly connected to the Slips."""
+        with self.__lock, self.__connection:
+            self.__connection.execute('DELETE FROM connected_peers')
+            self.__connection.executemany(
+                'INSERT INTO connected_peers (position, peer_id, organisations, ip) VALUES (?, ?, ?, ?)',
+                [(i, p.id, json.dumps(p.organisations), p.ip) for i, p in enumerate(current_peers)])
+
+    def get_connected_peers(self) -> List[PeerInfo]:
+        """Returns list of peers that are directly connected to the Slips."""
+        with self.__lock:
+            rows = self.__connection.execute(
+                'SELECT peer_id, organisations, ip FROM connected_peers ORDER BY position').fetchall()
+        return [_peer_info(*row) for row in rows]
+
+    def get_peers_info(self, peer_ids: List[PeerId]) -> List[PeerInfo]:
+        """Returns list of peer infos for given ids."""
+        rows = self.__select_in('SELECT peer_id, organisations, ip FROM peers WHERE peer_id IN ({})', peer_ids)
+        return [_peer_info(*row) for row in rows]
+
+    def get_peers_with_organisations(self, organisations: List[OrganisationId]) -> List[PeerInfo]:
+        """Returns list of peers that have one of given organisations."""
+        rows = self.__select_in('SELECT p.peer_id, p.organisations, p.ip FROM peers p WHERE p.peer_id IN '
+                                '(SELECT peer_id FROM peer_organisations WHERE organisation IN ({}))',
+                                list(set(organisations)))
+        return list({row[0]: _peer_info(*row) for row in rows}.values())
+
+    def get_peers_with_geq_recommendation_trust(self, minimal_recommendation_trust: float) -> List[PeerInfo]:
+        """Returns peers that have >= recommendation_trust then the minimal."""
+        with self.__lock:
+            rows = self.__connection.execute(
+                'SELECT peer_id, organisations, ip FROM peers WHERE recommendation_trust >= ?',
+                (minimal_recommendation_trust,)).fetchall()
+        return [_peer_info(*row) for row in rows]
+
+    def get_peers_with_geq_service_trust(self, minimal_service_trust: float) -> List[PeerInfo]:
+        """Returns peers that have >= service_trust then the minimal."""
+        with self.__lock:
+            rows = self.__connection.execute(
+                'SELECT peer_id, organisations, ip FROM peers WHERE service_trust >= ?',
+                (minimal_service_trust,)).fetchall()
+        return [_peer_info(*row) for row in rows]
+
+    def store_peer_trust_data(self, trust_data: PeerTrustData):
+        """Stores trust data for given peer - overwrites any data if existed."""
+        result = self.store_peer_trust_matrix({trust_data.peer_id: trust_data})
+        if not result.ok:
+            raise sqlite3.DatabaseError(f'Trust data of peer {trust_data.peer_id} were not stored! '
+                                        f'{result.failed[trust_data.peer_id]}')
+
+    def store_peer_trust_matrix(self, trust_matrix: TrustMatrix) -> BulkWriteResult:
+        """Upserts the whole matrix in one transaction.
+
+        Peers whose data can not be converted to rows are reported as failed and the rest is stored,
+        if the transaction fails, none of the peers is stored.
+        """
+        result = BulkWriteResult()
+        peers, organisations, service_history, recommendation_history = [], [], [], []
+        for peer_id, peer in trust_matrix.items():
+            try:
+                rows = (_peer_row(peer), [(o, peer_id) for o in set(peer.organisations)],
+                        _history_rows(peer_id, peer.service_history),
+                        _history_rows(peer_id, peer.recommendation_history))
+            except Exception as ex:
+                result.failed[peer_id] = f'Trust data can not be converted! {ex}'
+                continue
+            peers.append(rows[0])
+            organisations.extend(rows[1])
+            service_history.extend(rows[2])
+            recommendation_history.extend(rows[3])
+            result.stored.append(peer_id)
+        if not peers:
+            return result
+
+        ids = [(peer_id,) for peer_id in result.stored]
+        try:
+            with self.__lock, self.__connection:
+                execute = self.__connection.executemany
+                execute(_UPSERT_PEER, peers)
+                execute('DELETE FROM peer_organisations WHERE peer_id = ?', ids)
+                execute('INSERT INTO peer_organisations (organisation, peer_id) VALUES (?, ?)', organisations)
+                execute('DELETE FROM service_history WHERE peer_id = ?', ids)
+                execute('INSERT INTO service_history (peer_id, position, satisfaction, weight, timestamp) '
+                        'VALUES (?, ?, ?, ?, ?)', service_history)
+                execute('DELETE FROM recommendation_history WHERE peer_id = ?', ids)
+                execute('INSERT INTO recommendation_history (peer_id, position, satisfaction, weight, timestamp) '
+                        'VALUES (?, ?, ?, ?, ?)', recommendation_history)
+        except sqlite3.Error as ex:
+            result.failed.update({peer_id: f'Transaction failed! {ex}' for peer_id in result.stored})
+            result.stored = []
+        return result
+
+    def update_peers_trust_data(self, updates: Dict[PeerId, TrustUpdate]) -> BulkUpdateResult:
+        """Applies each update to the current data of its peer and stores the results in one transaction.
+
+        The connection lock is held from the read to the write, so the updates are atomic within the process.
+        """
+        with self.__lock:
+            return self._store_updates(updates, self.get_peers_trust_data(list(updates.keys())))
+
+    def get_peer_trust_data(self, peer: Union[PeerId, PeerInfo]) -> Optional[PeerTrustData]:
+        """Returns trust data for given peer ID, if no data are found, returns None."""
+        peer_id = peer.id if isinstance(peer, PeerInfo) else peer
+        return self.get_peers_trust_data([peer_id]).get(peer_id)
+
+    def get_peers_trust_data(self, peer_ids: List[Union[PeerId, PeerInfo]]) -> TrustMatrix:
+        """Return trust data for each peer from peer_ids, peers and histories are read with a few queries.
+
+        All queries run in one read transaction, so the histories belong to the same version of the peers
+        even when another connection writes them in the meantime.
+        """
+        ids = list({p.id if isinstance(p, PeerInfo) else p: None for p in peer_ids})
+        with self.__read_transaction():
+            rows = self.__select_in(f'SELECT {_PEER_COLUMNS} FROM peers WHERE peer_id IN ({{}})', ids)
+            if not rows:
+                return {}
+            found = [row[0] for row in rows]
+            service_history = self.__histories('service_history', ServiceHistoryRecord, found)
+            recommendation_history = self.__histories('recommendation_history', RecommendationHistoryRecord, found)
+        return {
+            row[0]: _peer_trust_data(row, service_history.get(row[0], []), recommendation_history.get(row[0], []))
+            for row in rows
+        }
+
+    def cache_network_opinion(self, ti: SlipsThreatIntelligence):
+        """Caches aggregated opinion on given target, low confidence opinions expire sooner."""
+        current = now()
+        expires_at = current + adaptive_ttl_seconds(ti, self.get_model_configuration()
+                                                    .network_opinion_cache_valid_seconds)
+        with self.__lock, self.__connection:
+            self.__connection.execute(
+                'INSERT OR REPLACE INTO network_opinions (target, score, confidence, confidentiality, expires_at) '
+                'VALUES (?, ?, ?, ?, ?)', (ti.target, ti.score, ti.confidence, ti.confidentiality, expires_at))
+            if current - self.__last_cleanup >= self.__cleanup_interval_seconds:
+                self.__last_cleanup = current
+                deleted = self.__connection.execute('DELETE FROM network_opinions WHERE expires_at <= ?',
+                                                    (current,)).rowcount
+                logger.debug(lambda: f'Deleted {deleted} expired network opinions.')
+
+    def get_cached_network_opinion(self, target: Target) -> Optional[SlipsThreatIntelligence]:
+        """Returns cached network opinion. Checks cache time and returns None if data expired."""
+        with self.__lock:
+            row = self.__connection.execute(
+                'SELECT score, confidence, confidentiality FROM network_opinions WHERE target = ? AND expires_at > ?',
+                (target, now())).fetchone()
+        if row is None:
+            return None
+        score, confidence, confidentiality = row
+        return SlipsThreatIntelligence(score=score, confidence=confidence, target=target,
+                                       confidentiality=confidentiality)
+
+    @contextmanager
+    def __read_transaction(self):
+        """Holds the lock and a read transaction, so all queries see the same snapshot of the database."""
+        with self.__lock:
+            if self.__connection.in_transaction:
+                yield
+                return
+            self.__connection.execute('BEGIN')
+            try:
+                yield
+            finally:
+                self.__connection.execute('COMMIT')
+
+    def __select_in(self, query: str, values: List) -> List[tuple]:
+        """Executes query with IN clause in batches, the query contains {} in place of the parameters."""
+        rows = []
+        with self.__lock:
+            for start in range(0, len(values), _BATCH):
+                batch = values[start:start + _BATCH]
+                placeholders = ', '.join('?' * len(batch))
+                rows.extend(self.__connection.execute(query.format(placeholders), batch).fetchall())
+        return rows
+
+    def __histories(self, table: str, record_type, peer_ids: List[PeerId]) -> Dict[PeerId, list]:
+        rows = self.__select_in(f'SELECT peer_id, satisfaction, weight, timestamp FROM {table} '
+                                f'WHERE peer_id IN ({{}}) ORDER BY peer_id, position', peer_ids)
+        histories: Dict[PeerId, list] = {}
+        for peer_id, satisfaction, weight, timestamp in rows:
+            histories.setdefault(peer_id, []).append(record_type(satisfaction, weight, timestamp))
+        return histories
+
+
+def _peer_info(peer_id: PeerId, organisations: str, ip: Optional[str]) -> PeerInfo:
+    return PeerInfo(id=peer_id, organisations=json.loads(organisations), ip=ip)
+
+
+def _peer_row(peer: PeerTrustData) -> tuple:
+    return (peer.peer_id, json.dumps(peer.organisations), peer.info.ip, int(peer.has_fixed_trust),
+            float(peer.service_trust), float(peer.reputation), float(peer.recommendation_trust),
+            float(peer.competence_belief), float(peer.integrity_belief),
+            int(peer.initial_reputation_provided_by_count))
+
+
+def _history_rows(peer_id: PeerId, history: Iterable) -> List[tuple]:
+    return [(peer_id, i, float(r.satisfaction), float(r.weight), float(r.timestamp)) for i, r in enumerate(history)]
+
+
+def _peer_trust_data(row: tuple, service_history: list, recommendation_history: list) -> PeerTrustData:
+    (peer_id, organisations, ip, has_fixed_trust, service_trust, reputation, recommendation_trust,
+     competence_belief, integrity_belief, initial_count) = row
+    return PeerTrustData(
+        info=_peer_info(peer_id, organisations, ip),
+        has_fixed_trust=bool(has_fixed_trust),
+        service_trust=service_trust,
+        reputation=reputation,
+        recommendation_trust=recommendation_trust,
+        competence_belief=competence_belief,
+        integrity_belief=integrity_belief,
+        initial_reputation_provided_by_count=initial_count,
+        service_history=service_history,
+        recommendation_history=recommendation_history
+    )
@@ -0,0 +1,288 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Tuple, Collection
+
+from fides.messaging.decoders import decoders
+from fides.messaging.model import NetworkMessage
+from fides.messaging.network_bridge import NetworkBridge
+from fides.messaging.priority import MessageAdmission
+from fides.model.aliases import PeerId
+from fides.model.peer import PeerInfo
+from fides.persistence.trust import TrustDatabase
+from fides.utils.logger import Logger
+
+logger = Logger(__name__)
+
+decode_peer_info = decoders.decoder_for(PeerInfo)
+
+REQUEST_TYPES = ('nl2tl_intelligence_request', 'nl2tl_recommendation_request')
+"""Message types with requests from other peers, those are admitted by default."""
+
+
+@dataclass
+class TokenBucket:
+    """Token bucket rate limiter, tokens are refilled continuously with given rate."""
+
+    rate: float
+    """How many tokens are added per second."""
+
+    capacity: float
+    """Maximal number of tokens in the bucket - size of the allowed burst."""
+
+    tokens: float
+    """Currently available tokens."""
+
+    updated_at: float
+    """When were the tokens refilled for the last time."""
+
+    def try_take(self, now: float) -> bool:
+        """Takes one token if available."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def seconds_until_available(self) -> float:
+        """How long it takes until there's a token in the bucket."""
+        return max(0.0, (1 - self.tokens) / self.rate) if self.rate > 0 else float('inf')
+
+
+@dataclass
+class AdmissionStatistics:
+    """Counters of the admission decisions."""
+
+    admitted: int = 0
+    """Number of requests that were admitted."""
+
+    rate_limited: int = 0
+    """Number of requests rejected because the sender exceeded its rate."""
+
+    shed: int = 0
+    """Number of requests from low trust senders rejected because the module was overloaded."""
+
+    over_capacity: int = 0
+    """Number of requests rejected because the concurrency cap was reached."""
+
+    rejected_by_type: Dict[str, int] = field(default_factory=dict)
+    """Number of rejected requests per message type."""
+
+
+@dataclass
+class _SenderState:
+    bucket: TokenBucket
+    service_trust: float
+    trust_loaded_at: float
+    last_hint_at: Optional[float] = None
+
+
+class AdmissionController(MessageAdmission):
+    """
+    Admission control for inbound requests, protects the module from noisy or malicious peers.
+
+    Each pair (sender, message type) has its own token bucket, rate and burst of the bucket are scaled
+    by the service trust of the sender, so trusted peers can ask more often than strangers.
+    Only the most recently seen :param: max_senders pairs are remembered.
+    Number of admitted requests that are waiting or being processed is capped. When the load gets over
+    :param: overload_fraction of the cap, requests from senders with service trust lower than
+    :param: shed_trust_threshold are shed first, so the trusted peers are still served.
+
+    When the request is rejected, optional backpressure hint is sent to the network layer,
+    so it can slow the peer down.
+
+    Requests should be admitted when they're received, by passing the controller as the admission
+    of the PrioritizedMessageDispatcher, so they're rejected before they wait in the lane.
+    Handler without the dispatcher can use guard instead.
+    """
+
+    def __init__(self,
+                 trust_db: TrustDatabase,
+                 bridge: Optional[NetworkBridge] = None,
+                 rate_per_second: float = 5,
+                 burst: float = 10,
+                 minimal_trust_scale: float = 0.1,
+                 unknown_peer_trust: float = 0.25,
+                 max_concurrent: int = 16,
+                 overload_fraction: float = 0.75,
+                 shed_trust_threshold: float = 0.5,
+                 load_probe: Optional[Callable[[], int]] = None,
+                 trust_refresh_seconds: float = 10,
+                 hint_interval_seconds: float = 5,
+                 max_senders: int = 10_000,
+                 message_types: Collection[str] = REQUEST_TYPES,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param trust_db: database with the trust data of the senders
+        :param bridge: if set, backpressure hints are sent to the network layer when the request is rejected
+        :param rate_per_second: requests per second allowed for the sender with service trust 1
+        :param burst: size of the burst allowed for the sender with service trust 1
+        :param minimal_trust_scale: rate and burst are never scaled below this fraction
+        :param unknown_peer_trust: trust used for the senders we don't have any data about
+        :param max_concurrent: maximal number of admitted requests that are waiting or being processed
+        :param overload_fraction: fraction of max_concurrent when the low trust requests are shed
+        :param shed_trust_threshold: senders with lower service trust are shed when overloaded
+        :param load_probe: returns number of requests waiting for processing that were not admitted
+        by this controller, it is added to the number of admitted requests when determining the load
+        :param trust_refresh_seconds: how often is the service trust of the sender reloaded from the database
+        :param hint_interval_seconds: minimal interval between two backpressure hints for the same sender
+        :param max_senders: how many (sender, message type) pairs are remembered, the least recently seen
+        are forgotten and start with the full bucket when they come back
+        :param message_types: types of the messages that are admitted by admit_message, other pass through
+        :param clock: monotonic time source
+        """
+        self.__trust_db = trust_db
+        self.__bridge = bridge
+        self.__rate_per_second = rate_per_second
+        self.__burst = burst
+        self.__minimal_trust_scale = minimal_trust_scale
+        self.__unknown_peer_trust = unknown_peer_trust
+        self.__max_concurrent = max(1, max_concurrent)
+        self.__overload_threshold = self.__max_concurrent * overload_fraction
+        self.__shed_trust_threshold = shed_trust_threshold
+        self.__load_probe = load_probe
+        self.__trust_refresh_seconds = trust_refresh_seconds
+        self.__hint_interval_seconds = hint_interval_seconds
+        self.__max_senders = max(1, max_senders)
+        self.__message_types = frozenset(message_types)
+        self.__clock = clock
+
+        self.__senders: Dict[Tuple[PeerId, str], _SenderState] = OrderedDict()
+        self.__in_flight = 0
+        self.__lock = threading.Lock()
+        self.__statistics = AdmissionStatistics()
+
+    @property
+    def statistics(self) -> AdmissionStatistics:
+        """Counters of the admission decisions."""
+        return self.__statistics
+
+    @property
+    def in_flight(self) -> int:
+        """Number of admitted requests that were not released yet."""
+        return self.__in_flight
+
+    def admit(self, sender: PeerInfo, message_type: str) -> bool:
+        """Decides whether the request should be processed, every admitted request must be released."""
+        now = self.__clock()
+        key = (sender.id, message_type)
+        with self.__lock:
+            needs_trust = self.__needs_trust(key, now)
+        # trust is loaded outside of the lock, slow database must not stall admission of the other peers
+        trust = self.__load_trust(sender.id) if needs_trust else None
+        with self.__lock:
+            state = self.__sender_state(key, now, trust)
+            load = self.__in_flight + (self.__load_probe() if self.__load_probe else 0)
+
+            if load >= self.__max_concurrent:
+                self.__statistics.over_capacity += 1
+                retry_after = None
+            elif load >= self.__overload_threshold and state.service_trust < self.__shed_trust_threshold:
+                self.__statistics.shed += 1
+                retry_after = None
+            elif not state.bucket.try_take(now):
+                self.__statistics.rate_limited += 1
+                retry_after = state.bucket.seconds_until_available()
+            else:
+                self.__in_flight += 1
+                self.__statistics.admitted += 1
+                return True
+
+            rejected = self.__statistics.rejected_by_type
+            rejected[message_type] = rejected.get(message_type, 0) + 1
+            should_hint = self.__bridge is not None and \
+                (state.last_hint_at is None or now - state.last_hint_at >= self.__hint_interval_seconds)
+            if should_hint:
+                state.last_hint_at = now
+
+        logger.debug(lambda: f'Rejecting {message_type} from {sender.id} with trust {state.service_trust}, '
+                             f'load {load}/{self.__max_concurrent}.')
+        if should_hint:
+            self.__send_hint(sender.id, message_type, retry_after)
+        return False
+
+    def release(self):
+        """Marks admitted request as finished."""
+        with self.__lock:
+            self.__in_flight = max(0, self.__in_flight - 1)
+
+    def admit_message(self, message: NetworkMessage) -> bool:
+        """Admits request received from the network, messages of other types are always admitted."""
+        if message.type not in self.__message_types:
+            return True
+        # noinspection PyBroadException
+        try:
+            sender = decode_peer_info(message.data['sender'])
+        except Exception as ex:
+            logger.warn(f'Rejecting {message.type} without valid sender. {ex}')
+            return False
+        return self.admit(sender, message.type)
+
+    def release_message(self, message: NetworkMessage):
+        """Marks request admitted by admit_message as finished."""
+        if message.type in self.__message_types:
+            self.release()
+
+    def guard(self, callback: Callable[[str, PeerInfo, str], None], message_type: str) -> Callable:
+        """Wraps request callback of the MessageHandler, the callback is executed only if the request is admitted.
+
+        Request callbacks receive (request_id, sender, subject), rejected requests are dropped without response.
+        Must not be used when the requests are already admitted by the PrioritizedMessageDispatcher.
+        """
+
+        @functools.wraps(callback)
+        def guarded(request_id: str, sender: PeerInfo, subject: str):
+            if not self.admit(sender, message_type):
+                return None
+            try:
+                return callback(request_id, sender, subject)
+            finally:
+                self.release()
+
+        return guarded
+
+    def __needs_trust(self, key: Tuple[PeerId, str], now: float) -> bool:
+        state = self.__senders.get(key)
+        return state is None or now - state.trust_loaded_at >= self.__trust_refresh_seconds
+
+    def __sender_state(self, key: Tuple[PeerId, str], now: float, trust: Optional[float]) -> _SenderState:
+        """Returns state of the sender, trust is None if it was not loaded, because it was fresh."""
+        state = self.__senders.get(key)
+        if state is None:
+            # the sender might have been forgotten while the trust was not loaded, it is loaded next time
+            loaded_at = now if trust is not None else float('-inf')
+            trust = trust if trust is not None else self.__unknown_peer_trust
+            rate, capacity = self.__scaled_limits(trust)
+            state = _SenderState(bucket=TokenBucket(rate=rate, capacity=capacity, tokens=capacity, updated_at=now),
+                                 service_trust=trust, trust_loaded_at=loaded_at)
+            self.__senders[key] = state
+            if len(self.__senders) > self.__max_senders:
+                self.__senders.popitem(last=False)
+            return state
+
+        self.__senders.move_to_end(key)
+        if trust is not None:
+            state.service_trust = trust
+            state.trust_loaded_at = now
+            state.bucket.rate, state.bucket.capacity = self.__scaled_limits(trust)
+        return state
+
+    def __load_trust(self, peer_id: PeerId) -> float:
+        trust = self.__trust_db.get_peer_trust_data(peer_id)
+        return trust.service_trust if trust else self.__unknown_peer_trust
+
+    def __scaled_limits(self, service_trust: float) -> Tuple[float, float]:
+        scale = max(self.__minimal_trust_scale, service_trust)
+        return self.__rate_per_second * scale, max(1.0, self.__burst * scale)
+
+    def __send_hint(self, peer_id: PeerId, message_type: str, retry_after: Optional[float]):
+        # when overloaded, we don't know when there will be a capacity, so we ask for the full hint interval
+        retry_after = retry_after if retry_after is not None else self.__hint_interval_seconds
+        # noinspection PyBroadException
+        try:
+            self.__bridge.send_backpressure(peer_id, message_type, retry_after)
+        except Exception as ex:
+            logger.warn(f'It was not possible to send backpressure hint for {peer_id}. {ex}')
@@ -1,3 +1,5 @@
+from typing import List
+
 from fides.evaluation.service.interaction import Weight, SatisfactionLevels
 from fides.evaluation.service.process import process_service_interaction
 from fides.model.configuration import TrustModelConfiguration, TrustedEntity
@@ -32,6 +34,32 @@ class InitialTrustProtocol:
             logger.debug(f"There's an existing trust for peer {peer.id}: ST: {existing_trust.service_trust}")
             return existing_trust
 
+        trust = self.__determine_initial_trust(peer)
+        # determine if it is necessary to get recommendations from the network
+        # get recommendations if peer does not have any trusted organisation, or it is not pre-trusted
+        if get_recommendations and not self.__is_vouched_for(peer):
+            logger.debug("Getting recommendations.")
+            self.__recommendation_protocol.get_recommendation_for(trust.info)
+
+        # now we save the trust to the database as we have everything we need
+        self.__trust_db.store_peer_trust_data(trust)
+        return trust
+
+    def determine_and_store_initial_trusts(self, peers: List[PeerInfo]) -> List[PeerTrustData]:
+        """Determines initial trust for the peers we don't know yet and stores them in one bulk write.
+
+        Does not get recommendations. Returns trust data of all peers in the same order,
+        existing data for the known peers.
+        """
+        existing = self.__trust_db.get_peers_trust_data([p.id for p in peers])
+        new_trusts = {p.id: self.__determine_initial_trust(p) for p in peers if p.id not in existing}
+        if new_trusts:
+            result = self.__trust_db.store_peer_trust_matrix(new_trusts)
+            if not result.ok:
+                logger.warn(f'Initial trust of {len(result.failed)} peers was not stored: {result.failed}')
+        return [existing[p.id] if p.id in existing else new_trusts[p.id] for p in peers]
+
+    def __determine_initial_trust(self, peer: PeerInfo) -> PeerTrustData:
         # now we know that this is a new peer
         trust = trust_data_prototype(peer)
         # set initial reputation from the config
@@ -64,17 +92,12 @@ class InitialTrustProtocol:
                                             weight=Weight.FIRST_ENCOUNTER
                                             )
         logger.debug(f"New trust for peer: {trust.peer_id}", trust)
-
-        # determine if it is necessary to get recommendations from the network
-        # get recommendations if peer does not have any trusted organisation, or it is not pre-trusted
-        if not peers_orgs and not pre_trusted_peer and get_recommendations:
-            logger.debug("Getting recommendations.")
-            self.__recommendation_protocol.get_recommendation_for(trust.info)
-
-        # now we save the trust to the database as we have everything we need
-        self.__trust_db.store_peer_trust_data(trust)
         return trust
 
+    def __is_vouched_for(self, peer: PeerInfo) -> bool:
+        pre_trusted = any(peer.id == p.id for p in self.__configuration.trusted_peers)
+        return pre_trusted or any(org.id in peer.organisations for org in self.__configuration.trusted_organisations)
+
     @staticmethod
     def __inherit_trust(trust: PeerTrustData, parent: TrustedEntity) -> PeerTrustData:
         # TODO [?] check which believes / trust metrics can we set as well
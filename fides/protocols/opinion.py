@@ -8,6 +8,10 @@ from fides.model.configuration import TrustModelConfiguration
 from fides.model.peer_trust_data import PeerTrustData, TrustMatrix
 from fides.model.threat_intelligence import SlipsThreatIntelligence
 from fides.persistence.threat_intelligence import ThreatIntelligenceDatabase
+from fides.utils.metrics import metrics
+
+_aggregation_seconds = metrics.histogram('fides_aggregation_seconds',
+                                         'Time spent aggregating intelligence responses.')
 
 
 class OpinionAggregator:
@@ -36,8 +40,10 @@ class OpinionAggregator:
                                        data: Dict[PeerId, PeerIntelligenceResponse],
                                        trust_matrix: TrustMatrix) -> SlipsThreatIntelligence:
         """Evaluates given threat intelligence report from the network."""
+        started = metrics.start()
         reports = [PeerReport(report_ti=ti.intelligence,
                               reporter_trust=trust_matrix[peer_id]
                               ) for peer_id, ti in data.items()]
         ti = self.__ti_aggregation.assemble_peer_opinion(data=reports)
+        _aggregation_seconds.observe_since(started)
         return SlipsThreatIntelligence(score=ti.score, confidence=ti.confidence, target=target)
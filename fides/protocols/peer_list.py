@@ -31,13 +31,12 @@ class PeerListUpdateProtocol:
         # if we don't have data for all peers that means that there are some new peers
         # we need to establish initial trust for them
         if len(known_peers) != len(peers):
-            new_trusts = []
-            for peer in [p for p in peers if p.id not in known_peers]:
-                # this stores trust in database as well, do not get recommendations because at this point
-                # we don't have correct peer list in database
-                peer_trust = self.__trust_protocol.determine_and_store_initial_trust(peer, get_recommendations=False)
-                new_trusts.append(peer_trust)
-                # get recommendations for this peer
+            new_peers = [p for p in peers if p.id not in known_peers]
+            # this stores trust of all new peers in one bulk write, do not get recommendations because
+            # at this point we don't have correct peer list in database
+            new_trusts = self.__trust_protocol.determine_and_store_initial_trusts(new_peers)
+            # get recommendations for the new peers
+            for peer in new_peers:
                 self.__recommendation_protocol.get_recommendation_for(peer, connected_peers=list(known_peers))
             # send only updated trusts to the network layer
             self.__bridge.send_peers_reliability({p.peer_id: p.service_trust for p in new_trusts})
@@ -1,4 +1,5 @@
-from typing import Dict, Tuple
+from functools import partial
+from typing import Dict, Optional, Tuple
 
 from fides.evaluation.service.interaction import Satisfaction, Weight
 from fides.evaluation.service.process import process_service_interaction
@@ -7,6 +8,9 @@ from fides.model.aliases import PeerId
 from fides.model.configuration import TrustModelConfiguration
 from fides.model.peer_trust_data import PeerTrustData, TrustMatrix
 from fides.persistence.trust import TrustDatabase
+from fides.utils.logger import Logger
+
+logger = Logger(__name__)
 
 
 class Protocol:
@@ -23,20 +27,39 @@ class Protocol:
                               peer: PeerTrustData,
                               satisfaction: Satisfaction,
                               weight: Weight
-                              ) -> PeerTrustData:
-        """Callback to evaluate and save new trust data for given peer."""
-        return self._evaluate_interactions({peer.peer_id: (peer, satisfaction, weight)})[peer.peer_id]
+                              ) -> Optional[PeerTrustData]:
+        """Callback to evaluate and save new trust data for given peer, returns None if they were not stored."""
+        return self._evaluate_interactions({peer.peer_id: (peer, satisfaction, weight)}).get(peer.peer_id)
 
     def _evaluate_interactions(self,
                                data: Dict[PeerId, Tuple[PeerTrustData, Satisfaction, Weight]]) -> TrustMatrix:
-        """Callback to evaluate and save new trust data for given peer matrix."""
-        trust_matrix: TrustMatrix = {}
-        # first process all interactions
-        for _, (peer_trust, satisfaction, weight) in data.items():
-            updated_trust = process_service_interaction(self._configuration, peer_trust, satisfaction, weight)
-            trust_matrix[updated_trust.peer_id] = updated_trust
-        # then store matrix
-        self._trust_db.store_peer_trust_matrix(trust_matrix)
+        """Callback to evaluate and save new trust data for given peer matrix, returns the stored data.
+
+        Interactions are applied to the current data of the peers in atomic updates, so they're not lost
+        when the peers were modified by another handler since the caller read them.
+        """
+        updates = {peer_id: partial(self.__process_interaction, peer_trust, satisfaction, weight)
+                   for peer_id, (peer_trust, satisfaction, weight) in data.items()}
+        result = self._trust_db.update_peers_trust_data(updates)
+        if not result.ok:
+            logger.warn(f'Trust data of {len(result.failed)} peers were not updated: {result.failed}')
         # and dispatch this update to the network layer
-        self._bridge.send_peers_reliability({p.peer_id: p.service_trust for p in trust_matrix.values()})
-        return trust_matrix
+        self._bridge.send_peers_reliability({p.peer_id: p.service_trust for p in result.updated.values()})
+        return result.updated
+
+    def _store_trust_matrix(self, trust_matrix: TrustMatrix) -> TrustMatrix:
+        """Stores the matrix in one bulk write and returns only the peers that were stored."""
+        result = self._trust_db.store_peer_trust_matrix(trust_matrix)
+        if result.ok:
+            return trust_matrix
+        logger.warn(f'Trust data of {len(result.failed)} peers were not stored: {result.failed}')
+        return {peer_id: trust_matrix[peer_id] for peer_id in result.stored}
+
+    def __process_interaction(self,
+                              peer: PeerTrustData,
+                              satisfaction: Satisfaction,
+                              weight: Weight,
+                              current: Optional[PeerTrustData]) -> PeerTrustData:
+        # data the caller has are used only if the peer was not stored yet
+        return process_service_interaction(self._configuration, current if current is not None else peer,
+                                           satisfaction, weight)
@@ -97,9 +97,9 @@ class RecommendationProtocol(Protocol):
             recommendations=recommendations
         )
         # now store updated matrix
-        self.__trust_db.store_peer_trust_matrix(updated_matrix)
+        stored_matrix = self._store_trust_matrix(updated_matrix)
         # and dispatch event
-        self.__bridge.send_peers_reliability({p.peer_id: p.service_trust for p in updated_matrix.values()})
+        self.__bridge.send_peers_reliability({p.peer_id: p.service_trust for p in stored_matrix.values()})
 
         # TODO: [+] optionally employ same thing as when receiving TI
         interaction_matrix = {p.peer_id: (p, SatisfactionLevels.Ok, Weight.RECOMMENDATION_RESPONSE)
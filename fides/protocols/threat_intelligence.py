@@ -1,4 +1,8 @@
-from typing import List, Callable, Optional
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Callable, Optional
 
 from fides.evaluation.service.interaction import Weight, SatisfactionLevels
 from fides.evaluation.ti_evaluation import TIEvaluation
@@ -18,6 +22,78 @@ from fides.utils.logger import Logger
 
 logger = Logger(__name__)
 
+NetworkOpinionCallback = Callable[[SlipsThreatIntelligence], None]
+"""Callback that receives aggregated network opinion."""
+
+
+@dataclass
+class PendingRequest:
+    """Intelligence request that was sent to the network and is waiting for the response."""
+
+    deadline: float
+    """After this time the request is considered lost and a new one can be sent."""
+
+    waiters: List[NetworkOpinionCallback] = field(default_factory=list)
+    """Callbacks that receive the network opinion once it is aggregated."""
+
+
+class PendingRequests:
+    """Table of intelligence requests waiting for the response from the network, keyed by target.
+
+    Concurrent requests for the same target are coalesced - only the first one is sent to the network,
+    the rest just wait for its result.
+    """
+
+    def __init__(self, timeout_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.__timeout_seconds = timeout_seconds
+        self.__clock = clock
+        # all requests have the same timeout, so the insertion order is also the order of the deadlines
+        self.__pending: Dict[Target, PendingRequest] = OrderedDict()
+        # targets of the expired requests that were not reported by expired yet
+        self.__expired: List[Target] = []
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__pending)
+
+    def add(self, target: Target, waiter: NetworkOpinionCallback) -> bool:
+        """Registers waiter for the target, returns True if the request should be sent to the network."""
+        now = self.__clock()
+        with self.__lock:
+            self.__expire(now)
+            pending = self.__pending.get(target)
+            if pending is not None:
+                # same callback is notified only once
+                if waiter not in pending.waiters:
+                    pending.waiters.append(waiter)
+                return False
+
+            self.__pending[target] = PendingRequest(deadline=now + self.__timeout_seconds, waiters=[waiter])
+            return True
+
+    def complete(self, target: Target) -> List[NetworkOpinionCallback]:
+        """Removes the request for the target and returns its waiters."""
+        with self.__lock:
+            pending = self.__pending.pop(target, None)
+            return pending.waiters if pending else []
+
+    def expired(self) -> List[Target]:
+        """Removes requests that did not get any response in time, returns targets of all requests
+        that expired since the last call."""
+        with self.__lock:
+            self.__expire(self.__clock())
+            expired, self.__expired = self.__expired, []
+            return expired
+
+    def __expire(self, now: float):
+        while self.__pending:
+            target, oldest = next(iter(self.__pending.items()))
+            if oldest.deadline > now:
+                return
+            logger.debug(f'Request for {target} expired, dropping {len(oldest.waiters)} waiters.')
+            self.__pending.popitem(last=False)
+            self.__expired.append(target)
+
 
 class ThreatIntelligenceProtocol(Protocol):
     """Class handling threat intelligence requests and responses."""
@@ -30,24 +106,40 @@ class ThreatIntelligenceProtocol(Protocol):
                  aggregator: OpinionAggregator,
                  trust_protocol: InitialTrustProtocol,
                  ti_evaluation_strategy: TIEvaluation,
-                 network_opinion_callback: Callable[[SlipsThreatIntelligence], None]
+                 network_opinion_callback: NetworkOpinionCallback,
+                 request_timeout_seconds: float = 10
                  ):
+        """
+        :param request_timeout_seconds: for how long are the requests for the same target coalesced
+        when waiting for the response from the network
+        """
         super().__init__(configuration, trust_db, bridge)
         self.__ti_db = ti_db
         self.__aggregator = aggregator
         self.__trust_protocol = trust_protocol
         self.__ti_evaluation_strategy = ti_evaluation_strategy
         self.__network_opinion_callback = network_opinion_callback
-
-    def request_data(self, target: Target):
-        """Requests network opinion on given target."""
+        self.__pending = PendingRequests(request_timeout_seconds)
+
+    def request_data(self, target: Target, callback: Optional[NetworkOpinionCallback] = None):
+        """Requests network opinion on given target.
+
+        If there's already a request for the target waiting for the network, no new request is sent
+        and the callback receives the result of the pending one.
+        :param target: target to get the opinion on
+        :param callback: receives the opinion, network opinion callback from the constructor if None
+        """
+        callback = callback if callback else self.__network_opinion_callback
+        self.__cache_unanswered()
         cached = self._trust_db.get_cached_network_opinion(target)
         if cached:
             logger.debug(f'TI for target {target} found in cache.')
-            return self.__network_opinion_callback(cached)
-        else:
+            return callback(cached)
+        elif self.__pending.add(target, callback):
             logger.debug(f'Requesting data for target {target} from network.')
             self._bridge.send_intelligence_request(target)
+        else:
+            logger.debug(f'Request for target {target} is already pending, waiting for its result.')
 
     def handle_intelligence_request(self, request_id: str, sender: PeerInfo, target: Target):
         """Handles intelligence request."""
@@ -89,7 +181,16 @@ class ThreatIntelligenceProtocol(Protocol):
         )
         self._evaluate_interactions(interaction_matrix)
 
-        return self.__network_opinion_callback(ti)
+        # responses can come even if we didn't ask (or the request expired), Slips wants to know anyway
+        waiters = self.__pending.complete(target) or [self.__network_opinion_callback]
+        for waiter in waiters:
+            waiter(ti)
+
+    def __cache_unanswered(self):
+        """Caches negative opinions on targets the network did not respond on, so they're not requested
+        again right away, the negative entries expire sooner than the others, see adaptive_ttl_seconds."""
+        for target in self.__pending.expired():
+            self._trust_db.cache_network_opinion(SlipsThreatIntelligence(score=0, confidence=0, target=target))
 
     def __filter_ti(self,
                     ti: Optional[SlipsThreatIntelligence],
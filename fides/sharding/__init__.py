@@ -0,0 +1 @@
+# multiprocess runtime that partitions trust matrix between worker processes
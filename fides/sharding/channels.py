@@ -0,0 +1,85 @@
+import itertools
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
+
+from fides.sharding.worker import CALL
+
+
+class ShardCallError(Exception):
+    """Raised when the call on the shard failed or timed out."""
+
+
+class ShardChannels:
+    """Inboxes of the shard workers and calls that are waiting for the reply."""
+
+    def __init__(self, inboxes: List, timeout_seconds: Optional[float]):
+        self.__inboxes = inboxes
+        self.__timeout_seconds = timeout_seconds
+        self.__call_ids = itertools.count()
+        self.__pending: Dict[int, Future] = {}
+        self.__call_ids_by_future: Dict[Future, int] = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def shards(self) -> int:
+        """Number of shards."""
+        return len(self.__inboxes)
+
+    def send(self, shard: int, command: tuple):
+        """Sends command to the shard, commands are executed in the order they were sent."""
+        self.__inboxes[shard].put(command)
+
+    def broadcast(self, command: tuple):
+        """Sends command to all shards."""
+        for inbox in self.__inboxes:
+            inbox.put(command)
+
+    def call(self, shard: int, method: str, *args) -> Future:
+        """Calls method on the shard, future is resolved once the shard processed all previous commands."""
+        future = Future()
+        with self.__lock:
+            call_id = next(self.__call_ids)
+            self.__pending[call_id] = future
+            self.__call_ids_by_future[future] = call_id
+        self.__inboxes[shard].put((CALL, call_id, method, args))
+        return future
+
+    def call_all(self, method: str, *args) -> List[Any]:
+        """Calls method on all shards in parallel and waits for all results."""
+        return self.wait([self.call(shard, method, *args) for shard in range(self.shards)])
+
+    def wait(self, futures: List[Future]) -> List[Any]:
+        """Waits for the results of the calls."""
+        return [self.result(future) for future in futures]
+
+    def result(self, future: Future) -> Any:
+        """Waits for the result of the call."""
+        try:
+            return future.result(self.__timeout_seconds)
+        except FutureTimeoutError:
+            # the late reply is dropped by resolve
+            with self.__lock:
+                call_id = self.__call_ids_by_future.pop(future, None)
+                self.__pending.pop(call_id, None)
+            raise ShardCallError(f'Shard did not reply in {self.__timeout_seconds}s!') from None
+
+    def resolve(self, call_id: int, result: Any, error: Optional[str]):
+        """Resolves the call with the reply from the shard."""
+        with self.__lock:
+            future = self.__pending.pop(call_id, None)
+            if future is None:
+                return
+            del self.__call_ids_by_future[future]
+        if error is not None:
+            future.set_exception(ShardCallError(error))
+        else:
+            future.set_result(result)
+
+    def fail_all(self, reason: str):
+        """Fails all calls that are waiting for the reply, used when the runtime stops."""
+        with self.__lock:
+            pending, self.__pending = self.__pending, {}
+            self.__call_ids_by_future = {}
+        for future in pending.values():
+            future.set_exception(ShardCallError(reason))
@@ -0,0 +1,54 @@
+import zlib
+from typing import Optional, Set, Tuple
+
+from fides.messaging.model import NetworkMessage
+from fides.model.aliases import PeerId
+
+COORDINATED_TYPES: Set[str] = {'nl2tl_peers_list', 'nl2tl_intelligence_response'}
+"""Message types that are always processed by the coordinator in the router process.
+
+Peer list update changes the connected peers of all shards and the intelligence responses complete
+requests that are pending in the coordinator and update its network opinion cache.
+"""
+
+
+def shard_of(peer_id: PeerId, shards: int) -> int:
+    """Returns index of the shard that owns trust data of the peer."""
+    return zlib.crc32(peer_id.encode()) % shards
+
+
+def message_peers(message: NetworkMessage) -> Optional[Set[PeerId]]:
+    """Returns peers whose trust data are read or written when processing the message.
+
+    None means that the message might touch any peer.
+    """
+    data = message.data
+    if message.type == 'nl2tl_intelligence_response':
+        # only the senders are evaluated, the opinion is aggregated from their trust
+        return {single['sender']['id'] for single in data}
+    if message.type in ('nl2tl_intelligence_request', 'nl2tl_alert'):
+        return {data['sender']['id']}
+    if message.type == 'nl2tl_recommendation_request':
+        return {data['sender']['id'], data['payload']}
+    if message.type == 'nl2tl_recommendation_response':
+        return {single['sender']['id'] for single in data} | {single['payload']['subject'] for single in data}
+    return None
+
+
+def route(message: NetworkMessage, shards: int) -> Tuple[Optional[int], Optional[Set[PeerId]]]:
+    """Returns index of the shard that can process the message on its own and the peers the message touches.
+
+    Shard is None if the message touches more shards or its type is coordinated, it must be then processed
+    by the coordinator. Peers are None if the message might touch any peer.
+    """
+    # noinspection PyBroadException
+    try:
+        peers = message_peers(message)
+    except Exception:
+        # malformed messages are handled by the coordinator, so they're reported at one place
+        return None, None
+
+    if not peers or message.type in COORDINATED_TYPES:
+        return None, peers
+    owners = {shard_of(peer, shards) for peer in peers}
+    return (owners.pop() if len(owners) == 1 else None), peers
@@ -0,0 +1,267 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from queue import SimpleQueue
+from typing import Callable, List, Optional, Set, Deque, Dict, Any
+
+from fides.messaging.model import NetworkMessage
+from fides.messaging.network_bridge import NetworkBridge
+from fides.messaging.queue import Queue
+from fides.model.aliases import PeerId
+from fides.model.configuration import TrustModelConfiguration
+from fides.model.threat_intelligence import SlipsThreatIntelligence
+from fides.sharding.channels import ShardChannels
+from fides.sharding.routing import route
+from fides.sharding.trust import ShardedTrustDatabase
+from fides.sharding.worker import ProtocolFactory, PartitionFactory, ShardProtocols, in_memory_partition, \
+    run_shard, MESSAGE, STOP, SEND, OPINION, REPLY
+from fides.utils.logger import Logger
+
+logger = Logger(__name__)
+
+_STOP_COLLECTOR = '__stop__'
+
+
+@dataclass
+class _Job:
+    """Message or function that is routed, shard is None for the jobs of the coordinator."""
+
+    shard: Optional[int]
+    peers: Optional[Set[PeerId]]
+    """Peers the job touches, None means all peers."""
+    message: Optional[NetworkMessage] = None
+    fn: Optional[Callable[['ShardProtocols'], Any]] = None
+    result: Optional[Future] = None
+
+
+class ShardedRuntime:
+    """
+    Runs trust protocols in multiple processes, each shard worker owns a partition of the trust matrix.
+
+    The router (this object, living in the main process) receives messages from the network and routes them
+    by the peers they touch - messages that touch peers of a single shard are processed by that shard,
+    the rest is processed by the coordinator thread in the router process, see ShardedTrustDatabase for
+    the cross-shard protocol.
+
+    The order of the messages is kept per peer. Router never waits for the coordinator - while the coordinator
+    processes the message, later messages that touch any of its peers are deferred and routed once
+    the coordinator stored the results. Messages that touch other peers are routed immediately.
+    Messages that might touch any peer, e.g. peer list updates, defer everything that comes after them.
+
+    It exposes the same entry points as the MessageHandler, so it can be passed to NetworkBridge.listen.
+    """
+
+    def __init__(self,
+                 queue: Queue,
+                 configuration: TrustModelConfiguration,
+                 factory: ProtocolFactory,
+                 network_opinion_callback: Callable[[SlipsThreatIntelligence], None],
+                 shards: Optional[int] = None,
+                 partition_factory: PartitionFactory = in_memory_partition,
+                 call_timeout_seconds: Optional[float] = 30,
+                 start_method: Optional[str] = None):
+        """
+        :param queue: queue used for communication with the network layer
+        :param configuration: trust model configuration
+        :param factory: creates protocols in the shards and in the coordinator
+        :param network_opinion_callback: executed in the router process when the network opinion is aggregated
+        :param shards: number of worker processes, number of CPUs if None
+        :param partition_factory: creates trust database for the shard partition
+        :param call_timeout_seconds: how long the coordinator waits for the reply from the shard
+        :param start_method: multiprocessing start method, default of the platform if None
+        """
+        self.__queue = queue
+        self.__configuration = configuration
+        self.__factory = factory
+        self.__network_opinion_callback = network_opinion_callback
+        self.__shards = max(1, shards if shards else os.cpu_count() or 1)
+        self.__partition_factory = partition_factory
+
+        self.__context = multiprocessing.get_context(start_method)
+        self.__outbox = self.__context.Queue()
+        self.__inboxes = [self.__context.Queue() for _ in range(self.__shards)]
+        self.__channels = ShardChannels(self.__inboxes, call_timeout_seconds)
+        self.__trust_db = ShardedTrustDatabase(configuration, self.__channels)
+
+        self.__processes: List[multiprocessing.Process] = []
+        self.__collector: Optional[threading.Thread] = None
+        self.__coordinator: Optional[ShardProtocols] = None
+        self.__coordinator_jobs: SimpleQueue = SimpleQueue()
+        self.__coordinator_thread: Optional[threading.Thread] = None
+
+        # guards the scheduling state only, it is never held when waiting for another process
+        self.__routing_lock = threading.Lock()
+        # peers touched by the jobs given to the coordinator that did not finish yet -> number of such jobs
+        self.__busy: Dict[PeerId, int] = {}
+        self.__busy_all = 0
+        # jobs that wait for the coordinator, in the order they were received
+        self.__deferred: Deque[_Job] = deque()
+        self.__deferred_peers: Dict[PeerId, int] = {}
+        self.__deferred_all = 0
+
+    @property
+    def trust_db(self) -> ShardedTrustDatabase:
+        """Trust database over all shards."""
+        return self.__trust_db
+
+    @property
+    def coordinator(self) -> ShardProtocols:
+        """Protocols running in the router process, use them to request data and dispatch alerts."""
+        return self.__coordinator
+
+    @property
+    def shards(self) -> int:
+        """Number of shards."""
+        return self.__shards
+
+    def start(self):
+        """Starts shard workers and creates coordinator."""
+        for index, inbox in enumerate(self.__inboxes):
+            process = self.__context.Process(
+                target=run_shard,
+                args=(index, self.__configuration, self.__factory, self.__partition_factory, inbox, self.__outbox),
+                name=f'fides-shard-{index}',
+                daemon=True
+            )
+            process.start()
+            self.__processes.append(process)
+
+        self.__collector = threading.Thread(target=self.__collect, name='fides-shard-collector', daemon=True)
+        self.__collector.start()
+        self.__coordinator = self.__factory(self.__trust_db, self.__queue, self.__network_opinion_callback)
+        self.__coordinator_thread = threading.Thread(target=self.__coordinate, name='fides-coordinator', daemon=True)
+        self.__coordinator_thread.start()
+        logger.info(f'Sharded runtime started with {self.__shards} shards.')
+
+    def listen(self, bridge: Optional[NetworkBridge] = None, block: bool = False, **argv):
+        """Starts receiving messages from the network queue."""
+        bridge = bridge if bridge else NetworkBridge(self.__queue)
+        return bridge.listen(self, block=block, **argv)
+
+    def coordinated(self, fn: Callable[[ShardProtocols], Any]) -> Any:
+        """Executes function with the coordinator protocols on the coordinator thread and returns its result.
+
+        Use this when calling the coordinator from another thread than the one receiving the messages,
+        the function might touch any peer, so it is ordered with all routed messages.
+        """
+        if threading.current_thread() is self.__coordinator_thread:
+            return fn(self.__coordinator)
+        job = _Job(shard=None, peers=None, fn=fn, result=Future())
+        with self.__routing_lock:
+            self.__schedule(job)
+        return job.result.result()
+
+    def on_message(self, message: NetworkMessage):
+        """Routes the message to the shard, or hands it over to the coordinator."""
+        shard, peers = route(message, self.__shards)
+        with self.__routing_lock:
+            self.__schedule(_Job(shard=shard, peers=peers, message=message))
+
+    def on_messages(self, messages: List[NetworkMessage]):
+        """Merges the batch the same way the handler does and routes the messages."""
+        # noinspection PyProtectedMember
+        for message in self.__coordinator.handler._merge_batch(messages):
+            self.on_message(message)
+
+    def on_error(self, original_data: str, exception: Optional[Exception] = None):
+        """Data that can not be parsed are handled by the coordinator."""
+        return self.__coordinator.handler.on_error(original_data, exception)
+
+    def drain(self):
+        """Waits until the coordinator and all shards processed everything that was routed to them."""
+        self.coordinated(lambda _: None)
+        self.__channels.call_all('ping')
+
+    def stop(self, timeout: Optional[float] = None):
+        """Processes everything that was routed and stops the workers."""
+        if self.__coordinator_thread is not None:
+            self.coordinated(lambda _: None)
+            self.__coordinator_jobs.put(None)
+            self.__coordinator_thread.join(timeout)
+        self.__channels.broadcast((STOP,))
+        for process in self.__processes:
+            process.join(timeout)
+        self.__outbox.put((_STOP_COLLECTOR,))
+        if self.__collector is not None:
+            self.__collector.join(timeout)
+        self.__channels.fail_all('Sharded runtime stopped!')
+
+    def __schedule(self, job: _Job):
+        # must be called with the routing lock
+        if self.__is_blocked(job.peers):
+            self.__deferred.append(job)
+            self.__count(self.__deferred_peers, job.peers, 1)
+            self.__deferred_all += job.peers is None
+        elif job.shard is not None:
+            self.__channels.send(job.shard, (MESSAGE, job.message))
+        else:
+            self.__count(self.__busy, job.peers, 1)
+            self.__busy_all += job.peers is None
+            self.__coordinator_jobs.put(job)
+
+    def __is_blocked(self, peers: Optional[Set[PeerId]]) -> bool:
+        # the job waits if it touches peers of unfinished coordinator job, or of the job that waits before it
+        if self.__busy_all or self.__deferred_all:
+            return True
+        if peers is None:
+            return bool(self.__busy or self.__deferred)
+        return any(p in self.__busy or p in self.__deferred_peers for p in peers)
+
+    def __finished(self, job: _Job):
+        with self.__routing_lock:
+            self.__count(self.__busy, job.peers, -1)
+            self.__busy_all -= job.peers is None
+            # deferred jobs are scheduled again in their order, those that are still blocked stay deferred
+            deferred, self.__deferred = self.__deferred, deque()
+            self.__deferred_peers, self.__deferred_all = {}, 0
+            for waiting in deferred:
+                self.__schedule(waiting)
+
+    @staticmethod
+    def __count(counts: Dict[PeerId, int], peers: Optional[Set[PeerId]], delta: int):
+        for peer in peers or ():
+            count = counts.get(peer, 0) + delta
+            if count:
+                counts[peer] = count
+            else:
+                del counts[peer]
+
+    def __coordinate(self):
+        while True:
+            job = self.__coordinator_jobs.get()
+            if job is None:
+                return
+            # noinspection PyBroadException
+            try:
+                if job.fn is not None:
+                    job.result.set_result(job.fn(self.__coordinator))
+                else:
+                    logger.debug(lambda: f'{job.message.type} is processed by the coordinator.')
+                    self.__coordinator.handler.on_message(job.message)
+            except Exception as ex:
+                if job.result is not None:
+                    job.result.set_exception(ex)
+                else:
+                    logger.error(f'Coordinator failed to process {job.message.type}! {ex}')
+            finally:
+                self.__finished(job)
+
+    def __collect(self):
+        while True:
+            event = self.__outbox.get()
+            kind = event[0]
+            # noinspection PyBroadException
+            try:
+                if kind == SEND:
+                    self.__queue.send(event[1])
+                elif kind == OPINION:
+                    self.__network_opinion_callback(event[1])
+                elif kind == REPLY:
+                    self.__channels.resolve(*event[1:])
+                elif kind == _STOP_COLLECTOR:
+                    return
+            except Exception as ex:
+                logger.error(f'Error when processing {kind} from the shard! {ex}')
@@ -0,0 +1,110 @@
+import itertools
+from typing import Dict, List, Optional, Union
+
+from fides.messaging.model import PeerInfo
+from fides.model.aliases import PeerId, Target, OrganisationId
+from fides.model.configuration import TrustModelConfiguration
+from fides.model.peer_trust_data import PeerTrustData, TrustMatrix
+from fides.model.threat_intelligence import SlipsThreatIntelligence
+from fides.persistence.trust import TrustDatabase, BulkWriteResult
+from fides.persistence.trust_in_memory import InMemoryTrustDatabase
+from fides.sharding.channels import ShardChannels
+from fides.sharding.routing import shard_of
+from fides.sharding.worker import STORE, CONNECTED
+
+
+class ShardedTrustDatabase(TrustDatabase):
+    """Trust database used by the coordinator, trust data are stored in the partitions of the shards.
+
+    This is the cross-shard protocol - fetch, compute, store:
+
+    - reads are calls to the shards that own the peers, a call is executed after all commands that
+      were sent to the shard before, so it sees all previous updates of the peer
+    - the coordinator computes new trust data in the router process
+    - writes are sent to the owners without waiting, they're executed before any message
+      that is routed to the shard later
+
+    While the coordinator processes the message, the router defers all later messages that touch
+    the same peers, thus the order per peer is kept even for the messages that touch more shards.
+    For the same reason, the default read-compute-store implementation of the updates is atomic
+    for the peers of the processed message.
+
+    Connected peers and network opinions are kept in the router process.
+    """
+
+    def __init__(self, configuration: TrustModelConfiguration, channels: ShardChannels):
+        super().__init__(configuration)
+        self.__channels = channels
+        self.__local = InMemoryTrustDatabase(configuration)
+
+    def store_connected_peers_list(self, current_peers: List[PeerInfo]):
+        """Stores list of peers that are directly connected to the Slips."""
+        self.__local.store_connected_peers_list(current_peers)
+        self.__channels.broadcast((CONNECTED, current_peers))
+
+    def get_connected_peers(self) -> List[PeerInfo]:
+        """Returns list of peers that are directly connected to the Slips."""
+        return self.__local.get_connected_peers()
+
+    def get_peers_info(self, peer_ids: List[PeerId]) -> List[PeerInfo]:
+        """Returns list of peer infos for given ids."""
+        futures = [self.__channels.call(shard, 'get_peers_info', ids) for shard, ids in self.__by_shard(peer_ids)]
+        return list(itertools.chain.from_iterable(self.__channels.wait(futures)))
+
+    def get_peers_with_organisations(self, organisations: List[OrganisationId]) -> List[PeerInfo]:
+        """Returns list of peers that have one of given organisations."""
+        return self.__gather('get_peers_with_organisations', organisations)
+
+    def get_peers_with_geq_recommendation_trust(self, minimal_recommendation_trust: float) -> List[PeerInfo]:
+        """Returns peers that have >= recommendation_trust then the minimal."""
+        return self.__gather('get_peers_with_geq_recommendation_trust', minimal_recommendation_trust)
+
+    def get_peers_with_geq_service_trust(self, minimal_service_trust: float) -> List[PeerInfo]:
+        """Returns peers that have >= service_trust then the minimal."""
+        return self.__gather('get_peers_with_geq_service_trust', minimal_service_trust)
+
+    def store_peer_trust_data(self, trust_data: PeerTrustData):
+        """Sends trust data to the shard that owns the peer."""
+        self.__channels.send(shard_of(trust_data.peer_id, self.__channels.shards), (STORE, [trust_data]))
+
+    def store_peer_trust_matrix(self, trust_matrix: TrustMatrix) -> BulkWriteResult:
+        """Sends trust data to the shards that own the peers, one command per shard.
+
+        Writes are not awaited, so the result reports peers that were handed over to their shards,
+        failures of the shard partitions are logged by the shards.
+        """
+        for shard, peer_ids in self.__by_shard(list(trust_matrix.keys())):
+            self.__channels.send(shard, (STORE, [trust_matrix[peer_id] for peer_id in peer_ids]))
+        return BulkWriteResult(stored=list(trust_matrix.keys()))
+
+    def get_peer_trust_data(self, peer: Union[PeerId, PeerInfo]) -> Optional[PeerTrustData]:
+        """Returns trust data for given peer ID, if no data are found, returns None."""
+        peer_id = peer.id if isinstance(peer, PeerInfo) else peer
+        shard = shard_of(peer_id, self.__channels.shards)
+        return self.__channels.result(self.__channels.call(shard, 'get_peer_trust_data', peer_id))
+
+    def get_peers_trust_data(self, peer_ids: List[Union[PeerId, PeerInfo]]) -> TrustMatrix:
+        """Return trust data for each peer from peer_ids, shards are asked in parallel."""
+        ids = [p.id if isinstance(p, PeerInfo) else p for p in peer_ids]
+        futures = [self.__channels.call(shard, 'get_peers_trust_data', ids) for shard, ids in self.__by_shard(ids)]
+        matrix: TrustMatrix = {}
+        for partial in self.__channels.wait(futures):
+            matrix.update(partial)
+        return matrix
+
+    def cache_network_opinion(self, ti: SlipsThreatIntelligence):
+        """Caches aggregated opinion on given target."""
+        self.__local.cache_network_opinion(ti)
+
+    def get_cached_network_opinion(self, target: Target) -> Optional[SlipsThreatIntelligence]:
+        """Returns cached network opinion. Checks cache time and returns None if data expired."""
+        return self.__local.get_cached_network_opinion(target)
+
+    def __gather(self, method: str, *args) -> List[PeerInfo]:
+        return list(itertools.chain.from_iterable(self.__channels.call_all(method, *args)))
+
+    def __by_shard(self, peer_ids: List[PeerId]) -> List[tuple]:
+        groups: Dict[int, List[PeerId]] = {}
+        for peer_id in peer_ids:
+            groups.setdefault(shard_of(peer_id, self.__channels.shards), []).append(peer_id)
+        return list(groups.items())
@@ -0,0 +1,132 @@
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from fides.messaging.message_handler import MessageHandler
+from fides.messaging.queue import Queue
+from fides.model.configuration import TrustModelConfiguration
+from fides.model.threat_intelligence import SlipsThreatIntelligence
+from fides.persistence.trust import TrustDatabase
+from fides.persistence.trust_in_memory import InMemoryTrustDatabase
+from fides.protocols.alert import AlertProtocol
+from fides.protocols.threat_intelligence import ThreatIntelligenceProtocol
+from fides.utils.logger import Logger
+
+logger = Logger(__name__)
+
+# commands sent from the router to the shard
+MESSAGE = 'message'
+"""(MESSAGE, NetworkMessage) - process the message."""
+STORE = 'store'
+"""(STORE, List[PeerTrustData]) - store the trust data, no reply is sent."""
+CONNECTED = 'connected'
+"""(CONNECTED, List[PeerInfo]) - store the list of connected peers, no reply is sent."""
+CALL = 'call'
+"""(CALL, call id, method name, args) - call read method of the partition and reply with the result."""
+STOP = 'stop'
+"""(STOP,) - stop the worker."""
+
+# events sent from the shard to the router
+SEND = 'send'
+"""(SEND, serialized data) - send data to the network queue."""
+OPINION = 'opinion'
+"""(OPINION, SlipsThreatIntelligence) - execute network opinion callback."""
+REPLY = 'reply'
+"""(REPLY, call id, result, error) - result of the CALL, error is None when the call succeeded."""
+
+CALLABLE_METHODS = {
+    'get_peer_trust_data', 'get_peers_trust_data', 'get_peers_info', 'get_peers_with_organisations',
+    'get_peers_with_geq_recommendation_trust', 'get_peers_with_geq_service_trust', 'ping'
+}
+"""Methods of the partition the router can call, ping is handled by the worker itself."""
+
+
+@dataclass
+class ShardProtocols:
+    """Protocols created by the ProtocolFactory."""
+
+    handler: MessageHandler
+    """Handler that processes the messages."""
+
+    intelligence: Optional[ThreatIntelligenceProtocol] = None
+    """Used to request data from the network, only needed in the coordinator."""
+
+    alert: Optional[AlertProtocol] = None
+    """Used to dispatch alerts, only needed in the coordinator."""
+
+
+ProtocolFactory = Callable[[TrustDatabase, Queue, Callable[[SlipsThreatIntelligence], None]], ShardProtocols]
+"""Creates protocols on top of given trust database, network queue and network opinion callback.
+
+It is executed in every worker process and in the router for the coordinator, so it must be picklable
+(top level function) when the processes are spawned.
+"""
+
+PartitionFactory = Callable[[TrustModelConfiguration, int], TrustDatabase]
+"""Creates trust database that stores the partition of the shard with given index."""
+
+
+class OutboxQueue(Queue):
+    """Queue used by protocols in the shard, sent data are forwarded to the router."""
+
+    def __init__(self, outbox):
+        self.__outbox = outbox
+
+    def send(self, serialized_data: str, **argv):
+        self.__outbox.put((SEND, serialized_data))
+
+    def listen(self, on_message: Callable[[str], None], **argv):
+        raise NotImplementedError('Shards do not listen, messages are routed to them by the router.')
+
+
+def in_memory_partition(configuration: TrustModelConfiguration, index: int) -> TrustDatabase:
+    """Default partition factory."""
+    return InMemoryTrustDatabase(configuration)
+
+
+def run_shard(index: int,
+              configuration: TrustModelConfiguration,
+              factory: ProtocolFactory,
+              partition_factory: PartitionFactory,
+              inbox,
+              outbox):
+    """Main loop of the shard worker process.
+
+    Commands are executed in the order they were received, that's what guarantees the order per peer.
+    """
+    trust_db = partition_factory(configuration, index)
+    protocols = factory(trust_db, OutboxQueue(outbox), lambda ti: outbox.put((OPINION, ti)))
+    logger.debug(f'Shard {index} started.')
+
+    while True:
+        command = inbox.get()
+        kind = command[0]
+        # noinspection PyBroadException
+        try:
+            if kind == MESSAGE:
+                protocols.handler.on_message(command[1])
+            elif kind == STORE:
+                result = trust_db.store_peer_trust_matrix({p.peer_id: p for p in command[1]})
+                if not result.ok:
+                    logger.error(f'Shard {index} failed to store peers {sorted(result.failed)}! {result.failed}')
+            elif kind == CONNECTED:
+                trust_db.store_connected_peers_list(command[1])
+            elif kind == CALL:
+                _, call_id, method, args = command
+                outbox.put((REPLY, call_id, *_call(trust_db, method, args)))
+            elif kind == STOP:
+                logger.debug(f'Shard {index} stopped.')
+                return
+        except Exception as ex:
+            logger.error(f'Shard {index} failed to execute {kind}! {ex}')
+
+
+def _call(trust_db: TrustDatabase, method: str, args: tuple) -> tuple:
+    if method not in CALLABLE_METHODS:
+        return None, f'Method {method} can not be called on the shard!'
+    if method == 'ping':
+        return True, None
+    # noinspection PyBroadException
+    try:
+        return getattr(trust_db, method)(*args), None
+    except Exception as ex:
+        return None, str(ex)
@@ -0,0 +1,49 @@
+import hashlib
+import math
+from typing import Iterable
+
+
+class BloomFilter:
+    """Probabilistic set, it can answer that an item is definitely not in the set or that it probably is.
+
+    Positions of the item are derived by double hashing from a single blake2b digest.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """
+        :param capacity: number of items the filter is sized for
+        :param error_rate: probability of false positive when the filter holds capacity items
+        """
+        capacity = max(1, capacity)
+        self.__size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.__hashes = max(1, round(self.__size / capacity * math.log(2)))
+        self.__bits = bytearray((self.__size + 7) // 8)
+        self.__count = 0
+
+    @classmethod
+    def of(cls, items: Iterable[str], capacity: int, error_rate: float = 0.01) -> 'BloomFilter':
+        """Creates filter with given items."""
+        bloom_filter = cls(capacity, error_rate)
+        for item in items:
+            bloom_filter.add(item)
+        return bloom_filter
+
+    def __len__(self) -> int:
+        """Number of added items, including duplicates."""
+        return self.__count
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.__bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self.__positions(item))
+
+    def add(self, item: str):
+        """Adds item to the filter."""
+        bits = self.__bits
+        for p in self.__positions(item):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.__count += 1
+
+    def __positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.__size for i in range(self.__hashes))
@@ -0,0 +1,36 @@
+import threading
+from contextlib import contextmanager
+from typing import Collection, Hashable, Iterator
+
+
+class StripedLock:
+    """Fixed set of reentrant locks, each key is guarded by the lock selected by its hash.
+
+    Keys that fall to different stripes can be locked in parallel, while the number of locks
+    does not grow with the number of keys.
+    """
+
+    def __init__(self, stripes: int = 64):
+        """
+        :param stripes: number of locks
+        """
+        self.__locks = [threading.RLock() for _ in range(stripes)]
+
+    @contextmanager
+    def locked(self, keys: Collection[Hashable]) -> Iterator[None]:
+        """Holds locks of all keys, they're acquired in the order of stripes, so two holders can not deadlock."""
+        stripes = len(self.__locks)
+        if len(keys) >= stripes:
+            # large batches hit almost every stripe anyway
+            locks = self.__locks
+        else:
+            locks = [self.__locks[i] for i in sorted({hash(key) % stripes for key in keys})]
+        acquired = []
+        try:
+            for lock in locks:
+                lock.acquire()
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
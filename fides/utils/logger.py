@@ -1,7 +1,7 @@
 import json
 import threading
 from dataclasses import is_dataclass, asdict
-from typing import Optional, List, Callable
+from typing import Optional, List, Callable, Dict, Union
 
 LoggerPrintCallbacks: List[Callable[[str, str], None]] = [lambda level, msg: print(f'{level}: {msg}')]
 """Set this to custom callback that should be executed when there's new log message.
@@ -9,6 +9,28 @@ LoggerPrintCallbacks: List[Callable[[str, str], None]] = [lambda level, msg: pri
 First parameter is level ('DEBUG', 'INFO', 'WARN', 'ERROR'), second is message to be logged.
 """
 
+LogLevels: Dict[str, int] = {'DEBUG': 10, 'INFO': 20, 'WARN': 30, 'ERROR': 40}
+"""Severity of the levels, messages with lower severity than the threshold are not logged."""
+
+_DEBUG, _INFO, _WARN = LogLevels['DEBUG'], LogLevels['INFO'], LogLevels['WARN']
+
+_global_threshold: int = _DEBUG
+
+
+def set_global_level(level: str):
+    """Sets minimal level that is logged by all loggers that do not have their own level set."""
+    global _global_threshold
+    _global_threshold = LogLevels[level]
+
+
+def get_global_level() -> str:
+    """Returns minimal level that is logged by loggers that do not have their own level set."""
+    return next(name for name, value in LogLevels.items() if value == _global_threshold)
+
+
+LazyMessage = Union[str, Callable[[], str]]
+"""Message or function that creates it, the function is executed only if the message is logged."""
+
 
 class Logger:
     """Logger class used for logging.
@@ -17,11 +39,30 @@ class Logger:
     otherwise it uses basic println.
     """
 
-    def __init__(self, name: Optional[str] = None):
+    def __init__(self, name: Optional[str] = None, level: Optional[str] = None):
+        """
+        :param name: name of the logger
+        :param level: minimal level this logger logs, if None, global level is used, see set_global_level
+        """
         # try to guess the name if it is not set explicitly
         if name is None:
             name = self.__try_to_guess_name()
         self.__name = name
+        self.__threshold: Optional[int] = LogLevels[level] if level else None
+
+    def set_level(self, level: Optional[str]):
+        """Sets minimal level this logger logs, None means that the global level is used."""
+        self.__threshold = LogLevels[level] if level else None
+
+    def is_enabled_for(self, level: str) -> bool:
+        """Determines if the messages with given level are logged."""
+        threshold = self.__threshold if self.__threshold is not None else _global_threshold
+        return LogLevels[level] >= threshold
+
+    @property
+    def is_debug_enabled(self) -> bool:
+        """Determines if the debug messages are logged, use it to guard expensive debug logging."""
+        return self.is_enabled_for('DEBUG')
 
     # this whole method is a hack
     # noinspection PyBroadException
@@ -42,27 +83,42 @@ class Logger:
             name = "logger"
         return name
 
-    def debug(self, message: str, params=None):
+    # the level check is inlined in each method, so the disabled call does as little work as possible
+    # and no message or parameter is formatted
+
+    def debug(self, message: LazyMessage, params=None):
+        """Logs debug message, message and params can be functions that are executed only if it is logged."""
+        threshold = self.__threshold if self.__threshold is not None else _global_threshold
+        if threshold > _DEBUG:
+            return
         return self.__print('DEBUG', message, params)
 
-    def info(self, message: str, params=None):
+    def info(self, message: LazyMessage, params=None):
+        threshold = self.__threshold if self.__threshold is not None else _global_threshold
+        if threshold > _INFO:
+            return
         return self.__print('INFO', message, params)
 
-    def warn(self, message: str, params=None):
+    def warn(self, message: LazyMessage, params=None):
+        threshold = self.__threshold if self.__threshold is not None else _global_threshold
+        if threshold > _WARN:
+            return
         return self.__print('WARN', message, params)
 
-    def error(self, message: str, params=None):
+    def error(self, message: LazyMessage, params=None):
         return self.__print('ERROR', message, params)
 
-    def __format(self, message: str, params=None):
+    def __format(self, message: LazyMessage, params=None):
         thread = threading.get_ident()
+        message = message() if callable(message) else message
         formatted_message = f"T{thread}: {self.__name} -  {message}"
+        params = params() if callable(params) else params
         if params:
             params = asdict(params) if is_dataclass(params) else params
             formatted_message = f"{formatted_message} {json.dumps(params)}"
         return formatted_message
 
-    def __print(self, level: str, message: str, params=None):
+    def __print(self, level: str, message: LazyMessage, params=None):
         formatted_message = self.__format(message, params)
         for print_callback in LoggerPrintCallbacks:
             print_callback(level, formatted_message)
@@ -0,0 +1,386 @@
+import http.server
+import math
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+LabelValues = Tuple[str, ...]
+"""Values of the labels in the order they were declared."""
+
+
+class Counter:
+    """Monotonically increasing value."""
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        """Increases the counter."""
+        self.value += amount
+
+
+class Gauge:
+    """Value that can go up and down."""
+
+    def __init__(self, read: Optional[Callable[[], float]] = None):
+        """
+        :param read: if set, the value is read from this function when the metrics are exported
+        """
+        self.__value = 0.0
+        self.__read = read
+
+    @property
+    def value(self) -> float:
+        """Current value."""
+        return self.__read() if self.__read else self.__value
+
+    def set(self, value: float):
+        """Sets the value."""
+        self.__value = value
+
+    def inc(self, amount: float = 1):
+        """Increases the value."""
+        self.__value += amount
+
+    def dec(self, amount: float = 1):
+        """Decreases the value."""
+        self.__value -= amount
+
+
+class Histogram:
+    """HDR-style histogram of durations in seconds.
+
+    Values are recorded in microseconds to log-linear buckets - each power of two is split
+    to 2^(significant_bits - 1) linear sub-buckets, so the relative error is bounded by 2^-(significant_bits - 1)
+    while the number of buckets grows only logarithmically with the recorded range.
+    """
+
+    def __init__(self, significant_bits: int = 5):
+        self.__bits = significant_bits
+        self.__half = 1 << (significant_bits - 1)
+        self.__buckets: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        """Records the duration."""
+        self.count += 1
+        self.sum += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        index = self.__index(int(seconds * 1_000_000))
+        self.__buckets[index] = self.__buckets.get(index, 0) + 1
+
+    def observe_since(self, started: Optional[float]):
+        """Records time elapsed since :param: started from MetricsRegistry.start, does nothing if it is None."""
+        if started is not None:
+            self.observe(time.perf_counter() - started)
+
+    def quantile(self, q: float) -> float:
+        """Returns approximate value of the quantile in seconds."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index in sorted(self.__buckets):
+            seen += self.__buckets[index]
+            if seen >= rank:
+                return min(self.max, max(self.min, self.__upper_bound(index) / 1_000_000))
+        return self.max
+
+    def __index(self, value: int) -> int:
+        if value < (1 << self.__bits):
+            return value
+        exponent = value.bit_length() - self.__bits
+        return (1 << self.__bits) + (exponent - 1) * self.__half + ((value >> exponent) - self.__half)
+
+    def __upper_bound(self, index: int) -> int:
+        if index < (1 << self.__bits):
+            return index
+        exponent, sub_bucket = divmod(index - (1 << self.__bits), self.__half)
+        exponent += 1
+        return ((sub_bucket + self.__half + 1) << exponent) - 1
+
+
+class Family:
+    """Metrics of the same name that differ in values of the labels."""
+
+    def __init__(self, name: str, help_text: str, kind: str, labels: Tuple[str, ...], create: Callable):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.label_names = labels
+        self.__create = create
+        self.__children: Dict[LabelValues, object] = {}
+        self.__lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """Returns metric for given label values."""
+        child = self.__children.get(values)
+        if child is None:
+            with self.__lock:
+                child = self.__children.setdefault(values, self.__create())
+        return child
+
+    def replace(self, values: LabelValues, metric: object):
+        """Replaces metric for given label values."""
+        with self.__lock:
+            self.__children[values] = metric
+
+    def remove(self, values: LabelValues, metric: object):
+        """Removes metric for given label values, if it was not replaced by another one in the meantime."""
+        with self.__lock:
+            if self.__children.get(values) is metric:
+                del self.__children[values]
+
+    def children(self) -> List[Tuple[LabelValues, object]]:
+        """All metrics of the family."""
+        with self.__lock:
+            return list(self.__children.items())
+
+
+class _NoopMetric:
+    """Returned when the metrics are disabled, accepts everything and records nothing."""
+
+    value = 0.0
+
+    def labels(self, *values):
+        return self
+
+    def inc(self, amount: float = 1):
+        pass
+
+    def dec(self, amount: float = 1):
+        pass
+
+    def set(self, value: float):
+        pass
+
+    def observe(self, seconds: float):
+        pass
+
+    def observe_since(self, started: Optional[float]):
+        pass
+
+
+_NOOP = _NoopMetric()
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+"""Quantiles of the histograms that are exported."""
+
+
+class MetricsRegistry:
+    """
+    Registry of counters, gauges and histograms.
+
+    Metrics are created once (usually at the module level) and recorded on the hot path.
+    While the registry is disabled, recording does nothing and MetricsRegistry.start returns None,
+    so the timed code does not even read the clock.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.__families: Dict[str, Family] = {}
+        self.__lock = threading.Lock()
+        self.__server: Optional[http.server.HTTPServer] = None
+
+    def enable(self):
+        """Starts recording."""
+        self.enabled = True
+
+    def disable(self):
+        """Stops recording, already recorded values are kept."""
+        self.enabled = False
+
+    def start(self) -> Optional[float]:
+        """Returns current time for Histogram.observe_since, or None if the registry is disabled."""
+        return time.perf_counter() if self.enabled else None
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> 'MetricHandle':
+        """Registers counter, returns the existing one if it was already registered."""
+        return self.__register(name, help_text, 'counter', labels, Counter)
+
+    def gauge(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> 'MetricHandle':
+        """Registers gauge, returns the existing one if it was already registered."""
+        return self.__register(name, help_text, 'gauge', labels, Gauge)
+
+    def gauge_function(self, name: str, help_text: str, read: Callable[[], float], *label_values: str,
+                       labels: Tuple[str, ...] = ()) -> Gauge:
+        """Registers gauge whose value is read from the function when the metrics are exported.
+
+        Registering the same name and label values again replaces the function.
+        The registry keeps the function alive, owner should unregister the returned gauge when it is closed.
+        """
+        family = self.__family(name, help_text, 'gauge', labels, Gauge)
+        gauge = Gauge(read)
+        family.replace(label_values, gauge)
+        return gauge
+
+    def unregister(self, name: str, metric: object, *label_values: str):
+        """Removes the metric registered for given label values, unless it was already replaced by another one."""
+        with self.__lock:
+            family = self.__families.get(name)
+        if family is not None:
+            family.remove(label_values, metric)
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> 'MetricHandle':
+        """Registers histogram of durations in seconds, returns the existing one if it was already registered."""
+        return self.__register(name, help_text, 'summary', labels, Histogram)
+
+    def snapshot(self) -> Dict[str, object]:
+        """Returns current values, histograms are exported as dictionaries with count, sum and quantiles."""
+        result = {}
+        for family in self.__sorted_families():
+            for values, metric in family.children():
+                key = family.name + _format_labels(family.label_names, values)
+                if isinstance(metric, Histogram):
+                    result[key] = {
+                        'count': metric.count,
+                        'sum': metric.sum,
+                        'min': metric.min if metric.count else 0.0,
+                        'max': metric.max,
+                        **{_quantile_key(q): metric.quantile(q) for q in QUANTILES}
+                    }
+                else:
+                    result[key] = metric.value
+        return result
+
+    def to_prometheus(self) -> str:
+        """Exports current values in Prometheus text format."""
+        lines = []
+        for family in self.__sorted_families():
+            lines.append(f'# HELP {family.name} {family.help}')
+            lines.append(f'# TYPE {family.name} {family.kind}')
+            for values, metric in family.children():
+                if isinstance(metric, Histogram):
+                    for q in QUANTILES:
+                        labels = _format_labels(family.label_names + ('quantile',), values + (str(q),))
+                        lines.append(f'{family.name}{labels} {_format_value(metric.quantile(q))}')
+                    labels = _format_labels(family.label_names, values)
+                    lines.append(f'{family.name}_sum{labels} {_format_value(metric.sum)}')
+                    lines.append(f'{family.name}_count{labels} {metric.count}')
+                else:
+                    labels = _format_labels(family.label_names, values)
+                    lines.append(f'{family.name}{labels} {_format_value(metric.value)}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str):
+        """Writes metrics in Prometheus text format to the file, e.g. for the node exporter textfile collector.
+
+        The file is replaced atomically, so the reader never sees partially written file.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temporary = tempfile.mkstemp(dir=directory, prefix='.fides-metrics-')
+        with os.fdopen(fd, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(temporary, path)
+
+    def serve_prometheus(self, port: int, host: str = '127.0.0.1') -> int:
+        """Serves metrics in Prometheus text format over HTTP on the local socket, returns the port."""
+        registry = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.__server = http.server.HTTPServer((host, port), Handler)
+        threading.Thread(target=self.__server.serve_forever, name='fides-metrics', daemon=True).start()
+        return self.__server.server_address[1]
+
+    def stop_serving(self):
+        """Stops HTTP server started by serve_prometheus."""
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+
+    def clear(self):
+        """Removes all registered metrics."""
+        with self.__lock:
+            self.__families.clear()
+
+    def __register(self, name: str, help_text: str, kind: str, labels: Tuple[str, ...], create: Callable):
+        return MetricHandle(self, self.__family(name, help_text, kind, labels, create))
+
+    def __family(self, name: str, help_text: str, kind: str, labels: Tuple[str, ...], create: Callable) -> Family:
+        with self.__lock:
+            family = self.__families.get(name)
+            if family is None:
+                family = Family(name, help_text, kind, tuple(labels), create)
+                self.__families[name] = family
+            elif family.kind != kind or family.label_names != tuple(labels):
+                raise ValueError(f'Metric {name} is already registered as {family.kind} {family.label_names}!')
+            return family
+
+    def __sorted_families(self) -> List[Family]:
+        with self.__lock:
+            return sorted(self.__families.values(), key=lambda f: f.name)
+
+
+class MetricHandle:
+    """Metric as seen by the instrumented code, records nothing while the registry is disabled."""
+
+    def __init__(self, registry: MetricsRegistry, family: Family):
+        self.__registry = registry
+        self.__family = family
+        self.__unlabelled = family.labels() if not family.label_names else None
+
+    def labels(self, *values: str):
+        """Returns metric for given label values."""
+        return self.__family.labels(*values) if self.__registry.enabled else _NOOP
+
+    def inc(self, amount: float = 1):
+        if self.__registry.enabled:
+            self.__unlabelled.inc(amount)
+
+    def dec(self, amount: float = 1):
+        if self.__registry.enabled:
+            self.__unlabelled.dec(amount)
+
+    def set(self, value: float):
+        if self.__registry.enabled:
+            self.__unlabelled.set(value)
+
+    def observe(self, seconds: float):
+        if self.__registry.enabled:
+            self.__unlabelled.observe(seconds)
+
+    def observe_since(self, started: Optional[float]):
+        if started is not None:
+            self.__unlabelled.observe_since(started)
+
+
+def _quantile_key(q: float) -> str:
+    # 0.5 -> p50, 0.999 -> p999
+    return 'p' + f'{q * 100:g}'.replace('.', '')
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues) -> str:
+    if not names:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return '{' + ','.join(f'{n}="{v}"' for n, v in zip(names, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+metrics = MetricsRegistry()
+"""Global registry used by Fides, disabled by default."""
@@ -0,0 +1,138 @@
+from bisect import bisect_left, insort
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+_SHARDS = 1024
+_EMPTY: dict = {}
+
+
+class ShardedMap(Mapping):
+    """Immutable mapping split to shards by the hash of the key.
+
+    Update creates a new map that shares all shards that were not changed with this one,
+    so it copies only a small part of the data.
+    """
+
+    def __init__(self, shards: Optional[Tuple[dict, ...]] = None, size: int = 0):
+        self.__shards = shards if shards is not None else (_EMPTY,) * _SHARDS
+        self.__size = size
+
+    def __getitem__(self, key):
+        return self.__shards[hash(key) & (_SHARDS - 1)][key]
+
+    def get(self, key, default=None):
+        return self.__shards[hash(key) & (_SHARDS - 1)].get(key, default)
+
+    def __contains__(self, key) -> bool:
+        return key in self.__shards[hash(key) & (_SHARDS - 1)]
+
+    def __iter__(self) -> Iterator:
+        for shard in self.__shards:
+            yield from shard
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def values(self):
+        return [value for shard in self.__shards for value in shard.values()]
+
+    def updated(self, items: Iterable[Tuple[Any, Any]]) -> 'ShardedMap':
+        """Returns new map with the items set."""
+        shards = list(self.__shards)
+        copied: Dict[int, dict] = {}
+        for key, value in items:
+            index = hash(key) & (_SHARDS - 1)
+            shard = copied.get(index)
+            if shard is None:
+                shard = copied[index] = dict(shards[index])
+            shard[key] = value
+        size = self.__size
+        for index, shard in copied.items():
+            size += len(shard) - len(shards[index])
+            shards[index] = shard
+        return ShardedMap(tuple(shards), size)
+
+
+_CHUNK = 512
+
+
+class ChunkedSortedList:
+    """Immutable sorted list split to chunks of roughly the same size.
+
+    Update creates a new list that shares all chunks that were not changed with this one.
+    Large updates rebuild the whole list, sorting it once is faster than inserting items one by one.
+    """
+
+    def __init__(self, chunks: Optional[List[list]] = None):
+        self.__chunks: List[list] = chunks if chunks is not None else []
+        # last item of every chunk, used to find the chunk an item belongs to
+        self.__lasts = [chunk[-1] for chunk in self.__chunks]
+
+    def __len__(self) -> int:
+        return sum(len(chunk) for chunk in self.__chunks)
+
+    def __iter__(self) -> Iterator:
+        for chunk in self.__chunks:
+            yield from chunk
+
+    def irange_from(self, minimal) -> Iterator:
+        """Iterates over items that are >= minimal."""
+        index = bisect_left(self.__lasts, minimal)
+        if index == len(self.__chunks):
+            return
+        chunk = self.__chunks[index]
+        yield from chunk[bisect_left(chunk, minimal):]
+        for chunk in self.__chunks[index + 1:]:
+            yield from chunk
+
+    def updated(self, removed: List, added: List) -> 'ChunkedSortedList':
+        """Returns new list without the removed items and with the added ones."""
+        if len(removed) + len(added) > _CHUNK:
+            return self.__rebuilt(removed, added)
+
+        chunks, lasts = list(self.__chunks), list(self.__lasts)
+        # ids of chunks that were copied by this update and can be modified
+        copied = set()
+
+        def writable(i: int) -> list:
+            if id(chunks[i]) not in copied:
+                chunks[i] = list(chunks[i])
+                copied.add(id(chunks[i]))
+            return chunks[i]
+
+        for item in removed:
+            i = bisect_left(lasts, item)
+            if i == len(chunks):
+                continue
+            chunk = writable(i)
+            position = bisect_left(chunk, item)
+            if position < len(chunk) and chunk[position] == item:
+                del chunk[position]
+            if chunk:
+                lasts[i] = chunk[-1]
+            else:
+                del chunks[i], lasts[i]
+
+        for item in added:
+            if not chunks:
+                chunks.append([item])
+                lasts.append(item)
+                copied.add(id(chunks[0]))
+                continue
+            i = min(bisect_left(lasts, item), len(chunks) - 1)
+            chunk = writable(i)
+            insort(chunk, item)
+            lasts[i] = chunk[-1]
+            if len(chunk) > 2 * _CHUNK:
+                head, tail = chunk[:_CHUNK], chunk[_CHUNK:]
+                chunks[i:i + 1] = [head, tail]
+                lasts[i:i + 1] = [head[-1], tail[-1]]
+                copied.update((id(head), id(tail)))
+        return ChunkedSortedList(chunks)
+
+    def __rebuilt(self, removed: List, added: List) -> 'ChunkedSortedList':
+        excluded = set(removed)
+        items = [item for item in self if item not in excluded] if excluded else list(self)
+        items.extend(added)
+        items.sort()
+        return ChunkedSortedList([items[i:i + _CHUNK] for i in range(0, len(items), _CHUNK)])
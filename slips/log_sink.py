@@ -0,0 +1,130 @@
+import heapq
+import itertools
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from fides.utils.logger import LogLevels
+
+LogLine = Tuple[int, str, str]
+"""Log line waiting in the buffer - (sequence number, level, message)."""
+
+
+class SlipsLogSink:
+    """Ships log lines to the Slips output queue from a background thread.
+
+    Logging only appends the line to a bounded buffer, so it never blocks the thread
+    that handles messages. When the buffer is full, DEBUG lines are dropped first,
+    then the oldest lines of other levels. Dropped lines are counted per level.
+
+    Lines are taken from the buffer in batches of up to :param: batch_size lines, so the lock is taken
+    and the thread woken up once per batch. Slips formats every item in the output queue as a single record,
+    so each line is still put as its own item.
+    """
+
+    def __init__(self,
+                 output_queue,
+                 module_name: str,
+                 capacity: int = 10_000,
+                 batch_size: int = 100,
+                 flush_interval_seconds: float = 0.1):
+        self.__output = output_queue
+        self.__module_name = module_name
+        self.__capacity = max(1, capacity)
+        self.__batch_size = max(1, batch_size)
+        self.__flush_interval_seconds = flush_interval_seconds
+
+        self.__sequence = itertools.count()
+        self.__debug_lines: Deque[LogLine] = deque()
+        self.__other_lines: Deque[LogLine] = deque()
+        self.__dropped: Dict[str, int] = {level: 0 for level in LogLevels.keys()}
+        self.__condition = threading.Condition()
+        self.__stopped = False
+        self.__thread: Optional[threading.Thread] = None
+
+    @property
+    def dropped(self) -> Dict[str, int]:
+        """Number of dropped lines per level."""
+        return dict(self.__dropped)
+
+    def start(self):
+        """Starts shipping thread, must be called in the process that logs."""
+        self.__stopped = False
+        self.__thread = threading.Thread(target=self.__ship, name='slips-log-sink', daemon=True)
+        self.__thread.start()
+
+    def log(self, level: str, msg: str):
+        """Appends line to the buffer, never blocks on the output queue."""
+        with self.__condition:
+            if len(self.__debug_lines) + len(self.__other_lines) >= self.__capacity:
+                if self.__debug_lines:
+                    dropped_level = self.__debug_lines.popleft()[1]
+                elif level == 'DEBUG':
+                    self.__dropped[level] = self.__dropped.get(level, 0) + 1
+                    return
+                else:
+                    dropped_level = self.__other_lines.popleft()[1]
+                self.__dropped[dropped_level] = self.__dropped.get(dropped_level, 0) + 1
+
+            line = (next(self.__sequence), level, msg)
+            if level == 'DEBUG':
+                self.__debug_lines.append(line)
+            else:
+                self.__other_lines.append(line)
+
+            if len(self.__debug_lines) + len(self.__other_lines) >= self.__batch_size:
+                self.__condition.notify()
+
+    def close(self, timeout: Optional[float] = None):
+        """Ships all buffered lines and stops the shipping thread."""
+        with self.__condition:
+            self.__stopped = True
+            self.__condition.notify()
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+        else:
+            # thread was never started, so we ship everything from the current thread
+            while self.__ship_batch():
+                pass
+
+    def __ship(self):
+        while True:
+            with self.__condition:
+                if not self.__stopped and not self.__is_full_batch():
+                    self.__condition.wait(self.__flush_interval_seconds)
+                stopped = self.__stopped
+
+            # ship everything that is in the buffer
+            while self.__ship_batch():
+                pass
+            if stopped:
+                return
+
+    def __is_full_batch(self) -> bool:
+        return len(self.__debug_lines) + len(self.__other_lines) >= self.__batch_size
+
+    def __ship_batch(self) -> bool:
+        with self.__condition:
+            batch = self.__take_batch()
+        if not batch:
+            return False
+
+        for shipped, (_, level, msg) in enumerate(batch):
+            # noinspection PyBroadException
+            try:
+                self.__output.put(f'33|{self.__module_name}|{level} {msg}')
+            except Exception as ex:
+                # there's no other place where to log it
+                print(f'Fides log sink was not able to ship {len(batch) - shipped} lines! {ex}')
+                break
+        return True
+
+    def __take_batch(self) -> List[LogLine]:
+        # both buffers are ordered by the sequence number, so we merge them to keep the order
+        batch = list(itertools.islice(heapq.merge(self.__debug_lines, self.__other_lines), self.__batch_size))
+        debug_count = sum(1 for _, level, _ in batch if level == 'DEBUG')
+        for _ in range(debug_count):
+            self.__debug_lines.popleft()
+        for _ in range(len(batch) - debug_count):
+            self.__other_lines.popleft()
+        return batch
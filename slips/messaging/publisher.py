@@ -0,0 +1,129 @@
+import threading
+import time
+from typing import List, Optional
+
+from redis import ConnectionPool
+from redis.client import Redis
+from redis.exceptions import ConnectionError, TimeoutError
+
+from fides.utils.logger import Logger
+
+logger = Logger(__name__)
+
+
+class PipelinedPublisher:
+    """Buffers messages published to the Redis channel and sends them in a single pipeline.
+
+    Buffer is flushed when it contains :param: max_batch messages or every :param: flush_interval_seconds,
+    whichever comes first. Pipelines are always executed by the background thread, so the thread
+    that publishes never waits for Redis, not even when it is being reconnected.
+    Publisher uses its own connection pool so publishing does not compete with the pub/sub connection
+    used for listening.
+
+    Delivery is at-least-once. When the connection fails during the pipeline, it is not known which
+    messages reached Redis, so the whole batch is sent again and some messages can be published twice.
+    """
+
+    def __init__(self,
+                 r: Redis,
+                 channel: str,
+                 max_batch: int = 100,
+                 flush_interval_seconds: float = 0.005,
+                 max_retries: int = 5,
+                 backoff_seconds: float = 0.05,
+                 max_backoff_seconds: float = 2):
+        self.__r = self.__dedicated_client(r)
+        self.__channel = channel
+        self.__max_batch = max(1, max_batch)
+        self.__flush_interval_seconds = flush_interval_seconds
+        self.__max_retries = max_retries
+        self.__backoff_seconds = backoff_seconds
+        self.__max_backoff_seconds = max_backoff_seconds
+
+        self.__buffer: List[str] = []
+        # ticker waits on the buffer until it is full or the interval elapses
+        self.__buffer_changed = threading.Condition()
+        # pipelines are executed one at the time to keep the order of messages
+        self.__flush_lock = threading.Lock()
+        self.__dropped = 0
+
+        self.__stopped = False
+        self.__ticker = threading.Thread(target=self.__tick, name=f'publisher-{channel}', daemon=True)
+        self.__ticker.start()
+
+    @property
+    def dropped(self) -> int:
+        """Number of messages that were not published because the Redis was not reachable."""
+        return self.__dropped
+
+    def publish(self, data: str):
+        """Buffers message for publishing, full buffer is handed over to the background thread."""
+        with self.__buffer_changed:
+            self.__buffer.append(data)
+            if len(self.__buffer) >= self.__max_batch:
+                self.__buffer_changed.notify()
+
+    def flush(self):
+        """Publishes all buffered messages in a single pipeline."""
+        with self.__flush_lock:
+            with self.__buffer_changed:
+                batch, self.__buffer = self.__buffer, []
+            if batch:
+                self.__execute_with_retries(batch)
+
+    def close(self):
+        """Publishes all buffered messages and stops the background flushing."""
+        with self.__buffer_changed:
+            self.__stopped = True
+            self.__buffer_changed.notify()
+        self.__ticker.join()
+        self.flush()
+
+    def __tick(self):
+        while True:
+            with self.__buffer_changed:
+                if not self.__stopped and len(self.__buffer) < self.__max_batch:
+                    self.__buffer_changed.wait(self.__flush_interval_seconds)
+                stopped = self.__stopped
+            # noinspection PyBroadException
+            try:
+                self.flush()
+            except Exception as ex:
+                logger.error(f'Error when flushing messages to {self.__channel}: {ex}')
+            if stopped:
+                return
+
+    def __execute_with_retries(self, batch: List[str]):
+        backoff = self.__backoff_seconds
+        for attempt in range(self.__max_retries + 1):
+            try:
+                pipe = self.__r.pipeline(transaction=False)
+                for data in batch:
+                    pipe.publish(self.__channel, data)
+                pipe.execute()
+                return
+            except (ConnectionError, TimeoutError) as ex:
+                # some messages might have been published already, they're sent again, see at-least-once delivery
+                if attempt == self.__max_retries:
+                    break
+                logger.warn(f'Publishing to {self.__channel} failed, reconnecting in {backoff}s. {ex}')
+                self.__reconnect()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.__max_backoff_seconds)
+
+        self.__dropped += len(batch)
+        logger.error(f'It was not possible to publish {len(batch)} messages to {self.__channel}, dropping them.')
+
+    def __reconnect(self):
+        pool = getattr(self.__r, 'connection_pool', None)
+        if pool is not None:
+            pool.disconnect()
+
+    @staticmethod
+    def __dedicated_client(r: Redis) -> Redis:
+        pool = getattr(r, 'connection_pool', None)
+        if not isinstance(pool, ConnectionPool):
+            # this is not a real redis client, so we use it as it is
+            return r
+        dedicated_pool = ConnectionPool(connection_class=pool.connection_class, **pool.connection_kwargs)
+        return Redis(connection_pool=dedicated_pool)
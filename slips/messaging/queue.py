@@ -5,6 +5,7 @@ from redis.client import Redis
 
 from fides.messaging.queue import Queue
 from fides.utils.logger import Logger
+from slips.messaging.publisher import PipelinedPublisher
 
 logger = Logger(__name__)
 
@@ -39,15 +40,47 @@ class RedisSimplexQueue(Queue):
     One for sending data and one for listening.
     """
 
-    def __init__(self, r: Redis, send_channel: str, received_channel: str):
+    def __init__(self,
+                 r: Redis,
+                 send_channel: str,
+                 received_channel: str,
+                 pipeline_size: int = 0,
+                 flush_interval_seconds: float = 0.005):
+        """
+        :param r: Redis client
+        :param send_channel: channel where the messages are published
+        :param received_channel: channel the queue listens on
+        :param pipeline_size: if > 0, published messages are buffered and sent in a single pipeline
+        once there are pipeline_size of them or every flush_interval_seconds, delivery is then at-least-once,
+        see PipelinedPublisher
+        :param flush_interval_seconds: how often is the pipeline flushed
+        """
         self.__r = r
         self.__receive = received_channel
         self.__send = send_channel
         self.__pub = self.__r.pubsub()
         self.__pub_sub_thread: Optional[Thread] = None
+        self.__publisher: Optional[PipelinedPublisher] = None
+        if pipeline_size > 0:
+            self.__publisher = PipelinedPublisher(r, send_channel,
+                                                  max_batch=pipeline_size,
+                                                  flush_interval_seconds=flush_interval_seconds)
 
     def send(self, serialized_data: str, **argv):
-        self.__r.publish(self.__send, serialized_data)
+        if self.__publisher:
+            self.__publisher.publish(serialized_data)
+        else:
+            self.__r.publish(self.__send, serialized_data)
+
+    def flush(self):
+        """Publishes all buffered messages if the pipelining is enabled."""
+        if self.__publisher:
+            self.__publisher.flush()
+
+    def close(self):
+        """Publishes all buffered messages and stops the background publishing."""
+        if self.__publisher:
+            self.__publisher.close()
 
     def listen(self,
                on_message: Callable[[str], None],
@@ -98,7 +131,7 @@ class RedisSimplexQueue(Queue):
             except Exception as ex:
                 logger.debug(f'Error when stopping thread: {ex}')
             return
-        logger.debug(f'New message received! {data}')
+        logger.debug(lambda: f'New message received! {data}')
 
         try:
             on_message(data)
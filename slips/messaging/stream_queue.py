@@ -0,0 +1,193 @@
+import os
+import socket
+import threading
+import time
+from typing import Callable, List, Optional, Tuple, Union
+
+from redis.client import Redis, PubSub
+from redis.exceptions import ResponseError
+
+from fides.messaging.queue import Queue
+from fides.utils.logger import Logger
+
+logger = Logger(__name__)
+
+StreamEntry = Tuple[Union[str, bytes], dict]
+"""Entry read from the stream - (entry id, fields)."""
+
+
+class RedisStreamQueue(Queue):
+    """
+    Implementation of Queue interface that uses Redis Streams.
+
+    Messages are appended to the send stream and read from the receive stream through a consumer group.
+    Multiple Fides processes can share the same group, each message is then delivered
+    to just one of them. Messages are acknowledged only after they were processed, so they're not lost
+    when Fides is slow or when it crashes - entries that are pending for too long are reclaimed
+    by other consumers.
+
+    Stop message is delivered just to one consumer of the group, that one then broadcasts it
+    to all other consumers through the control channel.
+    """
+
+    def __init__(self,
+                 r: Redis,
+                 send_stream: str,
+                 receive_stream: str,
+                 group: str = 'fides',
+                 consumer: Optional[str] = None,
+                 batch_size: int = 100,
+                 block_ms: int = 1000,
+                 max_stream_length: int = 100_000,
+                 claim_idle_ms: int = 30_000,
+                 claim_interval_seconds: float = 5,
+                 max_deliveries: int = 5,
+                 control_channel: Optional[str] = None):
+        """
+        :param r: Redis client
+        :param send_stream: stream where the messages are appended
+        :param receive_stream: stream the queue reads from
+        :param group: consumer group shared by all Fides processes
+        :param consumer: unique name of this consumer, defaults to hostname and pid
+        :param batch_size: maximal number of entries read at once
+        :param block_ms: how long to block when waiting for new entries
+        :param max_stream_length: send stream is trimmed to approximately this length
+        :param claim_idle_ms: entries pending for longer than this are reclaimed from other consumers
+        :param claim_interval_seconds: how often to check for entries to reclaim
+        :param max_deliveries: entries delivered more times than this are acknowledged and dropped
+        :param control_channel: channel used to broadcast the stop to all consumers of the group,
+        defaults to the receive stream name with ':control' suffix
+        """
+        self.__r = r
+        self.__send = send_stream
+        self.__receive = receive_stream
+        self.__group = group
+        self.__consumer = consumer if consumer else f'{socket.gethostname()}-{os.getpid()}'
+        self.__batch_size = batch_size
+        self.__block_ms = block_ms
+        self.__max_stream_length = max_stream_length
+        self.__claim_idle_ms = claim_idle_ms
+        self.__claim_interval_seconds = claim_interval_seconds
+        self.__max_deliveries = max_deliveries
+        self.__control_channel = control_channel if control_channel else f'{receive_stream}:control'
+
+        self.__control: Optional[PubSub] = None
+        self.__stopped = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+
+    def send(self, serialized_data: str, **argv):
+        self.__r.xadd(self.__send, {'data': serialized_data}, maxlen=self.__max_stream_length, approximate=True)
+
+    def listen(self,
+               on_message: Callable[[str], None],
+               block: bool = False,
+               **argv
+               ):
+        """Starts listening, if :param: block = True, the method blocks current thread!"""
+        self.__ensure_group()
+        self.__control = self.__r.pubsub(ignore_subscribe_messages=True)
+        self.__control.subscribe(self.__control_channel)
+        self.__stopped.clear()
+        if block:
+            return self.__listen_blocking(on_message)
+
+        self.__thread = threading.Thread(target=self.__listen_blocking, args=(on_message,),
+                                         name=f'stream-{self.__receive}', daemon=True)
+        self.__thread.start()
+        return self.__thread
+
+    def stop(self):
+        """Stops listening, messages that are being processed are finished first."""
+        self.__stopped.set()
+        if self.__thread is not None and self.__thread is not threading.current_thread():
+            self.__thread.join()
+
+    def __ensure_group(self):
+        try:
+            self.__r.xgroup_create(self.__receive, self.__group, id='0', mkstream=True)
+        except ResponseError as ex:
+            # group already exists, that's fine as other processes might have created it
+            if 'BUSYGROUP' not in str(ex):
+                raise
+
+    def __listen_blocking(self, on_message: Callable[[str], None]):
+        try:
+            self.__consume(on_message)
+        finally:
+            self.__control.close()
+
+    def __consume(self, on_message: Callable[[str], None]):
+        last_claim = 0.0
+        while not self.__stopped.is_set():
+            try:
+                if self.__stop_broadcast_received():
+                    logger.debug(f'Stop process message broadcast received! Stopping.')
+                    self.__stopped.set()
+                    break
+
+                if time.monotonic() - last_claim >= self.__claim_interval_seconds:
+                    last_claim = time.monotonic()
+                    self.__process(self.__reclaim(), on_message)
+
+                response = self.__r.xreadgroup(self.__group, self.__consumer, {self.__receive: '>'},
+                                               count=self.__batch_size, block=self.__block_ms)
+                for _, entries in response or []:
+                    self.__process(entries, on_message)
+            except Exception as ex:
+                logger.error(f'Error when reading from stream {self.__receive}: {ex}')
+                self.__stopped.wait(self.__claim_interval_seconds)
+
+    def __stop_broadcast_received(self) -> bool:
+        message = self.__control.get_message()
+        while message is not None:
+            if _decoded(message.get('data')) == 'stop_process':
+                return True
+            message = self.__control.get_message()
+        return False
+
+    def __reclaim(self) -> List[StreamEntry]:
+        pending = self.__r.xpending_range(self.__receive, self.__group, '-', '+', self.__batch_size)
+        idle = [p for p in pending if p['time_since_delivered'] >= self.__claim_idle_ms]
+        if not idle:
+            return []
+
+        poisoned = [p['message_id'] for p in idle if p['times_delivered'] > self.__max_deliveries]
+        if poisoned:
+            logger.warn(f'Dropping {len(poisoned)} entries that were delivered more than '
+                        f'{self.__max_deliveries} times.')
+            self.__r.xack(self.__receive, self.__group, *poisoned)
+
+        to_claim = [p['message_id'] for p in idle if p['times_delivered'] <= self.__max_deliveries]
+        if not to_claim:
+            return []
+        logger.debug(f'Reclaiming {len(to_claim)} pending entries.')
+        return self.__r.xclaim(self.__receive, self.__group, self.__consumer, self.__claim_idle_ms, to_claim)
+
+    def __process(self, entries: List[StreamEntry], on_message: Callable[[str], None]):
+        processed = []
+        for entry_id, fields in entries:
+            # entries that were deleted by trimming have no fields
+            data = _decoded(fields.get('data', fields.get(b'data'))) if fields else None
+
+            if data == 'stop_process':
+                # the rest of the batch is still processed, it was already delivered to this consumer
+                # and nobody would acknowledge it
+                logger.debug(f'Stop process message received! Stopping all consumers.')
+                processed.append(entry_id)
+                self.__stopped.set()
+                self.__r.publish(self.__control_channel, data)
+                continue
+
+            if data is not None:
+                try:
+                    on_message(data)
+                except Exception as ex:
+                    logger.error(f'Error when executing on_message!, {ex}')
+            processed.append(entry_id)
+
+        if processed:
+            self.__r.xack(self.__receive, self.__group, *processed)
+
+
+def _decoded(data: Union[str, bytes, None]) -> Optional[str]:
+    return data.decode() if isinstance(data, bytes) else data
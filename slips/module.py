@@ -5,15 +5,18 @@ from multiprocessing import Process
 
 from fides.messaging.message_handler import MessageHandler
 from fides.messaging.network_bridge import NetworkBridge
+from fides.messaging.priority import PrioritizedMessageDispatcher
 from fides.model.configuration import load_configuration
 from fides.model.threat_intelligence import SlipsThreatIntelligence
+from fides.protocols.admission import AdmissionController
 from fides.protocols.alert import AlertProtocol
 from fides.protocols.initial_trusl import InitialTrustProtocol
 from fides.protocols.opinion import OpinionAggregator
 from fides.protocols.peer_list import PeerListUpdateProtocol
 from fides.protocols.recommendation import RecommendationProtocol
 from fides.protocols.threat_intelligence import ThreatIntelligenceProtocol
-from fides.utils.logger import LoggerPrintCallbacks, Logger
+from fides.utils.logger import LoggerPrintCallbacks, Logger, set_global_level
+from slips.log_sink import SlipsLogSink
 from slips.messaging.queue import RedisQueue, RedisSimplexQueue
 from slips.originals.abstracts import Module
 from slips.originals.database import __database__
@@ -38,9 +41,13 @@ class SlipsFidesModule(Module, Process):
         # connect to slips database
         __database__.start(slips_conf)
 
-        # now setup logging
+        # now setup logging, lines are shipped to the output queue in batches from the background thread
+        # the thread is started in run(), lines logged before that wait in the buffer
+        self.__log_sink = SlipsLogSink(output_queue, self.name)
         LoggerPrintCallbacks.clear()
-        LoggerPrintCallbacks.append(self.__format_and_print)
+        LoggerPrintCallbacks.append(self.__log_sink.log)
+        # debug messages are not formatted at all in production
+        set_global_level('INFO')
 
         # load trust model configuration
         self.__trust_model_config = load_configuration(self.__slips_config.trust_model_path)
@@ -50,6 +57,9 @@ class SlipsFidesModule(Module, Process):
         self.__intelligence: ThreatIntelligenceProtocol
         self.__alerts: AlertProtocol
         self.__slips_fides: RedisQueue
+        self.__network_fides: RedisSimplexQueue
+        self.__ti_db: SlipsThreatIntelligenceDatabase
+        self.__dispatcher: PrioritizedMessageDispatcher
 
     def __setup_trust_model(self):
         r = __database__.r
@@ -62,10 +72,14 @@ class SlipsFidesModule(Module, Process):
 
         # create queues
         # TODO: [S] check if we need to use duplex or simplex queue for communication with network module
-        network_fides_queue = RedisSimplexQueue(r, send_channel='fides2network', received_channel='network2fides')
-        slips_fides_queue = RedisSimplexQueue(r, send_channel='fides2slips', received_channel='slips2fides')
+        # outgoing messages are published in pipelines to save round trips to Redis
+        network_fides_queue = RedisSimplexQueue(r, send_channel='fides2network', received_channel='network2fides',
+                                                pipeline_size=100)
+        slips_fides_queue = RedisSimplexQueue(r, send_channel='fides2slips', received_channel='slips2fides',
+                                              pipeline_size=100)
 
-        bridge = NetworkBridge(network_fides_queue)
+        # coalesce reliability updates, so we don't send message to the network layer after every interaction
+        bridge = NetworkBridge(network_fides_queue, reliability_window_seconds=1, reliability_epsilon=0.01)
 
         recommendations = RecommendationProtocol(self.__trust_model_config, trust_db, bridge)
         trust = InitialTrustProtocol(trust_db, self.__trust_model_config, recommendations)
@@ -78,6 +92,10 @@ class SlipsFidesModule(Module, Process):
         alert = AlertProtocol(trust_db, bridge, trust, self.__trust_model_config, opinion,
                               self.__network_opinion_callback)
 
+        # requests from peers are rate limited by their trust and shed when there's too many of them waiting,
+        # they're admitted by the dispatcher when they're received, before they wait in the lane
+        admission = AdmissionController(trust_db, bridge)
+
         # TODO: [S+] add on_unknown and on_error handlers if necessary
         message_handler = MessageHandler(
             on_peer_list_update=peer_list.handle_peer_list_updated,
@@ -95,9 +113,14 @@ class SlipsFidesModule(Module, Process):
         self.__intelligence = intelligence
         self.__alerts = alert
         self.__slips_fides = slips_fides_queue
+        self.__network_fides = network_fides_queue
+        self.__ti_db = ti_db
+
+        # alerts and intelligence responses are processed before requests and peer list updates
+        self.__dispatcher = PrioritizedMessageDispatcher(message_handler, admission=admission)
 
         # and finally execute listener
-        self.__bridge.listen(message_handler, block=False)
+        self.__bridge.listen(self.__dispatcher, block=False)
 
     def __network_opinion_callback(self, ti: SlipsThreatIntelligence):
         """This is executed every time when trust model was able to create an aggregated network opinion."""
@@ -105,11 +128,9 @@ class SlipsFidesModule(Module, Process):
         # TODO: [S+] document that we're sending this type
         self.__slips_fides.send(json.dumps(asdict(ti)))
 
-    def __format_and_print(self, level: str, msg: str):
-        # TODO: [S+] determine correct level for trust model log levels
-        self.__output.put(f"33|{self.name}|{level} {msg}")
-
     def run(self):
+        # this is executed in the new process, so the log thread must be started here
+        self.__log_sink.start()
         # as a first thing we need to set up all dependencies and bind listeners
         self.__setup_trust_model()
 
@@ -124,6 +145,14 @@ class SlipsFidesModule(Module, Process):
                     continue
                 # handle case when the Slips decide to stop the process
                 if message['data'] == 'stop_process':
+                    # process everything that was received and send everything that was buffered
+                    self.__bridge.flush()
+                    self.__dispatcher.close(timeout=5)
+                    self.__bridge.close()
+                    self.__network_fides.close()
+                    self.__slips_fides.close()
+                    self.__ti_db.close()
+                    self.__log_sink.close(timeout=1)
                     # Confirm that the module is done processing
                     __database__.publish('finished_modules', self.name)
                     return True
@@ -137,6 +166,9 @@ class SlipsFidesModule(Module, Process):
                                                  score=data['score'])
                 elif data['type'] == 'intelligence_request':
                     self.__intelligence.request_data(target=data['target'])
+                elif data['type'] == 'ti_updated':
+                    # Slips changed its TI on the target, cached data are not valid anymore
+                    self.__ti_db.invalidate(target=data['target'])
                 else:
                     logger.warn(f"Unhandled message! {message['data']}", message)
 
@@ -146,4 +178,5 @@ class SlipsFidesModule(Module, Process):
             except Exception as ex:
                 exception_line = sys.exc_info()[2].tb_lineno
                 logger.error(f'Problem on the run() line {exception_line}, {ex}.')
+                self.__log_sink.close(timeout=1)
                 return True
@@ -1,21 +1,156 @@
-from typing import Optional
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Callable, Dict, Optional, Set, Tuple
 
 from redis.client import Redis
 
+from fides.messaging.decoders import decoders
 from fides.model.aliases import Target
 from fides.model.configuration import TrustModelConfiguration
 from fides.model.threat_intelligence import SlipsThreatIntelligence
 from fides.persistence.threat_intelligence import ThreatIntelligenceDatabase
+from fides.utils.bloom_filter import BloomFilter
+from fides.utils.logger import Logger
+
+logger = Logger(__name__)
+
+decode_slips_ti = decoders.decoder_for(SlipsThreatIntelligence)
 
 
 class SlipsThreatIntelligenceDatabase(ThreatIntelligenceDatabase):
-    """Implementation of ThreatIntelligenceDatabase that uses Slips native storage for the TI."""
+    """Implementation of ThreatIntelligenceDatabase that uses Slips native storage for the TI.
+
+    Slips keeps the TI in the hash <prefix>:ti, target -> SlipsThreatIntelligence JSON, and tells Fides
+    about every update, so the target can be invalidated.
+
+    Reads go through the in-process cache that remembers found TI as well as targets without any.
+    Most requested targets have no local TI, so the Bloom filter of all targets in the hash is kept
+    in memory and the targets that are not in the filter are answered without asking Redis.
+    The filter is rebuilt from the hash periodically on the background thread, targets reported
+    by invalidate are added to it right away.
+    """
 
-    def __init__(self, configuration: TrustModelConfiguration, r: Redis):
+    def __init__(self,
+                 configuration: TrustModelConfiguration,
+                 r: Redis,
+                 prefix: str = 'fides',
+                 cache_ttl_seconds: float = 30,
+                 cache_max_entries: int = 100_000,
+                 filter_rebuild_interval_seconds: Optional[float] = 300,
+                 filter_error_rate: float = 0.01,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param configuration: trust model configuration
+        :param r: Slips redis
+        :param prefix: prefix of the keys
+        :param cache_ttl_seconds: for how long are the TI, or the fact there's none, cached
+        :param cache_max_entries: maximal number of cached targets, the least recently used ones are evicted
+        :param filter_rebuild_interval_seconds: how often is the Bloom filter rebuilt, None disables the filter
+        :param filter_error_rate: probability that a target without TI is still looked up in Redis
+        :param clock: source of the current time
+        """
         self.__configuration = configuration
         self.__r = r
+        self.__key = f'{prefix}:ti'
+        self.__cache_ttl_seconds = cache_ttl_seconds
+        self.__cache_max_entries = cache_max_entries
+        self.__filter_error_rate = filter_error_rate
+        self.__clock = clock
+
+        self.__lock = threading.Lock()
+        self.__cache: Dict[Target, Tuple[float, Optional[SlipsThreatIntelligence]]] = OrderedDict()
+        self.__filter: Optional[BloomFilter] = None
+        # read from Redis is cached only if there was no invalidation while it was running
+        self.__invalidations = 0
+        # targets invalidated while the filter is being rebuilt, None if there's no rebuild running
+        self.__invalidated_during_rebuild: Optional[Set[Target]] = None
+
+        self.__stopped = threading.Event()
+        self.__rebuilder: Optional[threading.Thread] = None
+        if filter_rebuild_interval_seconds:
+            self.__rebuilder = threading.Thread(target=self.__rebuild_periodically,
+                                                args=(filter_rebuild_interval_seconds,),
+                                                name='ti-filter-rebuilder', daemon=True)
+            self.__rebuilder.start()
 
     def get_for(self, target: Target) -> Optional[SlipsThreatIntelligence]:
-        """Returns threat intelligence for given target or None if there are no data."""
-        # TODO: [S] implement this
-        raise NotImplemented()
+        """Returns threat intelligence for given target or None if there are no data.
+
+        Every call returns a new instance, so the caller can modify it.
+        """
+        with self.__lock:
+            cached = self.__cache.get(target)
+            if cached is not None and cached[0] > self.__clock():
+                self.__cache.move_to_end(target)
+                # callers modify the returned TI, the cached one must stay as it was read
+                return replace(cached[1]) if cached[1] else None
+            if self.__filter is not None and target not in self.__filter:
+                return None
+            invalidations = self.__invalidations
+
+        data = self.__r.hget(self.__key, target)
+        ti = decode_slips_ti(json.loads(data)) if data else None
+        with self.__lock:
+            if invalidations != self.__invalidations:
+                return ti
+            self.__cache[target] = self.__clock() + self.__cache_ttl_seconds, replace(ti) if ti else None
+            self.__cache.move_to_end(target)
+            while len(self.__cache) > self.__cache_max_entries:
+                self.__cache.popitem(last=False)
+        return ti
+
+    def invalidate(self, target: Target):
+        """Drops cached data of the target, must be called when Slips updates TI of the target."""
+        with self.__lock:
+            self.__invalidations += 1
+            self.__cache.pop(target, None)
+            if self.__filter is not None:
+                self.__filter.add(target)
+            if self.__invalidated_during_rebuild is not None:
+                self.__invalidated_during_rebuild.add(target)
+
+    def rebuild_filter(self):
+        """Builds the Bloom filter from all targets in the Slips TI storage."""
+        with self.__lock:
+            self.__invalidated_during_rebuild = set()
+        try:
+            # the filter is sized with a reserve for targets added before the next rebuild
+            capacity = 2 * self.__r.hlen(self.__key) + 1024
+            targets = (_string(target) for target, _ in self.__r.hscan_iter(self.__key, count=1000))
+            bloom_filter = BloomFilter.of(targets, capacity, self.__filter_error_rate)
+        except Exception:
+            with self.__lock:
+                self.__invalidated_during_rebuild = None
+            raise
+
+        with self.__lock:
+            # scan might have missed targets that were added while it was running
+            for target in self.__invalidated_during_rebuild:
+                bloom_filter.add(target)
+            self.__invalidated_during_rebuild = None
+            self.__filter = bloom_filter
+        logger.debug(lambda: f'TI filter rebuilt with {len(bloom_filter)} targets.')
+
+    def close(self):
+        """Stops rebuilding the filter."""
+        self.__stopped.set()
+        if self.__rebuilder is not None and self.__rebuilder is not threading.current_thread():
+            self.__rebuilder.join()
+
+    def __rebuild_periodically(self, interval_seconds: float):
+        while True:
+            # noinspection PyBroadException
+            try:
+                self.rebuild_filter()
+            except Exception as ex:
+                # without the filter, every miss is just looked up in Redis
+                logger.error(f'Rebuilding TI filter failed! {ex}')
+            if self.__stopped.wait(interval_seconds):
+                return
+
+
+def _string(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
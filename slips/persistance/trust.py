@@ -1,64 +1,295 @@
-from typing import List, Optional, Union
+import json
+import math
+from dataclasses import asdict
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar, Union
 
-from redis.client import Redis
+from redis.client import Redis, Pipeline
+from redis.exceptions import RedisError, WatchError
 
+from fides.messaging.decoders import decoders
 from fides.messaging.model import PeerInfo
 from fides.model.aliases import PeerId, Target, OrganisationId
 from fides.model.configuration import TrustModelConfiguration
 from fides.model.peer_trust_data import PeerTrustData, TrustMatrix
 from fides.model.threat_intelligence import SlipsThreatIntelligence
-from fides.persistence.trust import TrustDatabase
+from fides.persistence.opinion_cache import adaptive_ttl_seconds
+from fides.persistence.trust import TrustDatabase, BulkWriteResult, BulkUpdateResult, TrustUpdate
+
+decode_peer_info = decoders.decoder_for(PeerInfo)
+decode_peer_trust_data = decoders.decoder_for(PeerTrustData)
+decode_slips_ti = decoders.decoder_for(SlipsThreatIntelligence)
+
+T = TypeVar('T')
+
+_SCALARS = ('service_trust', 'reputation', 'recommendation_trust', 'competence_belief', 'integrity_belief')
 
 
-# because this will be implemented
-# noinspection DuplicatedCode
 class SlipsTrustDatabase(TrustDatabase):
-    """Trust database implementation that uses Slips redis as a storage."""
+    """Trust database implementation that uses Slips redis as a storage.
+
+    Layout of the keys, all of them are prefixed by :param: prefix:
+
+    - peer:<id> - hash with trust data of the peer, scalars are stored as numbers, info and histories as JSON
+    - peers:info - hash peer id -> PeerInfo JSON, for all peers we have trust data for or that are connected
+    - index:service_trust, index:recommendation_trust - sorted sets peer id -> value, for threshold queries
+    - org:<organisation> - set of peer ids signed by the organisation
+    - connected - set of ids of the connected peers
+    - opinion:<target> - cached network opinion JSON, expires on its own
 
-    # TODO: [S] implement this
+    Writes are sent in pipelines, the trust data and all indexes are updated in a single transaction.
+    Writes and updates are optimistic transactions, peer:<id> keys are watched while the data they depend on
+    are read and computed.
+    """
 
-    def __init__(self, configuration: TrustModelConfiguration, r: Redis):
+    def __init__(self,
+                 configuration: TrustModelConfiguration,
+                 r: Redis,
+                 prefix: str = 'fides',
+                 max_update_attempts: int = 16):
+        """
+        :param configuration: trust model configuration
+        :param r: Slips redis
+        :param prefix: prefix of the keys
+        :param max_update_attempts: how many times is the write or update tried when the peers are modified concurrently
+        """
         super().__init__(configuration)
         self.__r = r
+        self.__prefix = prefix
+        self.__max_update_attempts = max_update_attempts
+        self.__info_key = f'{prefix}:peers:info'
+        self.__connected_key = f'{prefix}:connected'
+        self.__service_trust_key = f'{prefix}:index:service_trust'
+        self.__recommendation_trust_key = f'{prefix}:index:recommendation_trust'
 
     def store_connected_peers_list(self, current_peers: List[PeerInfo]):
         """Stores list of peers that are directly connected to the Slips."""
-
-        raise NotImplemented()
+        pipe = self.__r.pipeline()
+        pipe.delete(self.__connected_key)
+        if current_peers:
+            pipe.sadd(self.__connected_key, *[p.id for p in current_peers])
+            pipe.hset(self.__info_key, mapping={p.id: json.dumps(asdict(p)) for p in current_peers})
+        pipe.execute()
 
     def get_connected_peers(self) -> List[PeerInfo]:
         """Returns list of peers that are directly connected to the Slips."""
-        raise NotImplemented()
+        return self.get_peers_info(_strings(self.__r.smembers(self.__connected_key)))
+
+    def get_peers_info(self, peer_ids: List[PeerId]) -> List[PeerInfo]:
+        """Returns list of peer infos for given ids."""
+        if not peer_ids:
+            return []
+        infos = self.__r.hmget(self.__info_key, list(peer_ids))
+        return [decode_peer_info(json.loads(info)) for info in infos if info is not None]
 
     def get_peers_with_organisations(self, organisations: List[OrganisationId]) -> List[PeerInfo]:
         """Returns list of peers that have one of given organisations."""
-        raise NotImplemented()
+        if not organisations:
+            return []
+        peer_ids = self.__r.sunion([self.__org_key(o) for o in organisations])
+        return self.get_peers_info(_strings(peer_ids))
 
     def get_peers_with_geq_recommendation_trust(self, minimal_recommendation_trust: float) -> List[PeerInfo]:
         """Returns peers that have >= recommendation_trust then the minimal."""
-        raise NotImplemented()
+        peer_ids = self.__r.zrangebyscore(self.__recommendation_trust_key, minimal_recommendation_trust, '+inf')
+        return self.get_peers_info(_strings(peer_ids))
+
+    def get_peers_with_geq_service_trust(self, minimal_service_trust: float) -> List[PeerInfo]:
+        """Returns peers that have >= service_trust then the minimal."""
+        peer_ids = self.__r.zrangebyscore(self.__service_trust_key, minimal_service_trust, '+inf')
+        return self.get_peers_info(_strings(peer_ids))
 
     def store_peer_trust_data(self, trust_data: PeerTrustData):
         """Stores trust data for given peer - overwrites any data if existed."""
-        raise NotImplemented()
+        result = self.store_peer_trust_matrix({trust_data.peer_id: trust_data})
+        if not result.ok:
+            raise RedisError(f'Trust data of peer {trust_data.peer_id} were not stored! '
+                             f'{result.failed[trust_data.peer_id]}')
+
+    def store_peer_trust_matrix(self, trust_matrix: TrustMatrix) -> BulkWriteResult:
+        """Stores trust matrix, uses one round trip to read previous organisations and one for all writes.
+
+        Keys of the peers are watched while their previous organisations are read, if any of them is modified
+        before the writes are executed, Redis discards them and the organisations are read again.
+        Writes of all peers are sent in one transaction, but an error in one command does not roll back
+        the others, so each peer is reported as failed if any of its commands failed.
+        """
+        result = BulkWriteResult()
+        encoded = self.__encode_matrix(trust_matrix, result)
+        if not encoded:
+            return result
+
+        def store(pipe: Pipeline) -> BulkWriteResult:
+            # we need previous organisations to remove the peer from the indexes it does not belong to anymore
+            read = self.__r.pipeline(transaction=False)
+            for peer_id in encoded:
+                read.hget(self.__peer_key(peer_id), 'organisations')
+            previous_organisations = [json.loads(p) if p else [] for p in read.execute()]
+
+            pipe.multi()
+            commands = self.__queue_writes(pipe, encoded, dict(zip(encoded, previous_organisations)))
+            self.__collect(pipe.execute(raise_on_error=False), commands, result)
+            return result
+
+        if self.__watched(list(encoded), store) is None:
+            result.failed.update(self.__conflicts(encoded))
+        return result
+
+    def update_peers_trust_data(self, updates: Dict[PeerId, TrustUpdate]) -> BulkUpdateResult:
+        """Applies each update to the current data of its peer and stores the results in one transaction.
+
+        Keys of the peers are watched before their data are read, if any of them is modified before the transaction
+        is executed, Redis discards it and the whole update is computed again from the new data.
+        """
+        peer_ids = list(updates.keys())
+        if not peer_ids:
+            return BulkUpdateResult()
+
+        def update(pipe: Pipeline) -> BulkUpdateResult:
+            current = self.get_peers_trust_data(peer_ids)
+            result = BulkUpdateResult()
+            trust_matrix = self._apply_updates(updates, current, result)
+            encoded = self.__encode_matrix(trust_matrix, result)
+            if not encoded:
+                pipe.reset()
+                return result
+
+            pipe.multi()
+            previous_organisations = {p: current[p].organisations if p in current else [] for p in encoded}
+            commands = self.__queue_writes(pipe, encoded, previous_organisations)
+            self.__collect(pipe.execute(raise_on_error=False), commands, result)
+            result.updated = {peer_id: trust_matrix[peer_id] for peer_id in result.stored}
+            return result
 
-    def store_peer_trust_matrix(self, trust_matrix: TrustMatrix):
-        """Stores trust matrix."""
-        for peer in trust_matrix.values():
-            self.store_peer_trust_data(peer)
+        result = self.__watched(peer_ids, update)
+        return result if result is not None else BulkUpdateResult(failed=self.__conflicts(peer_ids))
 
     def get_peer_trust_data(self, peer: Union[PeerId, PeerInfo]) -> Optional[PeerTrustData]:
         """Returns trust data for given peer ID, if no data are found, returns None."""
-        raise NotImplemented()
+        peer_id = peer.id if isinstance(peer, PeerInfo) else peer
+        return self.__decode(self.__r.hgetall(self.__peer_key(peer_id)))
 
     def get_peers_trust_data(self, peer_ids: List[Union[PeerId, PeerInfo]]) -> TrustMatrix:
-        """Return trust data for each peer from peer_ids."""
-        return {peer_id: self.get_peer_trust_data(peer_id) for peer_id in peer_ids}
+        """Return trust data for each peer from peer_ids, all peers are loaded in one round trip."""
+        ids = [p.id if isinstance(p, PeerInfo) else p for p in peer_ids]
+        if not ids:
+            return {}
+        pipe = self.__r.pipeline(transaction=False)
+        for peer_id in ids:
+            pipe.hgetall(self.__peer_key(peer_id))
+        data = [self.__decode(raw) for raw in pipe.execute()]
+        return {peer.peer_id: peer for peer in data if peer}
 
     def cache_network_opinion(self, ti: SlipsThreatIntelligence):
-        """Caches aggregated opinion on given target."""
-        raise NotImplemented()
+        """Caches aggregated opinion on given target, Redis removes it once it expires.
+
+        Low confidence opinions expire sooner, see adaptive_ttl_seconds.
+        """
+        ttl = adaptive_ttl_seconds(ti, self.get_model_configuration().network_opinion_cache_valid_seconds)
+        ttl = max(1, math.ceil(ttl))
+        self.__r.setex(self.__opinion_key(ti.target), ttl, json.dumps(asdict(ti)))
 
     def get_cached_network_opinion(self, target: Target) -> Optional[SlipsThreatIntelligence]:
         """Returns cached network opinion. Checks cache time and returns None if data expired."""
-        raise NotImplemented()
+        data = self.__r.get(self.__opinion_key(target))
+        return decode_slips_ti(json.loads(data)) if data else None
+
+    def __watched(self, peer_ids: List[PeerId], transaction: Callable[[Pipeline], T]) -> Optional[T]:
+        """Runs the transaction with keys of the peers watched, the transaction must read the data it depends on
+        after the watch and execute the pipeline.
+
+        Read on another connection is fine, the watch is already active. When any of the keys is modified
+        concurrently, the transaction is run again, returns None if it did not succeed in max_update_attempts.
+        """
+        with self.__r.pipeline() as pipe:
+            for _ in range(self.__max_update_attempts):
+                try:
+                    pipe.watch(*[self.__peer_key(peer_id) for peer_id in peer_ids])
+                    return transaction(pipe)
+                except WatchError:
+                    continue
+        return None
+
+    def __conflicts(self, peer_ids: Iterable[PeerId]) -> Dict[PeerId, str]:
+        return {peer_id: f'Peer was modified concurrently {self.__max_update_attempts} times in a row!'
+                for peer_id in peer_ids}
+
+    def __encode_matrix(self, trust_matrix: TrustMatrix, result: BulkWriteResult) -> Dict[PeerId, tuple]:
+        """Encodes peers to hash fields, peers that can not be encoded are reported as failed."""
+        encoded = {}
+        for peer_id, peer in trust_matrix.items():
+            try:
+                encoded[peer_id] = peer, self.__encode(peer)
+            except Exception as ex:
+                result.failed[peer_id] = f'Trust data can not be encoded! {ex}'
+        return encoded
+
+    def __queue_writes(self, pipe, encoded: Dict[PeerId, tuple],
+                       previous_organisations: Dict[PeerId, List[OrganisationId]]) -> List[tuple]:
+        """Queues writes of the encoded peers, returns (peer id, first command, last command) for each peer."""
+        commands = []
+        for peer_id, (peer, fields) in encoded.items():
+            first = len(pipe)
+            for organisation in set(previous_organisations[peer_id]) - set(peer.organisations):
+                pipe.srem(self.__org_key(organisation), peer_id)
+            for organisation in peer.organisations:
+                pipe.sadd(self.__org_key(organisation), peer_id)
+            pipe.hset(self.__peer_key(peer_id), mapping=fields)
+            pipe.hset(self.__info_key, peer_id, fields['info'])
+            pipe.zadd(self.__service_trust_key, {peer_id: peer.service_trust})
+            pipe.zadd(self.__recommendation_trust_key, {peer_id: peer.recommendation_trust})
+            commands.append((peer_id, first, len(pipe)))
+        return commands
+
+    @staticmethod
+    def __collect(responses: List, commands: List[tuple], result: BulkWriteResult):
+        """Reports each peer as failed if any of its commands failed."""
+        for peer_id, first, last in commands:
+            errors = [r for r in responses[first:last] if isinstance(r, Exception)]
+            if errors:
+                result.failed[peer_id] = str(errors[0])
+            else:
+                result.stored.append(peer_id)
+
+    def __peer_key(self, peer_id: PeerId) -> str:
+        return f'{self.__prefix}:peer:{peer_id}'
+
+    def __org_key(self, organisation: OrganisationId) -> str:
+        return f'{self.__prefix}:org:{organisation}'
+
+    def __opinion_key(self, target: Target) -> str:
+        return f'{self.__prefix}:opinion:{target}'
+
+    @staticmethod
+    def __encode(peer: PeerTrustData) -> Dict[str, Union[str, int, float]]:
+        encoded = {name: float(getattr(peer, name)) for name in _SCALARS}
+        encoded.update({
+            'info': json.dumps(asdict(peer.info)),
+            'organisations': json.dumps(peer.organisations),
+            'has_fixed_trust': int(peer.has_fixed_trust),
+            'initial_reputation_provided_by_count': peer.initial_reputation_provided_by_count,
+            'service_history': json.dumps([asdict(r) for r in peer.service_history]),
+            'recommendation_history': json.dumps([asdict(r) for r in peer.recommendation_history])
+        })
+        return encoded
+
+    @staticmethod
+    def __decode(raw: Dict) -> Optional[PeerTrustData]:
+        if not raw:
+            return None
+        data = {_string(k): _string(v) for k, v in raw.items()}
+        return decode_peer_trust_data({
+            'info': json.loads(data['info']),
+            'has_fixed_trust': data['has_fixed_trust'] == '1',
+            **{name: float(data[name]) for name in _SCALARS},
+            'initial_reputation_provided_by_count': int(data['initial_reputation_provided_by_count']),
+            'service_history': json.loads(data['service_history']),
+            'recommendation_history': json.loads(data['recommendation_history'])
+        })
+
+
+def _string(value: Union[str, bytes]) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _strings(values: Iterable[Union[str, bytes]]) -> List[str]:
+    return [_string(v) for v in values]
@@ -0,0 +1,23 @@
+from fides.utils.bloom_filter import BloomFilter
+
+
+def test_added_items_are_always_contained():
+    bloom_filter = BloomFilter.of((f'target-{i}' for i in range(10_000)), capacity=10_000)
+
+    assert len(bloom_filter) == 10_000
+    assert all(f'target-{i}' in bloom_filter for i in range(10_000))
+
+
+def test_false_positive_rate_is_close_to_error_rate():
+    bloom_filter = BloomFilter.of((f'target-{i}' for i in range(10_000)), capacity=10_000, error_rate=0.01)
+
+    false_positives = sum(f'other-{i}' in bloom_filter for i in range(100_000))
+    assert false_positives / 100_000 < 0.02
+
+
+def test_empty_filter_contains_nothing():
+    bloom_filter = BloomFilter(capacity=0)
+
+    assert 'target' not in bloom_filter
+    bloom_filter.add('target')
+    assert 'target' in bloom_filter
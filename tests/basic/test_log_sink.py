@@ -0,0 +1,42 @@
+import queue
+
+from slips.log_sink import SlipsLogSink
+
+
+def _shipped_lines(output: queue.Queue):
+    lines = []
+    while not output.empty():
+        prefix, module, line = output.get().split('|', 2)
+        assert (prefix, module) == ('33', 'Test')
+        lines.append(line)
+    return lines
+
+
+def test_each_line_is_shipped_as_one_record_in_order():
+    output = queue.Queue()
+    sink = SlipsLogSink(output, 'Test', batch_size=3)
+    sink.start()
+    for i in range(7):
+        sink.log('DEBUG' if i % 2 else 'INFO', str(i))
+    sink.close(timeout=1)
+
+    assert output.qsize() == 7
+    assert _shipped_lines(output) == [f"{'DEBUG' if i % 2 else 'INFO'} {i}" for i in range(7)]
+
+
+def test_debug_lines_are_dropped_first_on_overflow():
+    output = queue.Queue()
+    # thread is not started, so everything stays in the buffer
+    sink = SlipsLogSink(output, 'Test', capacity=3)
+    sink.log('DEBUG', 'd1')
+    sink.log('INFO', 'i1')
+    sink.log('DEBUG', 'd2')
+    sink.log('WARN', 'w1')
+    sink.log('ERROR', 'e1')
+    sink.log('DEBUG', 'd3')
+    sink.log('ERROR', 'e2')
+
+    assert sink.dropped['DEBUG'] == 3
+    assert sink.dropped['INFO'] == 1
+    sink.close()
+    assert _shipped_lines(output) == ['WARN w1', 'ERROR e1', 'ERROR e2']
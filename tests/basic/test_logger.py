@@ -0,0 +1,30 @@
+from fides.utils.logger import Logger, LoggerPrintCallbacks, set_global_level, get_global_level
+
+
+def test_level_threshold():
+    logged = []
+    LoggerPrintCallbacks.append(lambda level, msg: logged.append(level))
+    original_level = get_global_level()
+    try:
+        set_global_level('WARN')
+        logger = Logger('test')
+        logger.debug('debug')
+        logger.info('info')
+        logger.warn('warn')
+        assert logged == ['WARN']
+
+        logger.set_level('DEBUG')
+        logger.debug('debug')
+        assert logged == ['WARN', 'DEBUG']
+    finally:
+        LoggerPrintCallbacks.pop()
+        set_global_level(original_level)
+
+
+def test_lazy_parameters_are_not_rendered_when_disabled():
+    def fail():
+        raise AssertionError('Parameters should not be rendered!')
+
+    logger = Logger('test', level='INFO')
+    logger.debug(fail, fail)
+    assert not logger.is_debug_enabled
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import urllib.request
+
+from fides.model.peer import PeerInfo
+from fides.persistence.trust_in_memory import InMemoryTrustDatabase
+from fides.persistence.trust_metered import MeteredTrustDatabase
+from fides.utils.metrics import Histogram, MetricsRegistry, metrics
+from tests.load_config import find_config
+from tests.load_fides import get_fides_stream
+from tests.messaging.messages import serialize, nl2tl_intelligence_request
+
+
+def test_histogram_quantiles_are_within_relative_error():
+    histogram = Histogram()
+    for micros in range(1, 100_001):
+        histogram.observe(micros / 1_000_000)
+
+    assert histogram.count == 100_000
+    for q in (0.5, 0.9, 0.99, 0.999):
+        expected = q * 0.1
+        assert abs(histogram.quantile(q) - expected) / expected < 1 / 16
+    assert histogram.quantile(1) == histogram.max
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    counter = registry.counter('requests_total', 'Requests.', ('type',))
+    histogram = registry.histogram('latency_seconds', 'Latency.')
+
+    assert registry.start() is None
+    counter.labels('a').inc()
+    histogram.observe_since(registry.start())
+    assert registry.snapshot() == {
+        'latency_seconds': {'count': 0, 'sum': 0.0, 'min': 0.0, 'max': 0.0,
+                            'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'p999': 0.0}
+    }
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry(enabled=True)
+    registry.counter('requests_total', 'Requests.', ('type',)).labels('alert').inc(2)
+    registry.gauge_function('depth', 'Depth.', lambda: 7)
+    registry.histogram('latency_seconds', 'Latency.').observe(0.5)
+
+    text = registry.to_prometheus()
+    assert '# TYPE requests_total counter' in text
+    assert 'requests_total{type="alert"} 2.0' in text
+    assert 'depth 7.0' in text
+    assert 'latency_seconds{quantile="0.5"} 0.5' in text
+    assert 'latency_seconds_count 1' in text
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'fides.prom')
+        registry.write_prometheus(path)
+        with open(path) as f:
+            assert f.read() == text
+
+    port = registry.serve_prometheus(0)
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics') as response:
+            assert response.read().decode() == registry.to_prometheus()
+    finally:
+        registry.stop_serving()
+
+
+def test_fides_is_instrumented():
+    metrics.enable()
+    try:
+        trust_db = MeteredTrustDatabase(InMemoryTrustDatabase(find_config()))
+        f, messages, _ = get_fides_stream(trust_db=trust_db)
+        f.queue.send_message(serialize(nl2tl_intelligence_request('1', 'target.com', PeerInfo('peer#1', []))))
+
+        snapshot = metrics.snapshot()
+        assert snapshot['fides_handler_seconds{type="nl2tl_intelligence_request"}']['count'] >= 1
+        assert snapshot['fides_decode_seconds']['count'] >= 1
+        assert snapshot['fides_sent_messages_total{type="tl2nl_intelligence_response"}'] >= 1
+        assert snapshot['fides_trust_db_seconds{method="get_peer_trust_data"}']['count'] >= 1
+    finally:
+        metrics.disable()
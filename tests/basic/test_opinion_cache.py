@@ -0,0 +1,91 @@
+import gc
+import threading
+import time
+
+from fides.model.threat_intelligence import SlipsThreatIntelligence
+from fides.persistence.opinion_cache import NetworkOpinionCache
+
+
+class _Clock:
+    def __init__(self):
+        self.time = 1000.0
+
+    def __call__(self) -> float:
+        return self.time
+
+
+def _ti(target: str, confidence: float = 1) -> SlipsThreatIntelligence:
+    return SlipsThreatIntelligence(score=0.5, confidence=confidence, target=target)
+
+
+def test_least_recently_used_target_is_evicted():
+    cache = NetworkOpinionCache(ttl_seconds=100, max_entries=2, clock=_Clock())
+    cache.put(_ti('a'))
+    cache.put(_ti('b'))
+    assert cache.get('a') is not None
+    cache.put(_ti('c'))
+
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+
+
+def test_ttl_adapts_to_confidence():
+    clock = _Clock()
+    cache = NetworkOpinionCache(ttl_seconds=100, min_ttl_fraction=0.1, negative_ttl_seconds=5, clock=clock)
+    cache.put(_ti('sure', confidence=1))
+    cache.put(_ti('unsure', confidence=0.3))
+    cache.put(_ti('barely', confidence=0.01))
+    cache.put(_ti('unknown', confidence=0))
+
+    clock.time += 6
+    assert cache.get('unknown') is None
+    assert cache.get('barely') is not None
+    clock.time += 5
+    assert cache.get('barely') is None
+    assert cache.get('unsure') is not None
+    clock.time += 20
+    assert cache.get('unsure') is None
+    assert cache.get('sure') is not None
+
+
+def test_expired_entries_are_swept():
+    clock = _Clock()
+    cache = NetworkOpinionCache(ttl_seconds=10, clock=clock)
+    for i in range(100):
+        cache.put(_ti(f'target-{i}'))
+    cache.put(_ti('replaced', confidence=0.1))
+    cache.put(_ti('replaced', confidence=1))
+
+    clock.time += 2
+    assert cache.sweep() == 0
+    clock.time += 10
+    # put sweeps as well, the only entry left is the new one
+    cache.put(_ti('new'))
+    assert len(cache) == 1
+
+
+def test_background_sweeping():
+    cache = NetworkOpinionCache(ttl_seconds=0.01, sweep_interval_seconds=0.01)
+    try:
+        cache.put(_ti('a'))
+        deadline = time.time() + 2
+        while len(cache) and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(cache) == 0
+    finally:
+        cache.close()
+
+
+def test_background_sweeping_stops_with_unused_cache():
+    before = set(threading.enumerate())
+    cache = NetworkOpinionCache(ttl_seconds=10, sweep_interval_seconds=0.01)
+    sweepers = set(threading.enumerate()) - before
+    assert sweepers
+    del cache
+    gc.collect()
+
+    for sweeper in sweepers:
+        sweeper.join(2)
+    assert not any(sweeper.is_alive() for sweeper in sweepers)
@@ -0,0 +1,31 @@
+import random
+
+from fides.utils.persistent import ShardedMap, ChunkedSortedList
+
+
+def test_sharded_map_update_does_not_change_original():
+    original = ShardedMap().updated((f'k{i}', i) for i in range(5000))
+    updated = original.updated([('k1', -1), ('new', 1)])
+
+    assert len(original) == 5000 and len(updated) == 5001
+    assert original['k1'] == 1 and updated['k1'] == -1
+    assert 'new' not in original and updated.get('new') == 1
+    assert dict(updated) == {**{f'k{i}': i for i in range(5000)}, 'k1': -1, 'new': 1}
+
+
+def test_chunked_sorted_list_matches_sorted_list():
+    rng = random.Random(42)
+    expected = sorted(rng.random() for _ in range(3000))
+    versions = [(ChunkedSortedList().updated([], expected), list(expected))]
+    for _ in range(200):
+        removed = rng.sample(expected, min(len(expected), rng.randint(0, 20)))
+        added = [rng.random() for _ in range(rng.randint(0, 20))]
+        for item in removed:
+            expected.remove(item)
+        expected = sorted(expected + added)
+        versions.append((versions[-1][0].updated(removed, added), list(expected)))
+
+    # every version still holds its own items
+    for chunked, items in versions:
+        assert list(chunked) == items
+        assert list(chunked.irange_from(0.5)) == [i for i in items if i >= 0.5]
@@ -0,0 +1,105 @@
+import json
+from dataclasses import asdict
+from typing import Dict
+from unittest.mock import MagicMock
+
+from redis.client import Redis
+
+from fides.model.threat_intelligence import SlipsThreatIntelligence
+from slips.persistance.threat_intelligence import SlipsThreatIntelligenceDatabase
+from tests.load_config import find_config
+
+
+class _Clock:
+    def __init__(self):
+        self.time = 1000.0
+
+    def __call__(self) -> float:
+        return self.time
+
+
+def _client(ti: Dict[str, SlipsThreatIntelligence]) -> MagicMock:
+    """Redis client with given TI in the hash."""
+    r = MagicMock(spec=Redis)
+    r.hget.side_effect = lambda key, target: json.dumps(asdict(ti[target])) if target in ti else None
+    r.hlen.side_effect = lambda key: len(ti)
+    r.hscan_iter.side_effect = lambda key, count: ((target, '') for target in list(ti))
+    return r
+
+
+def _ti(target: str, score: float = 0.5) -> SlipsThreatIntelligence:
+    return SlipsThreatIntelligence(score=score, confidence=1, target=target)
+
+
+def _db(r: MagicMock, clock: _Clock = None, **kwargs) -> SlipsThreatIntelligenceDatabase:
+    return SlipsThreatIntelligenceDatabase(find_config(), r, cache_ttl_seconds=30, clock=clock or _Clock(),
+                                           filter_rebuild_interval_seconds=None, **kwargs)
+
+
+def test_cached_ti_and_misses_are_not_read_again():
+    r = _client({'known.com': _ti('known.com')})
+    db = _db(r)
+
+    for _ in range(3):
+        assert db.get_for('known.com') == _ti('known.com')
+        assert db.get_for('unknown.com') is None
+
+    assert r.hget.call_count == 2
+    r.hget.assert_any_call('fides:ti', 'known.com')
+
+
+def test_modified_ti_does_not_change_cache():
+    db = _db(_client({'known.com': _ti('known.com')}))
+
+    db.get_for('known.com').confidentiality = 0.9
+    db.get_for('known.com').confidentiality = 0.9
+
+    assert db.get_for('known.com').confidentiality is None
+
+
+def test_cached_ti_expires():
+    clock = _Clock()
+    ti = {'known.com': _ti('known.com', 0.5)}
+    r = _client(ti)
+    db = _db(r, clock)
+    assert db.get_for('known.com').score == 0.5
+
+    ti['known.com'] = _ti('known.com', -0.5)
+    clock.time += 29
+    assert db.get_for('known.com').score == 0.5
+    clock.time += 1
+    assert db.get_for('known.com').score == -0.5
+    assert r.hget.call_count == 2
+
+
+def test_invalidated_target_is_read_again():
+    ti = {'known.com': _ti('known.com', 0.5)}
+    r = _client(ti)
+    db = _db(r)
+    assert db.get_for('known.com').score == 0.5
+    assert db.get_for('new.com') is None
+
+    # this is what Slips module does when it receives 'ti_updated'
+    ti.update({'known.com': _ti('known.com', -0.5), 'new.com': _ti('new.com')})
+    db.invalidate(target='known.com')
+    db.invalidate(target='new.com')
+
+    assert db.get_for('known.com').score == -0.5
+    assert db.get_for('new.com') == _ti('new.com')
+
+
+def test_targets_outside_filter_are_not_looked_up():
+    ti = {'known.com': _ti('known.com')}
+    r = _client(ti)
+    db = _db(r)
+    db.rebuild_filter()
+
+    assert db.get_for('unknown.com') is None
+    r.hget.assert_not_called()
+    assert db.get_for('known.com') == _ti('known.com')
+    r.hget.assert_called_once_with('fides:ti', 'known.com')
+
+    # invalidated target gets to the filter without waiting for the rebuild
+    ti['new.com'] = _ti('new.com')
+    db.invalidate(target='new.com')
+    assert db.get_for('new.com') == _ti('new.com')
@@ -0,0 +1,69 @@
+import threading
+from dataclasses import replace
+
+from fides.persistence.trust_columnar import ColumnarTrustDatabase
+from tests.load_config import find_config
+from tests.trust_data import trust_data
+
+
+def test_read_trust_data_are_values():
+    db = ColumnarTrustDatabase(find_config())
+    db.store_peer_trust_data(trust_data('a', 0.1))
+
+    trust = db.get_peer_trust_data('a')
+    trust.service_trust = 1
+
+    assert db.get_peer_trust_data('a').service_trust == 0.1
+    assert type(db.get_peer_trust_data('a').service_trust) is float
+
+
+def test_top_peers_and_reliability():
+    db = ColumnarTrustDatabase(find_config())
+    db.store_peer_trust_matrix({f'p{i}': trust_data(f'p{i}', i / 10, 1 - i / 10) for i in range(10)})
+
+    assert len(db) == 10
+    assert [i.id for i in db.get_top_peers_by_service_trust(3)] == ['p9', 'p8', 'p7']
+    assert [i.id for i in db.get_top_peers_by_recommendation_trust(2)] == ['p0', 'p1']
+    assert len(db.get_top_peers_by_service_trust(100)) == 10
+    assert db.get_top_peers_by_service_trust(0) == []
+    assert db.get_peers_reliability() == {f'p{i}': i / 10 for i in range(10)}
+    assert db.get_trust_matrix() == {f'p{i}': trust_data(f'p{i}', i / 10, 1 - i / 10) for i in range(10)}
+
+
+def test_invalid_peer_does_not_prevent_storing_others():
+    db = ColumnarTrustDatabase(find_config())
+    result = db.store_peer_trust_matrix({'a': trust_data('a'), 'bad': replace(trust_data('bad'), service_trust='high')})
+
+    assert result.stored == ['a']
+    assert list(result.failed) == ['bad']
+    assert list(db.get_peers_trust_data(['a', 'bad'])) == ['a']
+    assert len(db) == 1
+
+
+def test_concurrent_reader_never_sees_torn_matrix():
+    # the columns are grown while the reader runs
+    db = ColumnarTrustDatabase(find_config(), initial_capacity=1)
+    stopped, torn = threading.Event(), []
+
+    def read():
+        while not stopped.is_set():
+            # every write sets the same trust to all peers, new peers are stored with the existing ones
+            matrix = db.get_trust_matrix()
+            reliability = db.get_peers_reliability()
+            infos = db.get_peers_with_geq_service_trust(0)
+            # zero trust would be a slot that was published before its values were written
+            for values in ({t.service_trust for t in matrix.values()}, set(reliability.values())):
+                if len(values) > 1 or 0 in values:
+                    torn.append(values)
+            if len(infos) < len(matrix):
+                torn.append(infos)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    for step in range(1, 200):
+        db.store_peer_trust_matrix({f'p{i}': trust_data(f'p{i}', step / 200) for i in range(step * 5)})
+    stopped.set()
+    reader.join()
+
+    assert not torn
+    assert len(db) == 199 * 5
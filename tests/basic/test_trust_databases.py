@@ -0,0 +1,158 @@
+import os
+import tempfile
+import threading
+import time
+from dataclasses import replace
+from unittest import TestCase, skipIf
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from fides.model.peer import PeerInfo
+from fides.model.peer_trust_data import PeerTrustData
+from fides.persistence.trust import TrustDatabase, TrustUpdateError
+from fides.persistence.trust_columnar import ColumnarTrustDatabase
+from fides.persistence.trust_durable import DurableTrustDatabase
+from fides.persistence.trust_in_memory import InMemoryTrustDatabase
+from fides.persistence.trust_sqlite import SQLiteTrustDatabase
+from slips.persistance.trust import SlipsTrustDatabase
+from tests.load_config import find_config
+from tests.trust_data import trust_data, peer_ids
+
+
+def _increment(current: PeerTrustData) -> PeerTrustData:
+    # switch threads between the read and the write, so the lost update would show up
+    time.sleep(0)
+    return replace(current, initial_reputation_provided_by_count=current.initial_reputation_provided_by_count + 1)
+
+
+class TrustDatabaseContract:
+    """Behaviour shared by all trust databases, every backend has its own TestCase with this mixin."""
+
+    def create_database(self) -> TrustDatabase:
+        raise NotImplementedError('Backend test case must create the database.')
+
+    def setUp(self):
+        self.db = self.create_database()
+
+    def test_trust_data_are_stored_and_indexed(self):
+        result = self.db.store_peer_trust_matrix({
+            'a': trust_data('a', 0.1, 0.9), 'b': trust_data('b', 0.5, 0.5, ('org2',)),
+            'c': trust_data('c', 0.9, 0.1, ())
+        })
+        self.assertTrue(result.ok)
+        self.assertEqual(['a', 'b', 'c'], result.stored)
+        self.db.store_peer_trust_data(trust_data('a', 0.8, 0.9, ('org3',)))
+
+        self.assertEqual(trust_data('a', 0.8, 0.9, ('org3',)), self.db.get_peer_trust_data('a'))
+        self.assertEqual(trust_data('c', 0.9, 0.1, ()), self.db.get_peer_trust_data(PeerInfo('c', [])))
+        self.assertIsNone(self.db.get_peer_trust_data('missing'))
+        self.assertEqual({'b': trust_data('b', 0.5, 0.5, ('org2',)), 'c': trust_data('c', 0.9, 0.1, ())},
+                         self.db.get_peers_trust_data(['b', PeerInfo('c', []), 'missing']))
+        self.assertEqual(['a'], peer_ids(self.db.get_peers_info(['a', 'missing'])))
+
+    def test_threshold_queries_follow_overwrites(self):
+        self.db.store_peer_trust_matrix({p.peer_id: p for p in (trust_data('a', 0.1, 0.9), trust_data('b', 0.5, 0.5),
+                                                                 trust_data('c', 0.9, 0.1))})
+        self.assertEqual(['b', 'c'], peer_ids(self.db.get_peers_with_geq_service_trust(0.5)))
+        self.assertEqual(['a', 'b'], peer_ids(self.db.get_peers_with_geq_recommendation_trust(0.5)))
+        self.assertEqual([], peer_ids(self.db.get_peers_with_geq_service_trust(1.1)))
+
+        # overwritten peer must not be found by its old values
+        self.db.store_peer_trust_data(trust_data('c', 0.2, 0.8))
+        self.assertEqual(['b'], peer_ids(self.db.get_peers_with_geq_service_trust(0.5)))
+        self.assertEqual(['a', 'b', 'c'], peer_ids(self.db.get_peers_with_geq_recommendation_trust(0.5)))
+
+    def test_organisation_index_follows_changes(self):
+        self.db.store_peer_trust_data(trust_data('a', organisations=('org1',)))
+        self.db.store_peer_trust_data(trust_data('b', organisations=('org1', 'org2')))
+        self.db.store_peer_trust_data(trust_data('c', organisations=()))
+        self.assertEqual(['a', 'b'], peer_ids(self.db.get_peers_with_organisations(['org1', 'org2'])))
+
+        self.db.store_peer_trust_data(trust_data('b', organisations=('org3',)))
+        self.assertEqual(['a'], peer_ids(self.db.get_peers_with_organisations(['org1', 'org2'])))
+        self.assertEqual(['b'], peer_ids(self.db.get_peers_with_organisations(['org3'])))
+        self.assertEqual([], self.db.get_peers_with_organisations([]))
+
+    def test_concurrent_updates_are_not_lost(self):
+        self.db.store_peer_trust_matrix({p: trust_data(p) for p in ('a', 'b')})
+
+        def increment(peer_id: str):
+            for _ in range(100):
+                self.db.update_peer_trust_data(peer_id, _increment)
+
+        threads = [threading.Thread(target=increment, args=(p,)) for p in ('a', 'b', 'a', 'b')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # trust_data starts with 3
+        self.assertEqual(203, self.db.get_peer_trust_data('a').initial_reputation_provided_by_count)
+        self.assertEqual(203, self.db.get_peer_trust_data('b').initial_reputation_provided_by_count)
+
+    def test_updates_report_results(self):
+        self.db.store_peer_trust_data(trust_data('a'))
+
+        def fail(_):
+            raise ValueError('Update is bad!')
+
+        result = self.db.update_peers_trust_data({
+            'a': _increment,
+            'b': lambda current: current,
+            'c': lambda current: trust_data('c') if current is None else None,
+            'd': fail
+        })
+
+        self.assertEqual(['a', 'c'], result.stored)
+        self.assertEqual(['d'], list(result.failed))
+        self.assertEqual(4, result.updated['a'].initial_reputation_provided_by_count)
+        self.assertEqual(4, self.db.get_peer_trust_data('a').initial_reputation_provided_by_count)
+        self.assertIsNone(self.db.get_peer_trust_data('b'))
+        self.assertEqual(trust_data('c'), self.db.get_peer_trust_data('c'))
+        with self.assertRaises(TrustUpdateError):
+            self.db.update_peer_trust_data('a', fail)
+
+
+class TestInMemoryTrustDatabase(TrustDatabaseContract, TestCase):
+
+    def create_database(self) -> TrustDatabase:
+        return InMemoryTrustDatabase(find_config())
+
+
+class TestColumnarTrustDatabase(TrustDatabaseContract, TestCase):
+
+    def create_database(self) -> TrustDatabase:
+        # small capacity, so the columns grow during the tests
+        return ColumnarTrustDatabase(find_config(), initial_capacity=2)
+
+
+class TestDurableTrustDatabase(TrustDatabaseContract, TestCase):
+
+    def create_database(self) -> TrustDatabase:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        db = DurableTrustDatabase(find_config(), directory.name)
+        self.addCleanup(db.close)
+        return db
+
+
+class TestSQLiteTrustDatabase(TrustDatabaseContract, TestCase):
+
+    def create_database(self) -> TrustDatabase:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        db = SQLiteTrustDatabase(find_config(), os.path.join(directory.name, 'trust.db'))
+        self.addCleanup(db.close)
+        return db
+
+
+@skipIf(fakeredis is None, 'fakeredis is not installed')
+class TestSlipsTrustDatabase(TrustDatabaseContract, TestCase):
+
+    def create_database(self) -> TrustDatabase:
+        r = fakeredis.FakeStrictRedis(server=fakeredis.FakeServer(), decode_responses=True)
+        # concurrent updates of the same peer conflict a lot in the tests, so they need more attempts
+        return SlipsTrustDatabase(find_config(), r, max_update_attempts=1000)
@@ -0,0 +1,76 @@
+import os
+import tempfile
+from dataclasses import replace
+
+from fides.persistence.records import encode_trust_record, decode_trust_record
+from fides.persistence.trust_durable import DurableTrustDatabase
+from tests.load_config import find_config
+from tests.trust_data import trust_data
+
+
+def test_record_round_trip():
+    for trust in (trust_data('peer#1'), trust_data('ěščř', organisations=(), ip=None),
+                  trust_data('empty-ip', ip='')):
+        assert decode_trust_record(encode_trust_record(trust)) == trust
+        assert decode_trust_record(memoryview(encode_trust_record(trust))) == trust
+
+
+def test_trust_survives_restart():
+    with tempfile.TemporaryDirectory() as directory:
+        db = DurableTrustDatabase(find_config(), directory)
+        db.store_peer_trust_matrix({p: trust_data(p) for p in ('a', 'b', 'c')})
+        db.snapshot()
+        db.store_peer_trust_data(trust_data('b', service_trust=0.9))
+        db.store_peer_trust_data(trust_data('d', organisations=('org2',)))
+        db.close()
+
+        restored = DurableTrustDatabase(find_config(), directory)
+        assert restored.get_trust_matrix() == {
+            'a': trust_data('a'), 'b': trust_data('b', service_trust=0.9), 'c': trust_data('c'),
+            'd': trust_data('d', organisations=('org2',))
+        }
+        assert [p.id for p in restored.get_peers_with_geq_service_trust(0.8)] == ['b']
+        assert [p.id for p in restored.get_peers_with_organisations(['org2'])] == ['d']
+        restored.close()
+
+
+def test_torn_wal_tail_is_ignored():
+    with tempfile.TemporaryDirectory() as directory:
+        db = DurableTrustDatabase(find_config(), directory)
+        db.store_peer_trust_data(trust_data('a'))
+        db.store_peer_trust_data(trust_data('b'))
+        db.close()
+
+        wal = os.path.join(directory, 'wal-000000.log')
+        with open(wal, 'r+b') as f:
+            f.truncate(os.path.getsize(wal) - 3)
+
+        restored = DurableTrustDatabase(find_config(), directory)
+        assert sorted(restored.get_trust_matrix()) == ['a']
+        # new records are appended to the new generation and the torn tail does not break them
+        restored.store_peer_trust_data(trust_data('c'))
+        restored.close()
+        assert sorted(DurableTrustDatabase(find_config(), directory).get_trust_matrix()) == ['a', 'c']
+
+
+def test_snapshot_is_written_when_wal_grows():
+    with tempfile.TemporaryDirectory() as directory:
+        db = DurableTrustDatabase(find_config(), directory, snapshot_wal_bytes=1024)
+        for i in range(50):
+            db.store_peer_trust_data(trust_data(f'peer#{i}'))
+        db.close()
+
+        files = os.listdir(directory)
+        assert 'snapshot.bin' in files
+        assert sum(os.path.getsize(os.path.join(directory, f)) for f in files if f.startswith('wal-')) <= 1024
+        assert len(DurableTrustDatabase(find_config(), directory).get_trust_matrix()) == 50
+
+
+def test_updates_are_logged():
+    with tempfile.TemporaryDirectory() as directory:
+        db = DurableTrustDatabase(find_config(), directory)
+        db.store_peer_trust_data(trust_data('a', 0.1))
+        db.update_peer_trust_data('a', lambda current: replace(current, service_trust=current.service_trust + 0.5))
+        db.close()
+
+        assert DurableTrustDatabase(find_config(), directory).get_peer_trust_data('a').service_trust == 0.6
@@ -0,0 +1,97 @@
+import threading
+from dataclasses import replace
+
+import pytest
+
+from fides.model.peer import PeerInfo
+from fides.model.peer_trust_data import PeerTrustData, trust_data_prototype
+from fides.persistence.trust import TrustDatabase
+from fides.persistence.trust_in_memory import InMemoryTrustDatabase
+from tests.load_config import find_config
+from tests.load_fides import get_fides
+from tests.trust_data import trust_data
+
+
+class _FailingTrustDatabase(InMemoryTrustDatabase):
+    """Stores peers one by one through the default bulk write and fails for peer 'bad'."""
+
+    def __init__(self):
+        super().__init__(find_config())
+        self.bulk_writes = 0
+
+    def store_peer_trust_data(self, trust_data: PeerTrustData):
+        if trust_data.peer_id == 'bad':
+            raise ValueError('Peer is bad!')
+        super().store_peer_trust_data(trust_data)
+
+    def store_peer_trust_matrix(self, trust_matrix):
+        self.bulk_writes += 1
+        return TrustDatabase.store_peer_trust_matrix(self, trust_matrix)
+
+
+def test_bulk_operations():
+    db = InMemoryTrustDatabase(find_config())
+    matrix = {p: trust_data_prototype(PeerInfo(p, [])) for p in ('a', 'b')}
+
+    result = db.store_peer_trust_matrix(matrix)
+    assert result.ok and result.stored == ['a', 'b']
+    assert db.get_peers_trust_data(['a', PeerInfo('b', []), 'missing']) == matrix
+
+
+def test_bulk_write_reports_partial_failure():
+    db = _FailingTrustDatabase()
+    result = db.store_peer_trust_matrix({p: trust_data_prototype(PeerInfo(p, [])) for p in ('a', 'bad', 'c')})
+
+    assert not result.ok
+    assert result.stored == ['a', 'c']
+    assert list(result.failed) == ['bad']
+    assert set(db.get_peers_trust_data(['a', 'bad', 'c'])) == {'a', 'c'}
+
+
+def test_new_peers_are_stored_in_one_bulk_write():
+    db = _FailingTrustDatabase()
+    f = get_fides(trust_db=db)
+
+    f.peer_list.handle_peer_list_updated([PeerInfo(p, []) for p in ('a', 'b', 'c')])
+
+    assert db.bulk_writes == 1
+    assert set(db.get_peers_trust_data(['a', 'b', 'c'])) == {'a', 'b', 'c'}
+
+
+def test_readers_see_immutable_generations():
+    db = InMemoryTrustDatabase(find_config())
+    db.store_peer_trust_data(trust_data('a', 0.1, 0.1))
+    version, matrix = db.get_version(), db.get_trust_matrix()
+
+    db.store_peer_trust_data(trust_data('a', 0.9, 0.9, ('org2',)))
+    db.store_peer_trust_data(trust_data('b'))
+
+    assert db.get_version() == version + 2
+    assert list(matrix) == ['a'] and matrix['a'].service_trust == 0.1
+    assert set(db.get_trust_matrix()) == {'a', 'b'}
+    with pytest.raises(TypeError):
+        matrix['c'] = matrix['a']
+
+
+def test_concurrent_reader_never_sees_torn_matrix():
+    db = InMemoryTrustDatabase(find_config())
+    peers = [trust_data_prototype(PeerInfo(f'p{i}', ['org1'])) for i in range(300)]
+    db.store_peer_trust_matrix({p.peer_id: p for p in peers})
+    stopped, torn = threading.Event(), []
+
+    def read():
+        while not stopped.is_set():
+            # every write changes all peers at once, so all of them have to have the same trust
+            values = {t.service_trust for t in db.get_trust_matrix().values()}
+            infos = db.get_peers_with_geq_service_trust(0)
+            if len(values) != 1 or len(infos) != len(peers):
+                torn.append(values)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    for step in range(1, 50):
+        db.store_peer_trust_matrix({p.peer_id: replace(p, service_trust=step / 50) for p in peers})
+    stopped.set()
+    reader.join()
+
+    assert not torn
@@ -0,0 +1,139 @@
+import json
+from typing import Callable
+
+import pytest
+
+from fides.model.threat_intelligence import SlipsThreatIntelligence
+from slips.persistance.trust import SlipsTrustDatabase
+from tests.load_config import find_config
+from tests.trust_data import trust_data, peer_ids
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+def _redis():
+    return fakeredis.FakeStrictRedis(server=fakeredis.FakeServer(), decode_responses=True)
+
+
+def _interfere_once(r, interference: Callable[[], None]):
+    """Runs interference after the first read pipeline of the database is executed, before its transaction."""
+    pipeline = r.pipeline
+
+    def interfering_pipeline(transaction=True):
+        pipe = pipeline(transaction=transaction)
+        if not transaction:
+            execute = pipe.execute
+
+            def execute_and_interfere(*args, **kwargs):
+                responses = execute(*args, **kwargs)
+                r.pipeline = pipeline
+                interference()
+                return responses
+
+            pipe.execute = execute_and_interfere
+        return pipe
+
+    r.pipeline = interfering_pipeline
+
+
+def test_keys_layout():
+    r = _redis()
+    db = SlipsTrustDatabase(find_config(), r, prefix='test')
+    db.store_peer_trust_data(trust_data('a', 0.25, 0.75, ('org1', 'org2')))
+    db.store_connected_peers_list([trust_data('b').info])
+
+    assert sorted(r.keys()) == ['test:connected', 'test:index:recommendation_trust', 'test:index:service_trust',
+                                'test:org:org1', 'test:org:org2', 'test:peer:a', 'test:peers:info']
+    stored = r.hgetall('test:peer:a')
+    assert float(stored['service_trust']) == 0.25
+    assert json.loads(stored['organisations']) == ['org1', 'org2']
+    assert json.loads(stored['info'])['id'] == 'a'
+    assert sorted(r.hkeys('test:peers:info')) == ['a', 'b']
+    assert r.smembers('test:connected') == {'b'}
+    assert peer_ids(db.get_connected_peers()) == ['b']
+
+
+def test_indexes_follow_overwrites():
+    r = _redis()
+    db = SlipsTrustDatabase(find_config(), r)
+    db.store_peer_trust_matrix({'a': trust_data('a', 0.1, 0.9, ('org1', 'org2')), 'b': trust_data('b', 0.5, 0.5)})
+    db.store_peer_trust_data(trust_data('a', 0.7, 0.3, ('org2', 'org3')))
+
+    assert r.zrange('fides:index:service_trust', 0, -1, withscores=True) == [('b', 0.5), ('a', 0.7)]
+    assert r.zrange('fides:index:recommendation_trust', 0, -1, withscores=True) == [('a', 0.3), ('b', 0.5)]
+    assert r.smembers('fides:org:org1') == {'b'}
+    assert r.smembers('fides:org:org2') == {'a'}
+    assert r.smembers('fides:org:org3') == {'a'}
+
+
+def test_network_opinions_expire_by_confidence():
+    r = _redis()
+    db = SlipsTrustDatabase(find_config(), r)
+    db.cache_network_opinion(SlipsThreatIntelligence(score=0.5, confidence=1, target='1.1.1.1'))
+    db.cache_network_opinion(SlipsThreatIntelligence(score=0.5, confidence=0.5, target='2.2.2.2'))
+    db.cache_network_opinion(SlipsThreatIntelligence(score=0, confidence=0, target='3.3.3.3'))
+
+    # configured TTL is one hour, low confidence opinions expire sooner and unknown targets the soonest
+    assert r.ttl('fides:opinion:1.1.1.1') == 3600
+    assert r.ttl('fides:opinion:2.2.2.2') == 1800
+    assert r.ttl('fides:opinion:3.3.3.3') == 30
+    assert db.get_cached_network_opinion('2.2.2.2').confidence == 0.5
+    assert db.get_cached_network_opinion('4.4.4.4') is None
+
+
+def test_empty_updates_do_not_touch_redis():
+    r = _redis()
+    r.pipeline = None
+
+    result = SlipsTrustDatabase(find_config(), r).update_peers_trust_data({})
+
+    assert result.ok and result.stored == [] and result.updated == {}
+
+
+def test_conflicting_update_is_computed_again():
+    r = _redis()
+    db = SlipsTrustDatabase(find_config(), r)
+    db.store_peer_trust_data(trust_data('a', 0.1))
+    _interfere_once(r, lambda: SlipsTrustDatabase(find_config(), r).store_peer_trust_data(trust_data('a', 0.5)))
+    seen = []
+
+    def update(current):
+        seen.append(current.service_trust)
+        return trust_data('a', current.service_trust + 0.25)
+
+    assert db.update_peer_trust_data('a', update).service_trust == 0.75
+    assert seen == [0.1, 0.5]
+    assert db.get_peer_trust_data('a').service_trust == 0.75
+
+
+def test_update_fails_when_attempts_run_out():
+    r = _redis()
+    db = SlipsTrustDatabase(find_config(), r, max_update_attempts=3)
+    db.store_peer_trust_data(trust_data('a', 0.1))
+    calls = []
+
+    def conflicting(current):
+        calls.append(current)
+        r.hset('fides:peer:a', 'service_trust', len(calls))
+        return trust_data('a', 0.9)
+
+    result = db.update_peers_trust_data({'a': conflicting})
+
+    assert len(calls) == 3
+    assert not result.ok and 'concurrently 3 times' in result.failed['a']
+    assert r.hget('fides:peer:a', 'service_trust') == '3'
+
+
+def test_organisations_are_read_again_after_conflicting_write():
+    r = _redis()
+    db = SlipsTrustDatabase(find_config(), r)
+    db.store_peer_trust_data(trust_data('a', organisations=('org1',)))
+    # another writer moves the peer to org2 after its previous organisations were read
+    _interfere_once(r, lambda: SlipsTrustDatabase(find_config(), r)
+                    .store_peer_trust_data(trust_data('a', organisations=('org2',))))
+
+    assert db.store_peer_trust_matrix({'a': trust_data('a', organisations=('org3',))}).ok
+
+    assert r.smembers('fides:org:org1') == set()
+    assert r.smembers('fides:org:org2') == set()
+    assert peer_ids(db.get_peers_with_organisations(['org1', 'org2', 'org3'])) == ['a']
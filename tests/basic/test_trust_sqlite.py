@@ -0,0 +1,73 @@
+import os
+import tempfile
+from dataclasses import replace
+
+from fides.model.peer import PeerInfo
+from fides.model.threat_intelligence import SlipsThreatIntelligence
+from fides.persistence.trust_sqlite import SQLiteTrustDatabase
+from tests.load_config import find_config
+from tests.trust_data import trust_data, peer_ids
+
+
+def test_trust_data_survive_reopening():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'trust.db')
+        db = SQLiteTrustDatabase(find_config(), path)
+        db.store_peer_trust_matrix({
+            'a': trust_data('a', 0.1, 0.9), 'b': trust_data('b', 0.5, 0.5, ('org2',)),
+            'c': trust_data('c', 0.9, 0.1, ())
+        })
+        db.store_peer_trust_data(trust_data('a', 0.8, 0.9, ('org3',)))
+        db.close()
+
+        db = SQLiteTrustDatabase(find_config(), path)
+        assert db.get_peers_trust_data(['a', 'b', 'c']) == {
+            'a': trust_data('a', 0.8, 0.9, ('org3',)), 'b': trust_data('b', 0.5, 0.5, ('org2',)),
+            'c': trust_data('c', 0.9, 0.1, ())
+        }
+        assert peer_ids(db.get_peers_with_geq_service_trust(0.5)) == ['a', 'b', 'c']
+        assert peer_ids(db.get_peers_with_organisations(['org3'])) == ['a']
+        db.close()
+
+
+def test_connected_peers_and_opinions():
+    db = SQLiteTrustDatabase(find_config(), ':memory:', opinions_cleanup_interval_seconds=0)
+    peers = [PeerInfo('x', ['org1'], '1.1.1.1'), PeerInfo('y', [])]
+    db.store_connected_peers_list(peers)
+    assert db.get_connected_peers() == peers
+
+    db.cache_network_opinion(SlipsThreatIntelligence(score=1, confidence=0.5, target='known.com'))
+    db.cache_network_opinion(SlipsThreatIntelligence(score=0, confidence=0, target='unknown.com'))
+    assert db.get_cached_network_opinion('known.com') == \
+           SlipsThreatIntelligence(score=1, confidence=0.5, target='known.com')
+    assert db.get_cached_network_opinion('unknown.com').confidence == 0
+    assert db.get_cached_network_opinion('other.com') is None
+
+
+def test_invalid_peer_does_not_prevent_storing_others():
+    db = SQLiteTrustDatabase(find_config(), ':memory:')
+    result = db.store_peer_trust_matrix({'a': trust_data('a'), 'bad': replace(trust_data('bad'), service_trust='high')})
+    assert result.stored == ['a']
+    assert list(result.failed) == ['bad']
+    assert list(db.get_peers_trust_data(['a', 'bad'])) == ['a']
+
+
+def test_histories_are_read_from_the_same_snapshot_as_peers():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'trust.db')
+        db, writer = SQLiteTrustDatabase(find_config(), path), SQLiteTrustDatabase(find_config(), path)
+        db.store_peer_trust_data(trust_data('a', 0.1))
+        written = replace(trust_data('a', 0.9), service_history=[], recommendation_history=[])
+        histories = db._SQLiteTrustDatabase__histories
+
+        def write_between_queries(*args):
+            # another connection rewrites the peer after its row was read, but before its histories
+            if writer.get_peer_trust_data('a') != written:
+                writer.store_peer_trust_data(written)
+            return histories(*args)
+
+        db._SQLiteTrustDatabase__histories = write_between_queries
+        assert db.get_peer_trust_data('a') == trust_data('a', 0.1)
+        assert db.get_peer_trust_data('a') == written
+        db.close()
+        writer.close()
@@ -0,0 +1,46 @@
+"""Compares speed of the JSON codec and asdict serialization on large peer list and intelligence response messages.
+
+Run as: python -m tests.benchmarks.codec
+"""
+import json
+import timeit
+from dataclasses import asdict
+
+from fides.messaging.codec import JsonCodec
+from fides.messaging.model import PeerIntelligenceResponse
+from fides.model.peer import PeerInfo
+from fides.model.threat_intelligence import ThreatIntelligence
+from tests.messaging.messages import nl2tl_intelligence_response, nl2tl_peers_list
+
+
+def peers(count: int):
+    return [PeerInfo(id=f'peer#{i:06d}', organisations=['org1', 'org2'], ip=f'10.0.{i // 256 % 256}.{i % 256}')
+            for i in range(count)]
+
+
+def main():
+    json_codec = JsonCodec()
+    for count in (100, 1000):
+        messages = {
+            'peers_list': nl2tl_peers_list(peers(count)),
+            'intelligence_response': nl2tl_intelligence_response([
+                PeerIntelligenceResponse(sender=p, intelligence=ThreatIntelligence(score=0.5, confidence=0.75),
+                                         target='example.com') for p in peers(count)
+            ])
+        }
+        for name, envelope in messages.items():
+            number = max(1, 2000 // count)
+            asdict_json = json.dumps(asdict(envelope))
+            encoded_json = json_codec.encode(envelope)
+
+            def t(fn):
+                return timeit.timeit(fn, number=number) / number * 1000
+
+            print(f'{name} ({count} peers)')
+            print(f'  asdict + json: {len(asdict_json):>8} B, encode {t(lambda: json.dumps(asdict(envelope))):7.3f} ms')
+            print(f'  json codec:    {len(encoded_json):>8} B, encode {t(lambda: json_codec.encode(envelope)):7.3f} ms,'
+                  f' decode {t(lambda: json_codec.decode(encoded_json)):7.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
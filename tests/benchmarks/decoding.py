@@ -0,0 +1,59 @@
+"""Compares reflective dacite decoding with precompiled decoders on a large intelligence response.
+
+Run as: python -m tests.benchmarks.decoding
+"""
+import json
+import timeit
+from dataclasses import asdict
+
+from dacite import from_dict
+
+from fides.messaging.codec import decode_network_message
+from fides.messaging.message_handler import decode_peer_info, decode_threat_intelligence
+from fides.messaging.model import NetworkMessage, PeerIntelligenceResponse
+from fides.model.peer import PeerInfo
+from fides.model.threat_intelligence import ThreatIntelligence
+from tests.messaging.messages import nl2tl_intelligence_response
+
+
+def intelligence_response(peers: int) -> str:
+    return json.dumps(asdict(nl2tl_intelligence_response([
+        PeerIntelligenceResponse(sender=PeerInfo(id=f'peer#{i}', organisations=['org1', 'org2'], ip='1.2.3.4'),
+                                 intelligence=ThreatIntelligence(score=0.5, confidence=0.7),
+                                 target='example.com')
+        for i in range(peers)
+    ])))
+
+
+def decode_with_dacite(raw: str):
+    message = from_dict(data_class=NetworkMessage, data=json.loads(raw))
+    return [PeerIntelligenceResponse(
+        sender=from_dict(data_class=PeerInfo, data=single['sender']),
+        intelligence=from_dict(data_class=ThreatIntelligence, data=single['payload']['intelligence']),
+        target=single['payload']['target']
+    ) for single in message.data]
+
+
+def decode_with_decoders(raw: str):
+    message = decode_network_message(json.loads(raw))
+    return [PeerIntelligenceResponse(
+        sender=decode_peer_info(single['sender']),
+        intelligence=decode_threat_intelligence(single['payload']['intelligence']),
+        target=single['payload']['target']
+    ) for single in message.data]
+
+
+def main():
+    for peers in (10, 100, 500, 1000):
+        raw = intelligence_response(peers)
+        assert decode_with_dacite(raw) == decode_with_decoders(raw)
+
+        number = max(1, 5000 // peers)
+        dacite_time = timeit.timeit(lambda: decode_with_dacite(raw), number=number) / number
+        decoders_time = timeit.timeit(lambda: decode_with_decoders(raw), number=number) / number
+        print(f'{peers:>5} peers: dacite {dacite_time * 1000:8.3f} ms, '
+              f'decoders {decoders_time * 1000:8.3f} ms, speedup {dacite_time / decoders_time:5.1f}x')
+
+
+if __name__ == '__main__':
+    main()
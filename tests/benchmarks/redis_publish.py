@@ -0,0 +1,64 @@
+"""Measures publish throughput of RedisSimplexQueue with and without pipelining.
+
+Uses local stand-in for Redis that simulates network round trip, so no Redis server is needed.
+Run as: python -m tests.benchmarks.redis_publish
+"""
+import time
+
+from slips.messaging.queue import RedisSimplexQueue
+
+
+class LatencyRedis:
+    """Redis stand-in where every command sent to the server takes one round trip."""
+
+    def __init__(self, round_trip_seconds: float):
+        self.round_trip_seconds = round_trip_seconds
+        self.published = 0
+
+    def publish(self, channel: str, data: str):
+        time.sleep(self.round_trip_seconds)
+        self.published += 1
+
+    def pipeline(self, transaction: bool = True):
+        return LatencyPipeline(self)
+
+    def pubsub(self):
+        return None
+
+
+class LatencyPipeline:
+    def __init__(self, r: LatencyRedis):
+        self.__r = r
+        self.__commands = 0
+
+    def publish(self, channel: str, data: str):
+        self.__commands += 1
+
+    def execute(self):
+        # the whole pipeline is sent in a single round trip
+        time.sleep(self.__r.round_trip_seconds)
+        self.__r.published += self.__commands
+
+
+def measure(messages: int, round_trip_seconds: float, pipeline_size: int) -> float:
+    r = LatencyRedis(round_trip_seconds)
+    queue = RedisSimplexQueue(r, send_channel='out', received_channel='in', pipeline_size=pipeline_size)
+    start = time.perf_counter()
+    for i in range(messages):
+        queue.send(f'message {i}')
+    queue.close()
+    duration = time.perf_counter() - start
+    assert r.published == messages
+    return messages / duration
+
+
+def main():
+    messages, round_trip_seconds = 2000, 0.0002
+    print(f'{messages} messages, simulated round trip {round_trip_seconds * 1000} ms')
+    print(f'direct publish: {measure(messages, round_trip_seconds, pipeline_size=0):10.0f} msg/s')
+    for size in (10, 100, 500):
+        print(f'pipeline {size:>5}: {measure(messages, round_trip_seconds, pipeline_size=size):10.0f} msg/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Compares lookups and matrix stores of the in-memory, columnar and SQLite trust databases.
+
+Run as: python -m tests.benchmarks.trust_databases [peers ...], default sizes are 10k and 100k peers.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import replace
+
+from fides.model.peer import PeerInfo
+from fides.model.peer_trust_data import trust_data_prototype
+from fides.model.service_history import ServiceHistoryRecord
+from fides.persistence.trust import TrustDatabase
+from fides.persistence.trust_columnar import ColumnarTrustDatabase
+from fides.persistence.trust_in_memory import InMemoryTrustDatabase
+from fides.persistence.trust_sqlite import SQLiteTrustDatabase
+from fides.utils.logger import set_global_level
+from tests.load_config import find_config
+
+
+def trust_matrix(count: int):
+    history = [ServiceHistoryRecord(satisfaction=0.5, weight=1, timestamp=1_600_000_000 + i) for i in range(5)]
+    prototype = replace(trust_data_prototype(PeerInfo('prototype', [])), service_history=history)
+    return {f'peer#{i:07d}': replace(prototype, info=PeerInfo(f'peer#{i:07d}', [f'org{i % 10}']),
+                                     service_trust=random.random(), recommendation_trust=random.random())
+            for i in range(count)}
+
+
+def measure(name: str, fn, repeat: int):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    print(f'  {name:<36} {(time.perf_counter() - started) / repeat * 1e6:>12.1f} us')
+
+
+def run(db: TrustDatabase, matrix):
+    ids = list(matrix)
+    started = time.perf_counter()
+    for start in range(0, len(ids), 10_000):
+        db.store_peer_trust_matrix({peer_id: matrix[peer_id] for peer_id in ids[start:start + 10_000]})
+    print(f'  {"initial load":<36} {time.perf_counter() - started:>12.2f} s')
+
+    measure('get_peer_trust_data', lambda: db.get_peer_trust_data(random.choice(ids)), 2000)
+    measure('get_peers_trust_data (50 peers)', lambda: db.get_peers_trust_data(random.sample(ids, 50)), 200)
+    measure('get_peers_with_geq_service_trust', lambda: db.get_peers_with_geq_service_trust(0.999), 200)
+    measure('get_peers_with_organisations', lambda: db.get_peers_with_organisations(['org1']), 10)
+    measure('store_peer_trust_data', lambda: db.store_peer_trust_data(
+        replace(matrix[random.choice(ids)], service_trust=random.random())), 1000)
+    measure('store_peer_trust_matrix (50 peers)', lambda: db.store_peer_trust_matrix(
+        {peer_id: replace(matrix[peer_id], service_trust=random.random()) for peer_id in random.sample(ids, 50)}), 100)
+
+
+def main():
+    set_global_level('WARN')
+    config = find_config()
+    for count in [int(c) for c in sys.argv[1:]] or [10_000, 100_000]:
+        matrix = trust_matrix(count)
+        print(f'{count} peers, in-memory:')
+        run(InMemoryTrustDatabase(config), matrix)
+        print(f'{count} peers, columnar:')
+        run(ColumnarTrustDatabase(config), matrix)
+        with tempfile.TemporaryDirectory() as directory:
+            print(f'{count} peers, SQLite:')
+            db = SQLiteTrustDatabase(config, os.path.join(directory, 'trust.db'))
+            run(db, matrix)
+            db.close()
+
+
+if __name__ == '__main__':
+    main()
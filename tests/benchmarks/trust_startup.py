@@ -0,0 +1,57 @@
+"""Measures how long does it take to restart the durable trust database with many peers.
+
+Run as: python -m tests.benchmarks.trust_startup [peers]
+"""
+import sys
+import tempfile
+import time
+from dataclasses import replace
+
+from fides.model.peer import PeerInfo
+from fides.model.peer_trust_data import trust_data_prototype
+from fides.model.service_history import ServiceHistoryRecord
+from fides.persistence.trust_durable import DurableTrustDatabase
+from fides.utils.logger import set_global_level
+from tests.load_config import find_config
+
+
+def peer(i: int) -> PeerInfo:
+    return PeerInfo(id=f'peer#{i:07d}', organisations=['org1'], ip=f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}')
+
+
+def trust_matrix(count: int):
+    history = [ServiceHistoryRecord(satisfaction=0.5, weight=1, timestamp=1_600_000_000 + i) for i in range(5)]
+    prototype = replace(trust_data_prototype(peer(0)), service_history=history)
+    return {p.id: replace(prototype, info=p, service_trust=i / count) for i, p in ((i, peer(i)) for i in range(count))}
+
+
+def main():
+    set_global_level('WARN')
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    config = find_config()
+    with tempfile.TemporaryDirectory() as directory:
+        db = DurableTrustDatabase(config, directory, snapshot_wal_bytes=2 ** 40)
+        matrix = trust_matrix(count)
+
+        started = time.perf_counter()
+        db.store_peer_trust_matrix(matrix)
+        print(f'store {count} peers to WAL: {time.perf_counter() - started:.2f}s')
+
+        started = time.perf_counter()
+        db.snapshot()
+        print(f'snapshot:                 {time.perf_counter() - started:.2f}s')
+
+        updates = list(matrix.values())[:count // 10]
+        for peer in updates:
+            db.store_peer_trust_data(replace(peer, service_trust=1))
+        db.close()
+        del db, matrix
+
+        started = time.perf_counter()
+        db = DurableTrustDatabase(config, directory)
+        print(f'startup (snapshot + {len(updates)} WAL records): {time.perf_counter() - started:.2f}s')
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from fides.messaging.async_message_handler import AsyncMessageHandler
+from fides.messaging.async_network_bridge import AsyncNetworkBridge
+from fides.messaging.async_queue import AsyncInMemoryQueue
+from fides.model.peer import PeerInfo
+from tests.load_fides import get_fides
+from tests.messaging.messages import serialize, nl2tl_intelligence_request, nl2tl_peers_list
+
+
+class TestAsyncMessaging(TestCase):
+
+    def test_sync_protocols_behind_async_handler(self):
+        queue = AsyncInMemoryQueue()
+        bridge = AsyncNetworkBridge(queue)
+        # protocols send through the async bridge, so their messages end up in the async queue
+        f = get_fides(bridge=bridge.for_sync_protocols())
+        executor = ThreadPoolExecutor(max_workers=1)
+        handler = AsyncMessageHandler.for_sync_protocols(
+            on_peer_list_update=f.peer_list.handle_peer_list_updated,
+            on_recommendation_request=f.recommendations.handle_recommendation_request,
+            on_recommendation_response=f.recommendations.handle_recommendation_response,
+            on_alert=f.alert.handle_alert,
+            on_intelligence_request=f.intelligence.handle_intelligence_request,
+            on_intelligence_response=f.intelligence.handle_intelligence_response,
+            executor=executor
+        )
+
+        async def run():
+            await queue.send(serialize(nl2tl_peers_list([PeerInfo('peer#1', [])])))
+            await queue.send(serialize(nl2tl_intelligence_request('123', 'example.com', PeerInfo('peer#2', []))))
+            queue.stop()
+            await bridge.listen(handler)
+
+            sent = []
+
+            async def on_message(data: str):
+                sent.append(json.loads(data)['type'])
+
+            queue.stop()
+            await queue.listen(on_message)
+            return sent
+
+        sent = asyncio.run(run())
+        executor.shutdown()
+
+        self.assertEqual(['tl2nl_peers_reliability', 'tl2nl_intelligence_response', 'tl2nl_peers_reliability'], sent)
+
+    def test_send_is_awaitable(self):
+        async def run():
+            queue = AsyncInMemoryQueue()
+            bridge = AsyncNetworkBridge(queue)
+            await bridge.send_intelligence_request('example.com')
+            queue.stop()
+
+            received = []
+
+            async def on_message(data: str):
+                received.append(json.loads(data))
+
+            await queue.listen(on_message)
+            return received
+
+        received = asyncio.run(run())
+        self.assertEqual(1, len(received))
+        self.assertEqual('tl2nl_intelligence_request', received[0]['type'])
+        self.assertEqual('example.com', received[0]['data']['payload'])
@@ -0,0 +1,56 @@
+import json
+from dataclasses import asdict
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from redis.client import Redis
+from redis.connection import Encoder
+
+from fides.messaging.codec import JsonCodec
+from fides.messaging.model import PeerIntelligenceResponse
+from fides.messaging.network_bridge import NetworkBridge
+from fides.model.peer import PeerInfo
+from fides.model.threat_intelligence import ThreatIntelligence
+from slips.messaging.queue import RedisSimplexQueue
+from tests.messaging.messages import nl2tl_intelligence_response
+
+
+def intelligence_response():
+    return nl2tl_intelligence_response([
+        PeerIntelligenceResponse(sender=PeerInfo(id=f'peer#{i}', organisations=['org1'], ip=None),
+                                 intelligence=ThreatIntelligence(score=-0.5, confidence=1),
+                                 target='example.com')
+        for i in range(10)
+    ])
+
+
+class TestCodec(TestCase):
+
+    def test_json_codec_is_compatible_with_asdict(self):
+        envelope = intelligence_response()
+        self.assertEqual(json.dumps(asdict(envelope)), JsonCodec().encode(envelope))
+
+    def test_json_codec_round_trip(self):
+        envelope = intelligence_response()
+        codec = JsonCodec()
+
+        decoded = codec.decode(codec.encode(envelope))
+
+        self.assertEqual(1, len(decoded))
+        self.assertEqual(json.loads(json.dumps(asdict(envelope))), asdict(decoded[0]))
+        # data coming from redis without decoding
+        self.assertEqual(decoded, codec.decode(codec.encode(envelope).encode()))
+
+    def test_size_of_message_sent_through_redis(self):
+        r = MagicMock(spec=Redis)
+        bridge = NetworkBridge(RedisSimplexQueue(r, 'send', 'receive'))
+        envelope = intelligence_response()
+
+        bridge._send(envelope)
+
+        # the connection encodes the published string to bytes, JSON is ASCII, so nothing grows
+        (channel, published), _ = r.publish.call_args
+        on_wire = Encoder('utf-8', 'strict', decode_responses=True).encode(published)
+        self.assertEqual('send', channel)
+        self.assertEqual(len(json.dumps(asdict(envelope))), len(on_wire))
+        self.assertEqual(JsonCodec().decode(published), JsonCodec().decode(on_wire))
@@ -0,0 +1,33 @@
+from unittest import TestCase
+
+from fides.messaging.decoders import DecoderRegistry, DecodingError
+from fides.model.peer import PeerInfo
+from fides.model.recommendation import Recommendation
+
+
+class TestDecoders(TestCase):
+
+    def test_decodes_data_class_with_defaults(self):
+        peer = DecoderRegistry().decode(PeerInfo, {'id': 'peer#1', 'organisations': ['org1']})
+        self.assertEqual(PeerInfo(id='peer#1', organisations=['org1'], ip=None), peer)
+
+    def test_int_is_accepted_as_float(self):
+        recommendation = DecoderRegistry().decode(Recommendation, {
+            'competence_belief': 1,
+            'integrity_belief': 0.5,
+            'service_history_size': 10,
+            'recommendation': 0,
+            'initial_reputation_provided_by_count': 1
+        })
+        self.assertEqual(1, recommendation.competence_belief)
+
+    def test_wrong_type_is_rejected(self):
+        with self.assertRaises(DecodingError):
+            DecoderRegistry().decode(PeerInfo, {'id': 1, 'organisations': []})
+
+        with self.assertRaises(DecodingError):
+            DecoderRegistry().decode(PeerInfo, {'id': 'peer#1', 'organisations': 'org1'})
+
+    def test_missing_field_is_rejected(self):
+        with self.assertRaises(DecodingError):
+            DecoderRegistry().decode(PeerInfo, {'organisations': []})
@@ -0,0 +1,121 @@
+import threading
+from unittest import TestCase
+
+from fides.messaging.dispatcher import Dispatcher, Backpressure, DispatcherFullError
+from fides.messaging.queue_in_memory import InMemoryQueue
+from fides.utils.metrics import metrics
+
+
+class TestDispatcher(TestCase):
+
+    def test_messages_with_same_key_are_delivered_in_order(self):
+        received = {'peer#1': [], 'peer#2': []}
+        queue = InMemoryQueue(workers=4, key_selector=lambda m: m.split(':')[0])
+        queue.listen(lambda m: received[m.split(':')[0]].append(int(m.split(':')[1])))
+
+        for i in range(200):
+            queue.send(f'peer#1:{i}')
+            queue.send(f'peer#2:{i}')
+
+        self.assertTrue(queue.join(timeout=5))
+        self.assertEqual(list(range(200)), received['peer#1'])
+        self.assertEqual(list(range(200)), received['peer#2'])
+        queue.close()
+
+    def test_send_waits_only_for_sent_message(self):
+        release = threading.Event()
+        received = []
+        queue = InMemoryQueue(workers=2)
+        queue.listen(lambda m: release.wait(5) if m == 'slow' else received.append(m))
+
+        # keys are delivered by different workers, the slow message is still being delivered
+        # but the second one does not wait for it
+        queue.send('slow', key='a')
+        self.assertTrue(queue.send('fast', should_wait_for_join=True, key='d'))
+        self.assertEqual(['fast'], received)
+
+        release.set()
+        queue.close()
+
+    def test_send_with_join_from_callback_does_not_deadlock(self):
+        received = []
+        queue = InMemoryQueue(workers=1)
+
+        def on_message(m: str):
+            if m == 'request':
+                queue.send('response', should_wait_for_join=True)
+            received.append(m)
+
+        queue.listen(on_message)
+        queue.send('request')
+
+        self.assertTrue(queue.join(timeout=5))
+        self.assertEqual(['response', 'request'], received)
+        queue.close()
+
+    def test_backpressure_drop(self):
+        started, release = threading.Event(), threading.Event()
+        dispatcher = Dispatcher(workers=1, buffer_size=1, backpressure=Backpressure.DROP)
+
+        # first task blocks the worker, second one fills the buffer
+        self.assertTrue(dispatcher.submit(lambda: started.set() or release.wait(5)))
+        started.wait(5)
+        self.assertTrue(dispatcher.submit(lambda: None))
+        self.assertFalse(dispatcher.submit(lambda: None))
+        self.assertEqual(1, dispatcher.dropped)
+
+        release.set()
+        self.assertTrue(dispatcher.join(timeout=5))
+        dispatcher.close()
+
+    def test_backpressure_raise(self):
+        release = threading.Event()
+        dispatcher = Dispatcher(workers=1, buffer_size=1, backpressure=Backpressure.RAISE)
+        dispatcher.submit(lambda: release.wait(5))
+
+        with self.assertRaises(DispatcherFullError):
+            for _ in range(3):
+                dispatcher.submit(lambda: None)
+
+        release.set()
+        dispatcher.close()
+
+    def test_close_does_not_wait_for_full_buffer(self):
+        started, release = threading.Event(), threading.Event()
+        executed = []
+        dispatcher = Dispatcher(workers=1, buffer_size=1, backpressure=Backpressure.DROP)
+        dispatcher.submit(lambda: started.set() or release.wait(5))
+        started.wait(5)
+        dispatcher.submit(lambda: executed.append(True))
+
+        closing = threading.Thread(target=dispatcher.close, args=(0.1,))
+        closing.start()
+        closing.join(1)
+        release.set()
+        closing.join(5)
+
+        # task that was waiting in the buffer is dropped, once the timeout elapsed
+        self.assertFalse(closing.is_alive())
+        self.assertTrue(dispatcher.join(timeout=5))
+        self.assertEqual([], executed)
+        self.assertEqual(1, dispatcher.dropped)
+        with self.assertRaises(DispatcherFullError):
+            dispatcher.submit(lambda: None)
+
+    def test_close_unregisters_gauges(self):
+        metrics.enable()
+        self.addCleanup(metrics.disable)
+        dispatcher = Dispatcher(workers=1, name='test-close-gauges')
+        self.assertIn('fides_dispatcher_pending{dispatcher="test-close-gauges"}', metrics.snapshot())
+
+        dispatcher.close()
+
+        self.assertNotIn('fides_dispatcher_pending{dispatcher="test-close-gauges"}', metrics.snapshot())
+        self.assertNotIn('fides_dispatcher_dropped{dispatcher="test-close-gauges"}', metrics.snapshot())
+
+    def test_envelope_key(self):
+        self.assertEqual('peer#1', InMemoryQueue.envelope_key(
+            '{"type": "nl2tl_alert", "version": 1, "data": {"sender": {"id": "peer#1"}, "payload": {}}}'))
+        self.assertEqual('example.com', InMemoryQueue.envelope_key(
+            '{"type": "tl2nl_intelligence_request", "version": 1, "data": {"payload": "example.com"}}'))
+        self.assertIsNone(InMemoryQueue.envelope_key('not a json'))
@@ -0,0 +1,159 @@
+import threading
+from unittest import TestCase
+
+from fides.messaging.codec import JsonCodec
+from fides.messaging.dispatcher import Backpressure, DispatcherFullError
+from fides.messaging.message_handler import MessageHandler
+from fides.messaging.priority import PrioritizedMessageDispatcher, Lane, MessageAdmission
+from fides.model.alert import Alert
+from fides.model.peer import PeerInfo
+from tests.load_fides import get_fides_stream
+from tests.messaging.messages import serialize, nl2tl_peers_list, nl2tl_alert, nl2tl_intelligence_request
+
+
+def parse(m):
+    return JsonCodec().decode(serialize(m))[0]
+
+
+def recording_handler(processed: list) -> MessageHandler:
+    return MessageHandler(
+        on_peer_list_update=lambda peers: processed.append('peers_list'),
+        on_recommendation_request=lambda *args: processed.append('recommendation_request'),
+        on_recommendation_response=lambda *args: processed.append('recommendation_response'),
+        on_alert=lambda *args: processed.append('alert'),
+        on_intelligence_request=lambda *args: processed.append('intelligence_request'),
+        on_intelligence_response=lambda *args: processed.append('intelligence_response')
+    )
+
+
+class _CountingAdmission(MessageAdmission):
+
+    def __init__(self):
+        self.in_flight = 0
+
+    def admit_message(self, message) -> bool:
+        self.in_flight += 1
+        return True
+
+    def release_message(self, message):
+        self.in_flight -= 1
+
+
+class TestPrioritizedMessageDispatcher(TestCase):
+
+    def test_alert_jumps_the_queue(self):
+        processed = []
+        dispatcher = PrioritizedMessageDispatcher(recording_handler(processed), start=False)
+        for i in range(3):
+            dispatcher.on_message(parse(nl2tl_peers_list([PeerInfo(f'peer#{i}', [])])))
+        dispatcher.on_message(parse(nl2tl_alert(PeerInfo('peer#1', []), Alert(target='target.com', score=1, confidence=1))))
+
+        self.assertEqual(3, dispatcher.statistics['bulk'].depth)
+        self.assertEqual(1, dispatcher.statistics['critical'].depth)
+
+        dispatcher.drain()
+
+        self.assertEqual(['alert', 'peers_list', 'peers_list', 'peers_list'], processed)
+        self.assertEqual(0, dispatcher.statistics['bulk'].depth)
+        self.assertEqual(3, dispatcher.statistics['bulk'].processed)
+        self.assertEqual(1, dispatcher.statistics['critical'].processed)
+
+    def test_lanes_are_weighted(self):
+        processed = []
+        lanes = [Lane(name='high', types=['nl2tl_alert'], weight=2),
+                 Lane(name='low', types=['nl2tl_intelligence_request'], weight=1)]
+        dispatcher = PrioritizedMessageDispatcher(recording_handler(processed), lanes=lanes, start=False)
+        for i in range(3):
+            dispatcher.on_message(parse(nl2tl_intelligence_request(str(i), 'target.com', PeerInfo('peer#1', []))))
+            dispatcher.on_message(parse(nl2tl_alert(PeerInfo('peer#1', []), Alert(target='target.com', score=1, confidence=1))))
+
+        dispatcher.drain()
+
+        # lower lane is not starved, it gets a turn after every two messages from the higher lane
+        self.assertEqual(['alert', 'intelligence_request', 'alert', 'alert', 'intelligence_request',
+                          'intelligence_request'], processed)
+
+    def test_worker_processes_messages_for_bridge(self):
+        f, messages, _ = get_fides_stream()
+        dispatcher = PrioritizedMessageDispatcher(f.message_handler)
+        f.bridge.listen(dispatcher)
+
+        f.queue.send_message(serialize(nl2tl_intelligence_request('123', 'target.com', PeerInfo('peer#1', []))))
+        dispatcher.close(timeout=5)
+
+        self.assertEqual(['tl2nl_intelligence_response', 'tl2nl_peers_reliability'],
+                         sorted(m.type for m in messages))
+
+    def test_full_lane_drops_messages(self):
+        processed = []
+        lanes = [Lane(name='high', types=['nl2tl_alert'], weight=2),
+                 Lane(name='low', types=['nl2tl_peers_list'], weight=1, capacity=2)]
+        dispatcher = PrioritizedMessageDispatcher(recording_handler(processed), lanes=lanes, start=False)
+        for i in range(4):
+            dispatcher.on_message(parse(nl2tl_peers_list([PeerInfo(f'peer#{i}', [])])))
+        dispatcher.on_message(parse(nl2tl_alert(PeerInfo('peer#1', []), Alert(target='target.com', score=1, confidence=1))))
+
+        # other lanes are not affected by the full one
+        self.assertEqual(2, dispatcher.statistics['low'].depth)
+        self.assertEqual(2, dispatcher.statistics['low'].dropped)
+        self.assertEqual(1, dispatcher.statistics['high'].depth)
+
+        dispatcher.drain()
+        self.assertEqual(['alert', 'peers_list', 'peers_list'], processed)
+
+    def test_full_lane_raises(self):
+        lanes = [Lane(name='bulk', types=['nl2tl_peers_list'], weight=1, capacity=1)]
+        dispatcher = PrioritizedMessageDispatcher(recording_handler([]), lanes=lanes, start=False,
+                                                  backpressure=Backpressure.RAISE)
+        dispatcher.on_message(parse(nl2tl_peers_list([PeerInfo('peer#1', [])])))
+
+        with self.assertRaises(DispatcherFullError):
+            dispatcher.on_message(parse(nl2tl_peers_list([PeerInfo('peer#2', [])])))
+        self.assertEqual(1, dispatcher.statistics['bulk'].dropped)
+
+    def test_rest_of_batch_is_released_when_full_lane_raises(self):
+        admission = _CountingAdmission()
+        lanes = [Lane(name='requests', types=['nl2tl_intelligence_request'], weight=1, capacity=1)]
+        dispatcher = PrioritizedMessageDispatcher(recording_handler([]), lanes=lanes, start=False,
+                                                  backpressure=Backpressure.RAISE, admission=admission)
+
+        with self.assertRaises(DispatcherFullError):
+            dispatcher.on_messages([parse(nl2tl_intelligence_request(str(i), 'target.com', PeerInfo('peer#1', [])))
+                                    for i in range(4)])
+
+        # only the message waiting in the lane is still in flight
+        self.assertEqual(1, admission.in_flight)
+        dispatcher.drain()
+        self.assertEqual(0, admission.in_flight)
+
+    def test_full_lane_blocks_until_worker_makes_space(self):
+        processed, release = [], threading.Event()
+        handler = recording_handler(processed)
+        lanes = [Lane(name='bulk', types=['nl2tl_peers_list'], weight=1, capacity=1)]
+        dispatcher = PrioritizedMessageDispatcher(handler, lanes=lanes, backpressure=Backpressure.BLOCK,
+                                                  block_timeout_seconds=5)
+        started = threading.Event()
+        handler_on_message = handler.on_message
+
+        def slow_on_message(message):
+            started.set()
+            release.wait(5)
+            handler_on_message(message)
+
+        handler.on_message = slow_on_message
+        # first message is taken by the worker, second one fills the lane
+        dispatcher.on_message(parse(nl2tl_peers_list([PeerInfo('peer#1', [])])))
+        started.wait(5)
+        dispatcher.on_message(parse(nl2tl_peers_list([PeerInfo('peer#2', [])])))
+
+        sender = threading.Thread(target=dispatcher.on_message,
+                                  args=(parse(nl2tl_peers_list([PeerInfo('peer#3', [])])),))
+        sender.start()
+        sender.join(0.05)
+        self.assertTrue(sender.is_alive())
+
+        release.set()
+        sender.join(5)
+        dispatcher.close(timeout=5)
+        self.assertEqual(['peers_list'] * 3, processed)
+        self.assertEqual(0, dispatcher.statistics['bulk'].dropped)
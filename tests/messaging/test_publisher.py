@@ -0,0 +1,108 @@
+import threading
+import time
+from typing import Callable, List
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from redis.client import Redis
+from redis.exceptions import ConnectionError
+
+from slips.messaging.publisher import PipelinedPublisher
+
+
+def _client() -> MagicMock:
+    """Redis client whose pipelines record executed batches, it is used as it is by the publisher."""
+    r = MagicMock(spec=Redis)
+    r.connection_pool = MagicMock()
+    r.executed = []
+    pipe = r.pipeline.return_value
+    pipe.publish.side_effect = lambda channel, data: pipe.queued.append((channel, data))
+    pipe.queued = []
+
+    def execute():
+        batch, pipe.queued = pipe.queued, []
+        r.executed.append(([data for _, data in batch], threading.current_thread().name))
+
+    pipe.execute.side_effect = execute
+    return r
+
+
+def _batches(r: MagicMock) -> List[List[str]]:
+    return [batch for batch, _ in r.executed]
+
+
+def _wait_for(condition: Callable[[], bool], timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+class TestPipelinedPublisher(TestCase):
+
+    def test_full_batch_is_published_by_background_thread(self):
+        r = _client()
+        publisher = PipelinedPublisher(r, 'channel', max_batch=3, flush_interval_seconds=60)
+
+        for i in range(3):
+            publisher.publish(str(i))
+
+        self.assertTrue(_wait_for(lambda: r.executed))
+        self.assertEqual([(['0', '1', '2'], 'publisher-channel')], r.executed)
+        r.pipeline.return_value.publish.assert_called_with('channel', '2')
+        publisher.close()
+
+    def test_buffer_is_published_after_interval(self):
+        r = _client()
+        publisher = PipelinedPublisher(r, 'channel', max_batch=100, flush_interval_seconds=0.01)
+
+        publisher.publish('message')
+
+        self.assertTrue(_wait_for(lambda: r.executed))
+        self.assertEqual([['message']], _batches(r))
+        publisher.close()
+
+    def test_close_publishes_buffered_messages(self):
+        r = _client()
+        publisher = PipelinedPublisher(r, 'channel', max_batch=100, flush_interval_seconds=60)
+        publisher.publish('first')
+        publisher.publish('second')
+
+        publisher.close()
+
+        self.assertEqual([['first', 'second']], _batches(r))
+
+    def test_failed_batch_is_sent_again_after_reconnect(self):
+        r = _client()
+        pipe = r.pipeline.return_value
+        execute, failures = pipe.execute.side_effect, [ConnectionError('Connection lost!')]
+
+        def fail_once():
+            # first attempt loses the batch, the second one succeeds
+            if failures:
+                pipe.queued = []
+                raise failures.pop()
+            execute()
+
+        pipe.execute.side_effect = fail_once
+        publisher = PipelinedPublisher(r, 'channel', max_batch=100, flush_interval_seconds=60, backoff_seconds=0)
+        publisher.publish('message')
+        publisher.close()
+
+        self.assertEqual([['message']], _batches(r))
+        r.connection_pool.disconnect.assert_called_once()
+        self.assertEqual(0, publisher.dropped)
+
+    def test_batch_is_dropped_when_retries_run_out(self):
+        r = _client()
+        r.pipeline.return_value.execute.side_effect = ConnectionError('Redis is down!')
+        publisher = PipelinedPublisher(r, 'channel', max_batch=100, flush_interval_seconds=60,
+                                       max_retries=2, backoff_seconds=0)
+        publisher.publish('first')
+        publisher.publish('second')
+        publisher.close()
+
+        self.assertEqual(3, r.pipeline.return_value.execute.call_count)
+        self.assertEqual(2, publisher.dropped)
@@ -0,0 +1,44 @@
+import json
+from typing import List
+from unittest import TestCase
+
+from fides.messaging.network_bridge import NetworkBridge
+from tests.messaging.queue import TestQueue
+
+
+def bridge_with_sent_messages(**kwargs) -> (NetworkBridge, List[dict]):
+    sent = []
+    queue = TestQueue()
+    queue.on_send_called = lambda m: sent.append(json.loads(m))
+    return NetworkBridge(queue, **kwargs), sent
+
+
+class TestReliabilityPublisher(TestCase):
+
+    def test_updates_are_sent_immediately_by_default(self):
+        bridge, sent = bridge_with_sent_messages()
+        bridge.send_peers_reliability({'peer#1': 0.5})
+        bridge.send_peers_reliability({'peer#1': 0.5})
+
+        self.assertEqual(2, len(sent))
+
+    def test_updates_are_coalesced_in_window(self):
+        bridge, sent = bridge_with_sent_messages(reliability_window_seconds=60)
+        bridge.send_peers_reliability({'peer#1': 0.1, 'peer#2': 0.2})
+        bridge.send_peers_reliability({'peer#1': 0.3})
+        self.assertEqual(0, len(sent))
+
+        bridge.close()
+
+        self.assertEqual(1, len(sent))
+        self.assertEqual('tl2nl_peers_reliability', sent[0]['type'])
+        self.assertEqual([{'peer_id': 'peer#1', 'reliability': 0.3}, {'peer_id': 'peer#2', 'reliability': 0.2}],
+                         sent[0]['data'])
+
+    def test_only_significant_changes_are_sent(self):
+        bridge, sent = bridge_with_sent_messages(reliability_epsilon=0.1)
+        bridge.send_peers_reliability({'peer#1': 0.5, 'peer#2': 0.5})
+        bridge.send_peers_reliability({'peer#1': 0.55, 'peer#2': 0.8})
+
+        self.assertEqual(2, len(sent))
+        self.assertEqual([{'peer_id': 'peer#2', 'reliability': 0.8}], sent[1]['data'])
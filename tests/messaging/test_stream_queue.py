@@ -0,0 +1,99 @@
+from typing import List, Optional
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from redis.client import Redis
+from redis.exceptions import ResponseError
+
+from slips.messaging.stream_queue import RedisStreamQueue
+
+
+def _client(batches: List[list], control: Optional[List[dict]] = None) -> MagicMock:
+    """Redis client that returns given batches from the stream, the last batch must stop the queue."""
+    r = MagicMock(spec=Redis)
+    r.xreadgroup.side_effect = [[('receive', batch)] for batch in batches]
+    r.xpending_range.return_value = []
+    r.pubsub.return_value.get_message.side_effect = (control or []) + [None] * 100
+    return r
+
+
+def _stop(entry_id: str = '9-0'):
+    return entry_id, {'data': 'stop_process'}
+
+
+def _acked(r: MagicMock) -> List[str]:
+    return [entry_id for c in r.xack.call_args_list for entry_id in c.args[2:]]
+
+
+class TestRedisStreamQueue(TestCase):
+
+    def test_existing_group_is_reused(self):
+        r = _client([[_stop()]])
+        r.xgroup_create.side_effect = ResponseError('BUSYGROUP Consumer Group name already exists')
+
+        RedisStreamQueue(r, 'send', 'receive').listen(lambda m: None, block=True)
+
+        r.xgroup_create.assert_called_once_with('receive', 'fides', id='0', mkstream=True)
+        self.assertEqual(1, r.xreadgroup.call_count)
+
+    def test_other_group_errors_are_raised(self):
+        r = _client([])
+        r.xgroup_create.side_effect = ResponseError('WRONGTYPE Operation against a key')
+
+        with self.assertRaises(ResponseError):
+            RedisStreamQueue(r, 'send', 'receive').listen(lambda m: None, block=True)
+
+    def test_send_trims_stream(self):
+        r = _client([])
+
+        RedisStreamQueue(r, 'send', 'receive', max_stream_length=10).send('message')
+
+        r.xadd.assert_called_once_with('send', {'data': 'message'}, maxlen=10, approximate=True)
+
+    def test_trimmed_entries_are_acknowledged_without_processing(self):
+        received = []
+        r = _client([[('1-0', {'data': 'message'}), ('2-0', None), ('3-0', {})], [_stop()]])
+
+        RedisStreamQueue(r, 'send', 'receive').listen(received.append, block=True)
+
+        self.assertEqual(['message'], received)
+        self.assertEqual(['1-0', '2-0', '3-0', '9-0'], _acked(r))
+
+    def test_idle_entries_are_reclaimed_and_poisoned_dropped(self):
+        received = []
+        r = _client([[_stop()]])
+        r.xpending_range.return_value = [
+            {'message_id': '1-0', 'time_since_delivered': 60_000, 'times_delivered': 2},
+            {'message_id': '2-0', 'time_since_delivered': 60_000, 'times_delivered': 6},
+            {'message_id': '3-0', 'time_since_delivered': 10, 'times_delivered': 1},
+        ]
+        r.xclaim.return_value = [('1-0', {'data': 'reclaimed'})]
+
+        RedisStreamQueue(r, 'send', 'receive', consumer='c1', claim_idle_ms=30_000, max_deliveries=5) \
+            .listen(received.append, block=True)
+
+        # poisoned entry is dropped, the one that is not idle for long enough is left to its consumer
+        r.xclaim.assert_called_once_with('receive', 'fides', 'c1', 30_000, ['1-0'])
+        self.assertEqual(['reclaimed'], received)
+        self.assertEqual(['2-0', '1-0', '9-0'], _acked(r))
+
+    def test_stop_is_broadcast_and_batch_finished(self):
+        received = []
+        r = _client([[('1-0', {'data': 'first'}), _stop('2-0'), ('3-0', {'data': 'second'})]])
+
+        RedisStreamQueue(r, 'send', 'receive').listen(received.append, block=True)
+
+        # entries after the stop were already delivered to this consumer, so they're not left pending
+        self.assertEqual(['first', 'second'], received)
+        self.assertEqual(['1-0', '2-0', '3-0'], _acked(r))
+        r.publish.assert_called_once_with('receive:control', 'stop_process')
+        r.pubsub.return_value.subscribe.assert_called_once_with('receive:control')
+        r.pubsub.return_value.close.assert_called_once()
+
+    def test_broadcast_stop_stops_consumer(self):
+        r = _client([[('1-0', {'data': 'first'})]], control=[{'type': 'message', 'data': b'stop_process'}])
+
+        RedisStreamQueue(r, 'send', 'receive').listen(lambda m: None, block=True)
+
+        r.xreadgroup.assert_not_called()
+        r.publish.assert_not_called()
@@ -0,0 +1,168 @@
+import threading
+from dataclasses import replace
+from unittest import TestCase
+
+from fides.messaging.codec import JsonCodec
+from fides.messaging.message_handler import MessageHandler
+from fides.messaging.priority import PrioritizedMessageDispatcher
+from fides.model.peer import PeerInfo
+from fides.persistence.trust_in_memory import InMemoryTrustDatabase
+from fides.protocols.admission import AdmissionController
+from tests.load_config import find_config
+from tests.load_fides import get_fides_stream
+from tests.messaging.messages import serialize, nl2tl_intelligence_request, nl2tl_peers_list
+
+
+def parse(m):
+    return JsonCodec().decode(serialize(m))[0]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestAdmissionControl(TestCase):
+
+    def test_rate_is_scaled_by_service_trust(self):
+        f, _, _ = get_fides_stream()
+        trusted, stranger = PeerInfo('trusted', []), PeerInfo('stranger', [])
+        trusted_data = f.trust.determine_and_store_initial_trust(trusted, get_recommendations=False)
+        f.trust_db.store_peer_trust_data(replace(trusted_data, service_trust=1))
+
+        clock = Clock()
+        admission = AdmissionController(f.trust_db, rate_per_second=1, burst=4, unknown_peer_trust=0.25,
+                                        clock=clock)
+
+        trusted_admitted = sum(admission.admit(trusted, 'nl2tl_intelligence_request') for _ in range(10))
+        stranger_admitted = sum(admission.admit(stranger, 'nl2tl_intelligence_request') for _ in range(10))
+        self.assertEqual(4, trusted_admitted)
+        self.assertEqual(1, stranger_admitted)
+        self.assertEqual(15, admission.statistics.rate_limited)
+
+        # buckets are refilled with the scaled rate
+        clock.now = 1
+        self.assertTrue(admission.admit(trusted, 'nl2tl_intelligence_request'))
+        self.assertFalse(admission.admit(stranger, 'nl2tl_intelligence_request'))
+        clock.now = 4
+        self.assertTrue(admission.admit(stranger, 'nl2tl_intelligence_request'))
+
+    def test_low_trust_is_shed_first_when_overloaded(self):
+        f, _, _ = get_fides_stream()
+        trusted, stranger = PeerInfo('trusted', []), PeerInfo('stranger', [])
+        trusted_data = f.trust.determine_and_store_initial_trust(trusted, get_recommendations=False)
+        f.trust_db.store_peer_trust_data(replace(trusted_data, service_trust=0.9))
+
+        waiting = [0]
+        admission = AdmissionController(f.trust_db, max_concurrent=4, overload_fraction=0.5,
+                                        load_probe=lambda: waiting[0], clock=Clock())
+
+        waiting[0] = 2
+        self.assertFalse(admission.admit(stranger, 'nl2tl_recommendation_request'))
+        self.assertTrue(admission.admit(trusted, 'nl2tl_recommendation_request'))
+        self.assertEqual(1, admission.statistics.shed)
+
+        # global cap applies to everyone
+        waiting[0] = 3
+        self.assertFalse(admission.admit(trusted, 'nl2tl_recommendation_request'))
+        self.assertEqual(1, admission.statistics.over_capacity)
+
+        admission.release()
+        self.assertEqual(0, admission.in_flight)
+
+    def test_rejected_request_sends_backpressure_hint(self):
+        f, messages, _ = get_fides_stream()
+        admission = AdmissionController(f.trust_db, f.bridge, burst=1, minimal_trust_scale=1, clock=Clock())
+        handler = MessageHandler(
+            on_peer_list_update=f.peer_list.handle_peer_list_updated,
+            on_recommendation_request=f.recommendations.handle_recommendation_request,
+            on_recommendation_response=f.recommendations.handle_recommendation_response,
+            on_alert=f.alert.handle_alert,
+            on_intelligence_request=admission.guard(f.intelligence.handle_intelligence_request,
+                                                    'nl2tl_intelligence_request'),
+            on_intelligence_response=f.intelligence.handle_intelligence_response
+        )
+        f.bridge.listen(handler)
+
+        peer = PeerInfo('peer#1', [])
+        f.queue.send_message(serialize(nl2tl_intelligence_request('1', 'target.com', peer)))
+        f.queue.send_message(serialize(nl2tl_intelligence_request('2', 'target.com', peer)))
+        f.queue.send_message(serialize(nl2tl_intelligence_request('3', 'target.com', peer)))
+
+        responses = [m for m in messages if m.type == 'tl2nl_intelligence_response']
+        hints = [m for m in messages if m.type == 'tl2nl_backpressure']
+        self.assertEqual(['1'], [m.data['request_id'] for m in responses])
+        # hints are rate limited as well
+        self.assertEqual(1, len(hints))
+        self.assertEqual('peer#1', hints[0].data['peer_id'])
+        self.assertEqual('nl2tl_intelligence_request', hints[0].data['message_type'])
+        self.assertEqual({'nl2tl_intelligence_request': 2}, admission.statistics.rejected_by_type)
+
+    def test_requests_are_admitted_before_they_wait_in_lane(self):
+        f, messages, _ = get_fides_stream()
+        admission = AdmissionController(f.trust_db, rate_per_second=100, burst=100, minimal_trust_scale=1,
+                                        max_concurrent=3, clock=Clock())
+        dispatcher = PrioritizedMessageDispatcher(f.message_handler, start=False, admission=admission)
+
+        peer = PeerInfo('peer#1', [])
+        for i in range(5):
+            dispatcher.on_message(parse(nl2tl_intelligence_request(str(i), 'target.com', peer)))
+        # other messages are not subject of the admission
+        dispatcher.on_message(parse(nl2tl_peers_list([peer])))
+
+        # waiting requests count to the load, so only max_concurrent of them get to the lane
+        self.assertEqual(3, dispatcher.statistics['requests'].depth)
+        self.assertEqual(1, dispatcher.statistics['bulk'].depth)
+        self.assertEqual(3, admission.in_flight)
+        self.assertEqual(2, admission.statistics.over_capacity)
+
+        dispatcher.drain()
+
+        self.assertEqual(0, admission.in_flight)
+        self.assertEqual(['0', '1', '2'], [m.data['request_id'] for m in messages
+                                           if m.type == 'tl2nl_intelligence_response'])
+
+    def test_least_recently_seen_senders_are_forgotten(self):
+        f, _, _ = get_fides_stream()
+        admission = AdmissionController(f.trust_db, rate_per_second=0, burst=1, minimal_trust_scale=1,
+                                        max_senders=2, clock=Clock())
+        first, second, third = PeerInfo('first', []), PeerInfo('second', []), PeerInfo('third', [])
+
+        self.assertTrue(admission.admit(first, 'nl2tl_intelligence_request'))
+        self.assertTrue(admission.admit(second, 'nl2tl_intelligence_request'))
+        # first one was seen more recently than the second one, so the second one is forgotten
+        self.assertFalse(admission.admit(first, 'nl2tl_intelligence_request'))
+        self.assertTrue(admission.admit(third, 'nl2tl_intelligence_request'))
+
+        self.assertFalse(admission.admit(first, 'nl2tl_intelligence_request'))
+        self.assertTrue(admission.admit(second, 'nl2tl_intelligence_request'))
+
+    def test_slow_trust_read_does_not_block_other_senders(self):
+        loading, release = threading.Event(), threading.Event()
+
+        class SlowTrustDatabase(InMemoryTrustDatabase):
+            def get_peer_trust_data(self, peer):
+                if peer == 'slow':
+                    loading.set()
+                    release.wait(5)
+                return super().get_peer_trust_data(peer)
+
+        admission = AdmissionController(SlowTrustDatabase(find_config()), clock=Clock())
+        fast = PeerInfo('fast', [])
+        self.assertTrue(admission.admit(fast, 'nl2tl_intelligence_request'))
+
+        slow = threading.Thread(target=admission.admit, args=(PeerInfo('slow', []), 'nl2tl_intelligence_request'))
+        slow.start()
+        loading.wait(5)
+        admitted = threading.Thread(target=admission.admit, args=(fast, 'nl2tl_intelligence_request'))
+        admitted.start()
+        admitted.join(1)
+
+        self.assertFalse(admitted.is_alive())
+        self.assertEqual(2, admission.statistics.admitted)
+        release.set()
+        slow.join(5)
+        self.assertEqual(3, admission.statistics.admitted)
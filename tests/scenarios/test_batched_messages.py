@@ -0,0 +1,134 @@
+import json
+import threading
+from dataclasses import asdict
+from unittest import TestCase
+
+from dacite import from_dict
+
+from fides.messaging.batch import MessageBatcher
+from fides.messaging.message_handler import MessageHandler
+from fides.messaging.model import PeerIntelligenceResponse, NetworkMessage
+from fides.model.peer import PeerInfo
+from fides.model.threat_intelligence import ThreatIntelligence
+from tests.load_fides import get_fides_stream
+from tests.messaging.messages import serialize, nl2tl_peers_list, nl2tl_intelligence_response
+
+
+def _parsed(message: NetworkMessage) -> NetworkMessage:
+    return from_dict(data_class=NetworkMessage, data=json.loads(serialize(message)))
+
+
+def _recording_handler(calls: list) -> MessageHandler:
+    def record(name: str):
+        return lambda *args: calls.append((name, *args))
+
+    return MessageHandler(
+        on_peer_list_update=record('peers'),
+        on_recommendation_request=record('recommendation_request'),
+        on_recommendation_response=record('recommendation_response'),
+        on_alert=record('alert'),
+        on_intelligence_request=record('intelligence_request'),
+        on_intelligence_response=record('intelligence_response'),
+    )
+
+
+class TestBatchedMessages(TestCase):
+
+    def test_json_array_of_envelopes(self):
+        f, messages, network_opinions = get_fides_stream()
+        senders = [PeerInfo('sender#1', []), PeerInfo('sender#2', [])]
+        for sender in senders:
+            f.trust.determine_and_store_initial_trust(sender, get_recommendations=False)
+
+        envelopes = [
+            nl2tl_intelligence_response([PeerIntelligenceResponse(
+                sender=sender, target='target.com', intelligence=ThreatIntelligence(score=1, confidence=1)
+            )]) for sender in senders
+        ]
+        f.queue.send_message(json.dumps([asdict(e) for e in envelopes]))
+
+        # both responses are for the same target, so they were processed together
+        self.assertEqual(1, len(messages))
+        self.assertEqual('tl2nl_peers_reliability', messages[0].type)
+        self.assertEqual({p.id for p in senders}, {d['peer_id'] for d in messages[0].data})
+        self.assertIn('target.com', network_opinions)
+
+    def test_batch_is_dispatched_when_flushed(self):
+        f, messages, _ = get_fides_stream()
+        f.bridge.listen(f.message_handler, batch_size=10, linger_seconds=60)
+
+        f.queue.send_message(serialize(nl2tl_peers_list([PeerInfo('peer#1', [])])))
+        f.queue.send_message(serialize(nl2tl_peers_list([PeerInfo('peer#2', [])])))
+        self.assertEqual(0, len(messages))
+
+        f.bridge.flush()
+
+        # only the latest peer list is processed
+        self.assertEqual(1, len(messages))
+        self.assertEqual(['peer#2'], [d['peer_id'] for d in messages[0].data])
+        self.assertEqual(2, f.bridge.batch_statistics.messages)
+        self.assertEqual(1, f.bridge.batch_statistics.batches)
+
+    def test_batch_is_dispatched_when_full(self):
+        f, messages, _ = get_fides_stream()
+        f.bridge.listen(f.message_handler, batch_size=2, linger_seconds=60)
+
+        f.queue.send_message(serialize(nl2tl_peers_list([PeerInfo('peer#1', [])])))
+        f.queue.send_message(serialize(nl2tl_peers_list([PeerInfo('peer#1', []), PeerInfo('peer#2', [])])))
+
+        self.assertEqual(1, len(messages))
+        self.assertEqual(2, f.bridge.batch_statistics.last_batch_size)
+
+    def test_batch_keeps_arrival_order_of_different_types(self):
+        calls = []
+        handler = _recording_handler(calls)
+        response = nl2tl_intelligence_response([PeerIntelligenceResponse(
+            sender=PeerInfo('sender#1', []), target='target.com', intelligence=ThreatIntelligence(score=1, confidence=1)
+        )])
+
+        handler.on_messages([_parsed(m) for m in (
+            nl2tl_peers_list([PeerInfo('peer#1', [])]),
+            response,
+            nl2tl_peers_list([PeerInfo('peer#2', [])]),
+            nl2tl_peers_list([PeerInfo('peer#3', [])]),
+        )])
+
+        # only consecutive peer lists are merged, the first one is not superseded by the later ones
+        self.assertEqual(['peers', 'intelligence_response', 'peers'], [c[0] for c in calls])
+        self.assertEqual(['peer#1'], [p.id for p in calls[0][1]])
+        self.assertEqual(['peer#3'], [p.id for p in calls[2][1]])
+
+    def test_only_latest_response_of_sender_is_processed(self):
+        calls = []
+        handler = _recording_handler(calls)
+
+        def response(sender: str, score: float) -> NetworkMessage:
+            return _parsed(nl2tl_intelligence_response([PeerIntelligenceResponse(
+                sender=PeerInfo(sender, []), target='target.com',
+                intelligence=ThreatIntelligence(score=score, confidence=1)
+            )]))
+
+        handler.on_messages([response('sender#1', 0.1), response('sender#2', 0.2), response('sender#1', 0.3)])
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual({'sender#1': 0.3, 'sender#2': 0.2},
+                         {r.sender.id: r.intelligence.score for r in calls[0][1]})
+
+    def test_error_of_lingering_batch_is_passed_to_error_handler(self):
+        errors = []
+        handled = threading.Event()
+
+        def on_batch(_):
+            raise ValueError('failed')
+
+        def on_error(batch, ex):
+            errors.append((batch, ex))
+            handled.set()
+
+        batcher = MessageBatcher(on_batch, batch_size=10, linger_seconds=0.01, on_error=on_error)
+        batcher.add(['message'])
+
+        # flushed by the timer thread
+        self.assertTrue(handled.wait(5))
+        self.assertEqual(['message'], errors[0][0])
+        self.assertIsInstance(errors[0][1], ValueError)
@@ -0,0 +1,69 @@
+from unittest import TestCase
+
+from fides.messaging.model import PeerIntelligenceResponse
+from fides.model.peer import PeerInfo
+from fides.model.threat_intelligence import ThreatIntelligence, SlipsThreatIntelligence
+from fides.protocols.threat_intelligence import PendingRequests, ThreatIntelligenceProtocol
+from tests.load_fides import get_fides_stream
+from tests.messaging.messages import serialize, nl2tl_intelligence_response
+
+
+class TestRequestCoalescing(TestCase):
+
+    def test_concurrent_requests_are_sent_once(self):
+        f, messages, network_opinions = get_fides_stream()
+        sender = PeerInfo('sender#1', [])
+        f.trust.determine_and_store_initial_trust(sender, get_recommendations=False)
+
+        received = []
+        f.intelligence.request_data('target.com')
+        f.intelligence.request_data('target.com', callback=received.append)
+        f.intelligence.request_data('target.com')
+
+        requests = [m for m in messages if m.type == 'tl2nl_intelligence_request']
+        self.assertEqual(1, len(requests))
+
+        f.queue.send_message(serialize(nl2tl_intelligence_response([PeerIntelligenceResponse(
+            sender=sender, target='target.com', intelligence=ThreatIntelligence(score=1, confidence=1)
+        )])))
+
+        # result was fanned out to all waiters
+        self.assertIn('target.com', network_opinions)
+        self.assertEqual(['target.com'], [ti.target for ti in received])
+
+        # once the request is completed, the opinion is cached
+        f.intelligence.request_data('target.com', callback=received.append)
+        self.assertEqual(2, len(received))
+        self.assertEqual(1, len([m for m in messages if m.type == 'tl2nl_intelligence_request']))
+
+    def test_unanswered_target_is_cached_as_negative(self):
+        f, messages, _ = get_fides_stream()
+        # requests expire right away, as if the network never responded
+        intelligence = ThreatIntelligenceProtocol(f.trust_db, f.ti_db, f.bridge, f.config, f.opinion, f.trust,
+                                                  f.config.interaction_evaluation_strategy, print,
+                                                  request_timeout_seconds=0)
+        received = []
+
+        intelligence.request_data('unknown.com')
+        intelligence.request_data('unknown.com', callback=received.append)
+
+        self.assertEqual(1, len([m for m in messages if m.type == 'tl2nl_intelligence_request']))
+        self.assertEqual([SlipsThreatIntelligence(score=0, confidence=0, target='unknown.com')], received)
+
+    def test_pending_requests_expire(self):
+        now = [0.0]
+        pending = PendingRequests(timeout_seconds=10, clock=lambda: now[0])
+
+        self.assertTrue(pending.add('target.com', print))
+        self.assertFalse(pending.add('target.com', print))
+        self.assertTrue(pending.add('other.com', print))
+
+        now[0] = 10
+        # expired request can be sent again, the expired waiters are dropped
+        self.assertTrue(pending.add('target.com', len))
+        self.assertEqual(1, len(pending))
+        self.assertEqual([len], pending.complete('target.com'))
+        self.assertEqual([], pending.complete('target.com'))
+        # completed request did not expire
+        self.assertEqual(['target.com', 'other.com'], pending.expired())
+        self.assertEqual([], pending.expired())
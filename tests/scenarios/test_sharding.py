@@ -0,0 +1,157 @@
+import json
+import threading
+from queue import SimpleQueue
+from typing import Callable, List
+from unittest import TestCase
+
+from dacite import from_dict
+
+from fides.messaging.message_handler import MessageHandler
+from fides.messaging.model import NetworkMessage, PeerIntelligenceResponse
+from fides.messaging.network_bridge import NetworkBridge
+from fides.messaging.queue import Queue
+from fides.model.peer import PeerInfo
+from fides.model.threat_intelligence import SlipsThreatIntelligence, ThreatIntelligence
+from fides.persistence.threat_intelligence_in_memory import InMemoryThreatIntelligenceDatabase
+from fides.persistence.trust import TrustDatabase
+from fides.protocols.alert import AlertProtocol
+from fides.protocols.initial_trusl import InitialTrustProtocol
+from fides.protocols.opinion import OpinionAggregator
+from fides.protocols.peer_list import PeerListUpdateProtocol
+from fides.protocols.recommendation import RecommendationProtocol
+from fides.protocols.threat_intelligence import ThreatIntelligenceProtocol
+from fides.sharding.channels import ShardChannels, ShardCallError
+from fides.sharding.routing import shard_of
+from fides.sharding.runtime import ShardedRuntime
+from fides.sharding.worker import ShardProtocols
+from tests.load_config import find_config
+from tests.messaging.messages import serialize, nl2tl_intelligence_request, nl2tl_intelligence_response, \
+    nl2tl_peers_list
+from tests.messaging.queue import TestQueue
+
+
+def build_protocols(trust_db: TrustDatabase,
+                    queue: Queue,
+                    network_opinion_callback: Callable[[SlipsThreatIntelligence], None]) -> ShardProtocols:
+    config = trust_db.get_model_configuration()
+    ti_db = InMemoryThreatIntelligenceDatabase()
+    bridge = NetworkBridge(queue)
+    recommendations = RecommendationProtocol(config, trust_db, bridge)
+    trust = InitialTrustProtocol(trust_db, config, recommendations)
+    peer_list = PeerListUpdateProtocol(trust_db, bridge, recommendations, trust)
+    opinion = OpinionAggregator(config, ti_db, config.ti_aggregation_strategy)
+    intelligence = ThreatIntelligenceProtocol(trust_db, ti_db, bridge, config, opinion, trust,
+                                              config.interaction_evaluation_strategy, network_opinion_callback)
+    alert = AlertProtocol(trust_db, bridge, trust, config, opinion, network_opinion_callback)
+    handler = MessageHandler(
+        on_peer_list_update=peer_list.handle_peer_list_updated,
+        on_recommendation_request=recommendations.handle_recommendation_request,
+        on_recommendation_response=recommendations.handle_recommendation_response,
+        on_alert=alert.handle_alert,
+        on_intelligence_request=intelligence.handle_intelligence_request,
+        on_intelligence_response=intelligence.handle_intelligence_response
+    )
+    return ShardProtocols(handler=handler, intelligence=intelligence, alert=alert)
+
+
+class TestShardedRuntime(TestCase):
+
+    def setUp(self):
+        self.messages: List[NetworkMessage] = []
+        self.opinions: List[SlipsThreatIntelligence] = []
+        # network opinion callback is executed by the coordinator, clearing this blocks it
+        self.coordinator_released = threading.Event()
+        self.coordinator_released.set()
+        self.coordinator_blocked = threading.Event()
+        lock = threading.Lock()
+
+        def on_opinion(ti: SlipsThreatIntelligence):
+            self.opinions.append(ti)
+            self.coordinator_blocked.set()
+            self.coordinator_released.wait(5)
+
+        def on_send(data: str):
+            with lock:
+                self.messages.append(from_dict(data_class=NetworkMessage, data=json.loads(data)))
+
+        self.queue = TestQueue()
+        self.queue.on_send_called = on_send
+        self.runtime = ShardedRuntime(self.queue, find_config(), build_protocols, on_opinion, shards=2)
+        self.runtime.start()
+        self.runtime.listen()
+
+    def tearDown(self):
+        self.runtime.stop(timeout=5)
+
+    def test_single_peer_messages_are_processed_by_owners(self):
+        peers = [PeerInfo(f'peer#{i}', []) for i in range(6)]
+        for i, peer in enumerate(peers):
+            self.queue.send_message(serialize(nl2tl_intelligence_request(str(i), 'target.com', peer)))
+        self.runtime.drain()
+
+        responses = [m for m in self.messages if m.type == 'tl2nl_intelligence_response']
+        self.assertEqual({str(i) for i in range(6)}, {m.data['request_id'] for m in responses})
+
+        # peers were spread to both shards and the coordinator sees all of them
+        self.assertEqual({0, 1}, {shard_of(p.id, 2) for p in peers})
+        matrix = self.runtime.trust_db.get_peers_trust_data([p.id for p in peers])
+        self.assertEqual({p.id for p in peers}, set(matrix.keys()))
+
+    def test_cross_shard_messages_are_processed_by_coordinator(self):
+        peers = [PeerInfo(f'peer#{i}', []) for i in range(4)]
+        self.queue.send_message(serialize(nl2tl_peers_list(peers)))
+        self.runtime.drain()
+        self.assertEqual(4, len(self.runtime.trust_db.get_peers_with_geq_service_trust(0)))
+
+        self.runtime.coordinated(lambda c: c.intelligence.request_data('target.com'))
+        self.queue.send_message(serialize(nl2tl_intelligence_response([PeerIntelligenceResponse(
+            sender=peer, target='target.com', intelligence=ThreatIntelligence(score=1, confidence=1)
+        ) for peer in peers])))
+        self.runtime.drain()
+
+        self.assertEqual(['target.com'], [o.target for o in self.opinions])
+        # all peers were updated after the interaction evaluation
+        history = {p.peer_id: p.service_history_size for p in
+                   self.runtime.trust_db.get_peers_trust_data([p.id for p in peers]).values()}
+        self.assertEqual({p.id: 2 for p in peers}, history)
+
+    def test_router_does_not_wait_for_coordinator(self):
+        sender, other = PeerInfo('peer#1', []), PeerInfo('peer#2', [])
+        self.queue.send_message(serialize(nl2tl_peers_list([sender, other])))
+        self.runtime.drain()
+        self.runtime.coordinated(lambda c: c.intelligence.request_data('target.com'))
+
+        self.coordinator_released.clear()
+        self.queue.send_message(serialize(nl2tl_intelligence_response([PeerIntelligenceResponse(
+            sender=sender, target='target.com', intelligence=ThreatIntelligence(score=1, confidence=1)
+        )])))
+        self.assertTrue(self.coordinator_blocked.wait(5))
+
+        # the sender of the response is deferred until the coordinator finishes, the other peer is not
+        self.queue.send_message(serialize(nl2tl_intelligence_request('sender', 'target.com', sender)))
+        self.queue.send_message(serialize(nl2tl_intelligence_request('other', 'target.com', other)))
+        # the call is answered after the owner of the other peer processed the request
+        self.runtime.trust_db.get_peer_trust_data(other.id)
+
+        def answered() -> List[str]:
+            return [m.data['request_id'] for m in list(self.messages) if m.type == 'tl2nl_intelligence_response']
+
+        self.assertEqual(['other'], answered())
+
+        self.coordinator_released.set()
+        self.runtime.drain()
+        self.assertEqual(['other', 'sender'], answered())
+
+    def test_timed_out_call_is_not_pending(self):
+        inbox = SimpleQueue()
+        channels = ShardChannels([inbox], timeout_seconds=0.01)
+        future = channels.call(0, 'ping')
+        _, call_id, _, _ = inbox.get_nowait()
+
+        with self.assertRaises(ShardCallError):
+            channels.result(future)
+        channels.resolve(call_id, 'late', None)
+
+        self.assertFalse(future.done())
+        self.assertEqual({}, channels._ShardChannels__pending)
+        self.assertEqual({}, channels._ShardChannels__call_ids_by_future)
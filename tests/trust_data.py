@@ -0,0 +1,27 @@
+from dataclasses import replace
+from typing import Iterable, List, Optional, Sequence
+
+from fides.model.aliases import PeerId, OrganisationId
+from fides.model.peer import PeerInfo
+from fides.model.peer_trust_data import PeerTrustData, trust_data_prototype
+from fides.model.recommendation_history import RecommendationHistoryRecord
+from fides.model.service_history import ServiceHistoryRecord
+
+
+def trust_data(peer_id: PeerId,
+               service_trust: float = 0.5,
+               recommendation_trust: float = 0.5,
+               organisations: Sequence[OrganisationId] = ('org1',),
+               ip: Optional[str] = '10.0.0.1') -> PeerTrustData:
+    """Creates trust data with all fields set to non default values, so the database must store all of them."""
+    return replace(trust_data_prototype(PeerInfo(peer_id, list(organisations), ip)),
+                   service_trust=service_trust, recommendation_trust=recommendation_trust,
+                   reputation=0.25, competence_belief=0.75, integrity_belief=0.125,
+                   initial_reputation_provided_by_count=3,
+                   service_history=[ServiceHistoryRecord(0.5, 1, 100.0), ServiceHistoryRecord(1, 0.5, 200.5)],
+                   recommendation_history=[RecommendationHistoryRecord(0.25, 1, 300.0)])
+
+
+def peer_ids(infos: Iterable[PeerInfo]) -> List[PeerId]:
+    """Sorted ids of the peers, databases do not guarantee any order of the returned peers."""
+    return sorted(i.id for i in infos)